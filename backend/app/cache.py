@@ -0,0 +1,251 @@
+"""
+Caché de resultados de la bandeja de entrada (GET /api/documents/pending).
+
+Cada página se guarda indexada por sus filtros, su cursor y su tamaño. Al
+subir o firmar un documento se invalidan solo las páginas cuyo resultado
+puede cambiar: las que filtran por el estado/nivel del documento (antes o
+después del cambio) y cuyo tramo de (created_at, id) lo incluye.
+
+Cada proceso tiene su propia caché. Las invalidaciones llegan a todos a
+través de los eventos de los documentos (apply_event, suscrito al broker de
+events al arrancar): con EVENTS_BROKER=postgres, una subida o una firma en
+cualquier réplica invalida las páginas de todas. Con el broker "local" solo
+se invalida el proceso que hizo el cambio y los demás sirven sus páginas
+hasta que expiran (INBOX_CACHE_TTL_SECONDS).
+
+El almacenamiento es intercambiable (INBOX_CACHE_BACKEND):
+- "local": LRU en memoria con expiración por TTL (por defecto).
+- "none": no guarda nada; útil para desactivar la caché o para comparar.
+"""
+
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Optional, Tuple
+
+from .config import INBOX_CACHE_BACKEND, INBOX_CACHE_MAX_ENTRIES, INBOX_CACHE_TTL_SECONDS
+
+
+class CacheBackend:
+    """Interfaz mínima de un almacenamiento para la caché."""
+
+    def get(self, key):
+        raise NotImplementedError
+
+    def set(self, key, value):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def items(self):
+        """Copia de los pares (clave, valor) vigentes."""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+
+class LocalCacheBackend(CacheBackend):
+    """LRU acotada con expiración por TTL, segura entre hilos."""
+
+    def __init__(self, max_entries, ttl_seconds):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()  # clave -> (expira_en, valor)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def items(self):
+        now = time.monotonic()
+        with self._lock:
+            return [(key, value) for key, (expires_at, value) in self._entries.items() if expires_at > now]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+
+class NullCacheBackend(CacheBackend):
+    """Almacenamiento que no guarda nada (caché desactivada)."""
+
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def items(self):
+        return []
+
+    def clear(self):
+        pass
+
+    def __len__(self):
+        return 0
+
+
+def create_backend(name, max_entries, ttl_seconds):
+    """Construir el almacenamiento configurado."""
+    if name == "local":
+        return LocalCacheBackend(max_entries, ttl_seconds)
+    if name == "none":
+        return NullCacheBackend()
+    raise ValueError(f"Backend de caché desconocido: {name}")
+
+
+@dataclass
+class CachedPage:
+    """Página cacheada y el tramo de la bandeja que cubre."""
+    status: Optional[str]
+    signer_level: Optional[int]
+    # Cota superior exclusiva (el cursor de la petición) o None si es la primera página
+    before: Optional[Tuple[Any, Any]]
+    # Clave del último documento si la página está llena; None si llega hasta el final
+    last: Optional[Tuple[Any, Any]]
+    value: Any
+
+
+def _matches_filters(page: CachedPage, status, signer_level):
+    if page.status is None:
+        if status == "COMPLETADO":
+            return False
+    elif page.status != status:
+        return False
+    return page.signer_level is None or page.signer_level == signer_level
+
+
+class InboxCache:
+    """Caché de páginas de la bandeja de entrada con invalidación precisa."""
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def make_key(status, signer_level, limit, cursor):
+        return (status, signer_level, limit, cursor)
+
+    def get(self, key):
+        page = self.backend.get(key)
+        with self._lock:
+            if page is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return page.value
+
+    def generation(self):
+        """Marca que se toma antes de consultar la base de datos (ver store)."""
+        with self._lock:
+            return self._generation
+
+    def store(self, key, page: CachedPage, generation):
+        """
+        Guardar una página leída de la base de datos. Si hubo alguna
+        invalidación mientras se consultaba, la página puede estar obsoleta
+        y no se guarda.
+        """
+        with self._lock:
+            if generation != self._generation:
+                return
+        self.backend.set(key, page)
+
+    def invalidate_document(self, created_at, document_id, before=None, after=None):
+        """
+        Invalidar las páginas afectadas por un documento que cambia de
+        estado. `before` y `after` son (status, current_signer_level) antes y
+        después del cambio; `before` es None para un documento nuevo.
+        """
+        position = (created_at, document_id)
+        states = [state for state in (before, after) if state is not None]
+        with self._lock:
+            self._generation += 1
+        for key, page in self.backend.items():
+            if not any(_matches_filters(page, status, level) for status, level in states):
+                continue
+            if page.before is not None and not position < page.before:
+                continue
+            if page.last is not None and position < page.last:
+                continue
+            self.backend.delete(key)
+            with self._lock:
+                self.invalidations += 1
+
+    def apply_event(self, event):
+        """
+        Invalidar según un evento de events.publish_document_event, de este
+        proceso o de otra réplica. Un "resync" (eventos posiblemente
+        perdidos) vacía la caché.
+        """
+        if event.get("type") == "resync":
+            self.clear()
+            return
+        if event.get("type") not in ("document.uploaded", "document.signed") or "created_at" not in event:
+            return
+        before = None
+        if "previous_status" in event:
+            before = (event["previous_status"], event["previous_signer_level"])
+        self.invalidate_document(
+            datetime.fromisoformat(event["created_at"]), uuid.UUID(event["document_id"]),
+            before=before, after=(event["status"], event["current_signer_level"])
+        )
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+        self.backend.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "backend": type(self.backend).__name__,
+                "entries": len(self.backend),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "invalidations": self.invalidations,
+            }
+
+
+# Caché compartida por todo el proceso
+inbox_cache = InboxCache(create_backend(INBOX_CACHE_BACKEND, INBOX_CACHE_MAX_ENTRIES, INBOX_CACHE_TTL_SECONDS))
@@ -1,4 +1,106 @@
 # Este archivo contendrá todas las variables de configuración de la aplicación.
+import os
 
 # Nombre del bucket que usaremos en MinIO
-DOCUMENTS_BUCKET = "documents"
\ No newline at end of file
+DOCUMENTS_BUCKET = "documents"
+
+# Sesiones de firmante: cuánto tiempo (segundos) permanece desbloqueado un
+# certificado en memoria y cuántos certificados distintos se guardan como máximo.
+SIGNER_SESSION_TTL_SECONDS = int(os.environ.get("SIGNER_SESSION_TTL_SECONDS", "900"))
+SIGNER_SESSION_MAX_ENTRIES = int(os.environ.get("SIGNER_SESSION_MAX_ENTRIES", "256"))
+
+# Inspección de certificados: resúmenes guardados en la caché LRU, máximo de
+# archivos por petición de /inspect/bulk y tamaño máximo de cada archivo.
+CERT_INSPECT_CACHE_MAX_ENTRIES = int(os.environ.get("CERT_INSPECT_CACHE_MAX_ENTRIES", "1024"))
+CERT_INSPECT_MAX_FILES = int(os.environ.get("CERT_INSPECT_MAX_FILES", "50"))
+CERT_INSPECT_MAX_BYTES = int(os.environ.get("CERT_INSPECT_MAX_BYTES", str(1024 * 1024)))
+
+# Validación de cadenas sin conexión: directorio de CAs raíz e intermedias de
+# confianza, directorio de CRLs, cada cuántos segundos se comprueba si esos
+# archivos cambiaron, si un emisor sin CRL vigente invalida la cadena y si se
+# rechaza firmar con un certificado cuya cadena no es válida ("off" o "enforce").
+TRUST_STORE_DIR = os.environ.get("TRUST_STORE_DIR", "")
+CRL_DIR = os.environ.get("CRL_DIR", "")
+TRUST_STORE_RELOAD_SECONDS = float(os.environ.get("TRUST_STORE_RELOAD_SECONDS", "30"))
+CERT_CHAIN_REQUIRE_CRL = os.environ.get("CERT_CHAIN_REQUIRE_CRL", "0") == "1"
+CERT_CHAIN_VALIDATION = os.environ.get("CERT_CHAIN_VALIDATION", "off")
+
+# Firma por lotes: máximo de documentos por petición y cuántos de ellos se
+# procesan (descarga, firma y subida) a la vez.
+BATCH_SIGN_MAX_DOCUMENTS = int(os.environ.get("BATCH_SIGN_MAX_DOCUMENTS", "100"))
+BATCH_SIGN_MAX_WORKERS = int(os.environ.get("BATCH_SIGN_MAX_WORKERS", "4"))
+
+# Modelo de ejecución: hilos para E/S bloqueante (MinIO, base de datos,
+# archivos) y procesos para trabajo de CPU (estampa y firma/hash del PDF).
+# CPU_POOL_MAX_WORKERS=0 desactiva el pool de procesos y usa el de hilos.
+IO_POOL_MAX_WORKERS = int(os.environ.get("IO_POOL_MAX_WORKERS", "16"))
+CPU_POOL_MAX_WORKERS = int(os.environ.get("CPU_POOL_MAX_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+# Bandeja de entrada: tamaño de página por defecto y máximo de GET /pending.
+PENDING_PAGE_DEFAULT_SIZE = int(os.environ.get("PENDING_PAGE_DEFAULT_SIZE", "50"))
+PENDING_PAGE_MAX_SIZE = int(os.environ.get("PENDING_PAGE_MAX_SIZE", "200"))
+
+# Caché de la bandeja de entrada: almacenamiento ("local" o "none"), número
+# máximo de páginas guardadas y segundos que vive cada una. La caché es de
+# cada proceso: con varios workers o réplicas, las invalidaciones solo llegan
+# a todos con EVENTS_BROKER=postgres; con el broker "local", los demás
+# procesos pueden servir una página obsoleta durante el TTL.
+INBOX_CACHE_BACKEND = os.environ.get("INBOX_CACHE_BACKEND", "local")
+INBOX_CACHE_MAX_ENTRIES = int(os.environ.get("INBOX_CACHE_MAX_ENTRIES", "1024"))
+INBOX_CACHE_TTL_SECONDS = float(os.environ.get("INBOX_CACHE_TTL_SECONDS", "30"))
+
+# Eventos de la bandeja de entrada (SSE): broker ("local" o "postgres" para
+# repartir entre réplicas con LISTEN/NOTIFY), canal de NOTIFY, eventos que
+# se acumulan por cliente antes de pedirle que resincronice y cada cuántos
+# segundos se envía un latido para mantener viva la conexión.
+EVENTS_BROKER = os.environ.get("EVENTS_BROKER", "local")
+EVENTS_CHANNEL = os.environ.get("EVENTS_CHANNEL", "document_events")
+EVENTS_QUEUE_SIZE = int(os.environ.get("EVENTS_QUEUE_SIZE", "100"))
+EVENTS_HEARTBEAT_SECONDS = float(os.environ.get("EVENTS_HEARTBEAT_SECONDS", "15"))
+
+# Firma asíncrona: trabajos que se firman a la vez en este proceso, máximo de
+# trabajos en cola antes de rechazar nuevos (503), tamaño a partir del cual
+# mode=auto usa un trabajo en lugar de la firma síncrona, y tras cuántos
+# segundos se da por perdido un trabajo sin terminar (p. ej. si se reinició
+# el proceso que tenía el certificado).
+SIGNING_JOB_WORKERS = int(os.environ.get("SIGNING_JOB_WORKERS", "2"))
+SIGNING_JOB_MAX_QUEUED = int(os.environ.get("SIGNING_JOB_MAX_QUEUED", "500"))
+SIGN_SYNC_MAX_BYTES = int(os.environ.get("SIGN_SYNC_MAX_BYTES", str(10 * 1024 * 1024)))
+SIGNING_JOB_TIMEOUT_SECONDS = int(os.environ.get("SIGNING_JOB_TIMEOUT_SECONDS", "1800"))
+
+# Métricas de Prometheus en /metrics. METRICS_LOG_TRACES=1 imprime además una
+# línea JSON con los tiempos por etapa de cada operación.
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") == "1"
+METRICS_LOG_TRACES = os.environ.get("METRICS_LOG_TRACES", "0") == "1"
+
+# Revisiones firmadas: cada firma se guarda como el incremento que añadió al
+# PDF. Tras STORAGE_MAX_DELTA_CHAIN incrementos seguidos se guarda el PDF
+# completo, para acotar el número de objetos que hay que leer.
+STORAGE_MAX_DELTA_CHAIN = int(os.environ.get("STORAGE_MAX_DELTA_CHAIN", "16"))
+
+# Recolección de objetos de contenido sin revisiones (los de una firma que
+# falló o perdió la comprobación de versión): cada cuántos segundos se barre
+# (0 = nunca), cuántos segundos deben pasar desde que se escribieron y cuántos
+# se borran como máximo en cada barrido.
+STORAGE_GC_INTERVAL_SECONDS = float(os.environ.get("STORAGE_GC_INTERVAL_SECONDS", "3600"))
+STORAGE_GC_GRACE_SECONDS = float(os.environ.get("STORAGE_GC_GRACE_SECONDS", "3600"))
+STORAGE_GC_BATCH_SIZE = min(1000, int(os.environ.get("STORAGE_GC_BATCH_SIZE", "500")))
+
+# Apariencia por defecto de la estampa de firma: "raster" (imagen PNG) o
+# "vector" (QR como trazado y texto con una fuente incrustada una vez por
+# documento). Cada petición de firma puede elegir la suya.
+STAMP_APPEARANCE = os.environ.get("STAMP_APPEARANCE", "raster")
+
+# Miniaturas de las páginas (GET /api/documents/{id}/pages): se generan al
+# subir un documento y tras cada firma, con THUMBNAIL_WIDTH píxeles de ancho
+# y calidad JPEG THUMBNAIL_QUALITY. Las páginas se reparten entre el pool de
+# procesos en grupos de hasta THUMBNAIL_PAGES_PER_TASK; se generan a la vez
+# las de THUMBNAIL_MAX_CONCURRENT revisiones, y se guardan en memoria los
+# índices de THUMBNAIL_CACHE_MAX_ENTRIES revisiones. Con THUMBNAILS_ENABLED=0
+# no se generan en segundo plano, solo cuando se piden.
+THUMBNAILS_ENABLED = os.environ.get("THUMBNAILS_ENABLED", "1") == "1"
+THUMBNAIL_WIDTH = int(os.environ.get("THUMBNAIL_WIDTH", "640"))
+THUMBNAIL_QUALITY = int(os.environ.get("THUMBNAIL_QUALITY", "80"))
+THUMBNAIL_PAGES_PER_TASK = int(os.environ.get("THUMBNAIL_PAGES_PER_TASK", "8"))
+THUMBNAIL_MAX_CONCURRENT = int(os.environ.get("THUMBNAIL_MAX_CONCURRENT", "2"))
+THUMBNAIL_CACHE_MAX_ENTRIES = int(os.environ.get("THUMBNAIL_CACHE_MAX_ENTRIES", "1024"))
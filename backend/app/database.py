@@ -1,19 +1,107 @@
 import os
-from sqlalchemy import create_engine
+import time
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from . import metrics
 
 # Leemos la URL de conexión a la base de datos desde las variables de entorno
 # que definimos en docker-compose.yml
 DATABASE_URL = os.environ.get("DATABASE_URL")
 
+# URL del motor asíncrono (por defecto, la misma base con asyncpg o aiosqlite)
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def async_database_url(url):
+    """URL equivalente con el driver asíncrono (asyncpg para PostgreSQL)."""
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+
+# Pool de conexiones de cada motor: conexiones permanentes, adicionales en
+# picos, segundos de espera por una conexión libre antes de fallar, segundos
+# tras los que se recicla una conexión (antes de que la cierre el servidor o
+# un proxy) y si se comprueba cada conexión con un ping al sacarla del pool.
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.environ.get("DB_POOL_PRE_PING", "1") == "1"
+
+
+class _TimedPoolMixin:
+    """Mide cuánto espera cada petición por una conexión del pool."""
+
+    engine_label = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            metrics.DB_POOL_CHECKOUT.labels(self.engine_label).observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    engine_label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    engine_label = "async"
+
+
+def _pool_options(url, pool_class):
+    """Opciones de pool para create_engine (SQLite en memoria usa su propio pool)."""
+    url = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    if url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:"):
+        return options
+    options.update(
+        poolclass=pool_class,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def _track_pool(engine, label):
+    """Conexiones en uso y capacidad del pool, para ver su saturación en /metrics."""
+    in_use = metrics.DB_POOL_IN_USE.labels(label)
+    metrics.DB_POOL_CAPACITY.labels(label).set(DB_POOL_SIZE + DB_MAX_OVERFLOW)
+    event.listen(engine, "checkout", lambda *args: in_use.inc())
+    event.listen(engine, "checkin", lambda *args: in_use.dec())
+
+
 # Creamos el "motor" de SQLAlchemy. Este es el punto de entrada principal
-# para la base de datos.
-engine = create_engine(DATABASE_URL)
+# para la base de datos. Lo usan los trabajos de firma, los eventos y las
+# rutas que aún no son asíncronas.
+engine = create_engine(DATABASE_URL, **_pool_options(DATABASE_URL, TimedQueuePool))
+_track_pool(engine.pool, "sync")
 
 # Cada instancia de SessionLocal será una sesión de base de datos.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono: las rutas de documentos consultan la base de datos sin
+# ocupar un hilo del pool de E/S mientras esperan
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **_pool_options(ASYNC_DATABASE_URL, TimedAsyncQueuePool))
+_track_pool(async_engine.sync_engine.pool, "async")
+
+# Los objetos siguen cargados tras el commit: acceder a un atributo expirado
+# fuera de la sesión obligaría a consultar de forma síncrona
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+
 # Usaremos esta clase Base para crear cada uno de los modelos ORM (las tablas)
 Base = declarative_base()
 
@@ -23,4 +111,35 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+async def get_async_db():
+    """Como get_db, con una AsyncSession."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+def upgrade_schema(metadata):
+    """
+    Crear las tablas que falten y añadir a las existentes las columnas e
+    índices declarados después de crearlas (create_all no modifica tablas
+    que ya existen). Las columnas nuevas deben admitir NULL o tener un
+    server_default; las claves foráneas de columnas añadidas así no se crean.
+    """
+    metadata.create_all(bind=engine)
+    inspector = inspect(engine)
+    with engine.begin() as conn:
+        for table in metadata.sorted_tables:
+            existing = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing:
+                    continue
+                ddl = f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(dialect=engine.dialect)}"
+                if column.server_default is not None:
+                    ddl += f" DEFAULT {column.server_default.arg}"
+                if not column.nullable:
+                    ddl += " NOT NULL"
+                conn.execute(text(ddl))
+                print(f"Columna '{table.name}.{column.name}' añadida.")
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
@@ -0,0 +1,204 @@
+"""
+Publicación de cambios de estado de los documentos (subida, firma).
+
+Los clientes se suscriben a GET /api/documents/events (Server-Sent Events)
+en lugar de consultar /pending periódicamente. El reparto entre clientes se
+hace con un broker intercambiable (EVENTS_BROKER):
+- "local": pub/sub en memoria; solo ve los eventos de este proceso.
+- "postgres": LISTEN/NOTIFY sobre la base de datos, de modo que todas las
+  réplicas del backend reciben los eventos de cualquiera de ellas.
+"""
+
+import asyncio
+import json
+import select
+import threading
+import time
+
+from .config import EVENTS_BROKER, EVENTS_CHANNEL, EVENTS_QUEUE_SIZE
+from .executors import run_io
+
+
+def _offer(queue: asyncio.Queue, event):
+    """Encolar un evento; si el cliente va atrasado, se le pide resincronizar."""
+    if queue.full():
+        while not queue.empty():
+            queue.get_nowait()
+        event = {"type": "resync"}
+    queue.put_nowait(event)
+
+
+class LocalBroker:
+    """Pub/sub en memoria: cada suscriptor tiene su propia cola acotada."""
+
+    def __init__(self, queue_size):
+        self.queue_size = queue_size
+        self._subscribers = {}  # cola -> bucle de eventos que la consume
+        self._listeners = []
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers[queue] = asyncio.get_running_loop()
+        return queue
+
+    def unsubscribe(self, queue):
+        with self._lock:
+            self._subscribers.pop(queue, None)
+
+    def add_listener(self, listener):
+        """
+        Llamar a listener(event) con cada evento que llegue a este proceso,
+        incluidos los de otras réplicas y los "resync". Se llama desde el
+        hilo que reparte el evento: debe ser rápido y seguro entre hilos.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def deliver(self, event):
+        """Repartir un evento a los suscriptores de este proceso (desde cualquier hilo)."""
+        with self._lock:
+            subscribers = list(self._subscribers.items())
+            listeners = list(self._listeners)
+        for listener in listeners:
+            try:
+                listener(event)
+            except Exception as e:
+                print(f"Error procesando el evento '{event.get('type')}': {e}")
+        for queue, loop in subscribers:
+            try:
+                loop.call_soon_threadsafe(_offer, queue, event)
+            except RuntimeError:
+                # El bucle del suscriptor ya se cerró
+                self.unsubscribe(queue)
+
+    async def publish(self, event):
+        self.deliver(event)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def __len__(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class PostgresBroker(LocalBroker):
+    """
+    Pub/sub entre réplicas con LISTEN/NOTIFY. publish() envía un NOTIFY y un
+    hilo escucha el canal y reparte lo recibido (también lo publicado por
+    este mismo proceso) a los suscriptores locales.
+    """
+
+    def __init__(self, queue_size, dsn, channel):
+        super().__init__(queue_size)
+        self.dsn = dsn
+        self.channel = channel
+        self._notify_conn = None
+        self._notify_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._listener = None
+
+    def _connect(self):
+        import psycopg2
+        import psycopg2.extensions
+
+        conn = psycopg2.connect(self.dsn)
+        conn.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        return conn
+
+    def start(self):
+        self._stop.clear()
+        self._listener = threading.Thread(target=self._listen, name="events-listener", daemon=True)
+        self._listener.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+        with self._notify_lock:
+            if self._notify_conn is not None:
+                self._notify_conn.close()
+                self._notify_conn = None
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                conn = self._connect()
+            except Exception as e:
+                print(f"No se pudo conectar al canal de eventos: {e}")
+                time.sleep(1)
+                continue
+            try:
+                with conn.cursor() as cur:
+                    cur.execute(f'LISTEN "{self.channel}"')
+                while not self._stop.is_set():
+                    if select.select([conn], [], [], 1.0) == ([], [], []):
+                        continue
+                    conn.poll()
+                    while conn.notifies:
+                        notify = conn.notifies.pop(0)
+                        self.deliver(json.loads(notify.payload))
+            except Exception as e:
+                print(f"Se perdió la conexión del canal de eventos: {e}")
+                # Los clientes pudieron perder eventos mientras no escuchábamos
+                self.deliver({"type": "resync"})
+                time.sleep(1)
+            finally:
+                conn.close()
+
+    def _notify(self, payload):
+        with self._notify_lock:
+            if self._notify_conn is None or self._notify_conn.closed:
+                self._notify_conn = self._connect()
+            with self._notify_conn.cursor() as cur:
+                cur.execute("SELECT pg_notify(%s, %s)", (self.channel, payload))
+
+    async def publish(self, event):
+        await run_io(self._notify, json.dumps(event))
+
+
+def create_broker(name):
+    """Construir el broker configurado."""
+    if name == "local":
+        return LocalBroker(EVENTS_QUEUE_SIZE)
+    if name == "postgres":
+        from .database import engine
+
+        dsn = engine.url.set(drivername="postgresql").render_as_string(hide_password=False)
+        return PostgresBroker(EVENTS_QUEUE_SIZE, dsn, EVENTS_CHANNEL)
+    raise ValueError(f"Broker de eventos desconocido: {name}")
+
+
+broker = create_broker(EVENTS_BROKER)
+
+
+async def publish_document_event(event_type, document_id, created_at, state, previous=None):
+    """
+    Publicar el nuevo estado (status, current_signer_level) de un documento.
+    Se llama después del commit; un fallo al publicar no debe deshacer la
+    operación ya confirmada. created_at sitúa el documento en la bandeja
+    (ver cache.InboxCache.apply_event).
+    """
+    event = {
+        "type": event_type,
+        "document_id": str(document_id),
+        "created_at": created_at.isoformat(),
+        "status": state[0],
+        "current_signer_level": state[1],
+    }
+    if previous is not None:
+        event["previous_status"], event["previous_signer_level"] = previous
+    try:
+        await broker.publish(event)
+    except Exception as e:
+        print(f"No se pudo publicar el evento '{event_type}': {e}")
+
+
+def format_sse(event):
+    """Serializar un evento en el formato de Server-Sent Events."""
+    return f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
@@ -0,0 +1,58 @@
+"""
+Pools de ejecución para sacar del bucle de eventos el trabajo bloqueante.
+
+- run_io: E/S bloqueante (boto3, sesiones de SQLAlchemy, archivos) en un
+  pool de hilos acotado.
+- run_cpu: trabajo de CPU (renderizado de la estampa, hash y firma del PDF)
+  en un pool de procesos, para no competir por el GIL con las peticiones.
+"""
+
+import asyncio
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from .config import IO_POOL_MAX_WORKERS, CPU_POOL_MAX_WORKERS
+
+io_executor = ThreadPoolExecutor(max_workers=IO_POOL_MAX_WORKERS, thread_name_prefix="io")
+
+_cpu_executor = None
+
+
+def get_cpu_executor():
+    """Crear el pool de procesos la primera vez que se necesita (None si está desactivado)."""
+    global _cpu_executor
+    if _cpu_executor is None and CPU_POOL_MAX_WORKERS > 0:
+        # "spawn" evita heredar hilos y conexiones abiertas del proceso de uvicorn
+        _cpu_executor = ProcessPoolExecutor(
+            max_workers=CPU_POOL_MAX_WORKERS,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+    return _cpu_executor
+
+
+async def run_io(func, *args, **kwargs):
+    """Ejecutar una función bloqueante de E/S en el pool de hilos."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(io_executor, functools.partial(func, *args, **kwargs))
+
+
+async def run_cpu(func, *args, **kwargs):
+    """
+    Ejecutar una función de CPU en el pool de procesos. La función y sus
+    argumentos deben poder serializarse con pickle.
+    """
+    executor = get_cpu_executor()
+    if executor is None:
+        return await run_io(func, *args, **kwargs)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(executor, functools.partial(func, *args, **kwargs))
+
+
+def shutdown():
+    """Cerrar los pools al apagar la aplicación."""
+    global _cpu_executor
+    if _cpu_executor is not None:
+        _cpu_executor.shutdown(wait=True, cancel_futures=True)
+        _cpu_executor = None
+    io_executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,109 @@
+"""
+Utilidades HTTP para servir documentos: peticiones condicionales
+(ETag / If-None-Match, Last-Modified / If-Modified-Since) y rangos de bytes
+(Range / If-Range / 206 Partial Content).
+"""
+
+from datetime import timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional, Tuple
+
+
+class RangeNotSatisfiable(Exception):
+    """El rango pedido queda fuera del tamaño del recurso (responder 416)."""
+
+
+def as_utc(value):
+    """Pasar un datetime a UTC; los que no tienen zona (SQLite) ya están en UTC."""
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value.astimezone(timezone.utc)
+
+
+def format_http_date(value):
+    """Formatear un datetime como fecha HTTP (RFC 7231)."""
+    return format_datetime(value, usegmt=True)
+
+
+def _parse_http_date(value):
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+
+
+def _etag_matches(header_value: str, etag: str):
+    """Comparación débil de ETags contra una lista de If-None-Match / If-Range."""
+    if header_value.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in header_value.split(",")]
+    bare = etag[2:] if etag.startswith("W/") else etag
+    return any((tag[2:] if tag.startswith("W/") else tag) == bare for tag in candidates)
+
+
+def is_not_modified(headers, etag: str, last_modified) -> bool:
+    """
+    Decidir si se puede responder 304. If-None-Match tiene prioridad sobre
+    If-Modified-Since, como indica RFC 7232.
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        since = _parse_http_date(if_modified_since)
+        if since is not None:
+            return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+def if_range_allows(headers, etag: str, last_modified) -> bool:
+    """Si hay If-Range, solo se sirve el rango cuando el recurso no cambió."""
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        # If-Range exige comparación fuerte
+        return not if_range.startswith("W/") and if_range == etag
+    since = _parse_http_date(if_range)
+    return since is not None and last_modified is not None and last_modified.replace(microsecond=0) == since
+
+
+def parse_byte_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interpretar una cabecera Range de un único rango de bytes.
+
+    Returns:
+        (inicio, fin) inclusivos, o None si no hay rango utilizable (cabecera
+        ausente, mal formada o con varios rangos): se sirve el recurso completo.
+    Raises:
+        RangeNotSatisfiable: si el rango es válido pero no se puede satisfacer.
+    """
+    if not header:
+        return None
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    first, sep, last = spec.strip().partition("-")
+    if not sep:
+        return None
+    if size <= 0:
+        raise RangeNotSatisfiable()
+    try:
+        if first == "":
+            # Rango de sufijo: los últimos N bytes
+            suffix = int(last)
+            if suffix <= 0:
+                raise RangeNotSatisfiable()
+            return max(0, size - suffix), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start < 0:
+        return None
+    # Antes de comparar con el fin: en "bytes=<size>-" el fin es size - 1
+    if start >= size:
+        raise RangeNotSatisfiable()
+    if end < start:
+        return None
+    return start, min(end, size - 1)
@@ -0,0 +1,197 @@
+"""
+Cola de trabajos de firma asíncrona.
+
+POST /api/documents/{id}/sign con mode=async registra un trabajo en la tabla
+signing_jobs y responde 202 de inmediato; un conjunto acotado de workers de
+este proceso descarga, firma y sube el documento, y el cliente consulta el
+estado en GET /api/jobs/{id} y recoge el PDF firmado en /api/jobs/{id}/result.
+
+La tabla es la fuente de verdad del estado de cada trabajo, pero el
+certificado desbloqueado no se guarda en ella: solo vive en la memoria del
+proceso que aceptó el trabajo (columna owner). Si ese proceso se reinicia,
+sus trabajos pendientes se marcan como fallidos al vencer
+SIGNING_JOB_TIMEOUT_SECONDS y el cliente debe volver a enviarlos.
+"""
+
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timezone
+
+from . import database, metrics, models
+from .config import SIGNING_JOB_WORKERS, SIGNING_JOB_MAX_QUEUED, SIGNING_JOB_TIMEOUT_SECONDS, STAMP_APPEARANCE
+from .executors import run_io
+from .signing import DocumentConflict, SigningError, sign_stored_document, planned_field_name, record_signature, notify_signed, create_temp_dir, cleanup_temp_dir
+from .thumbnails import page_thumbnails
+from .storage import current_version
+
+JOB_QUEUED = "EN_COLA"
+JOB_RUNNING = "EN_PROCESO"
+JOB_COMPLETED = "COMPLETADO"
+JOB_FAILED = "FALLIDO"
+
+# Identifica a este proceso como dueño de los trabajos que acepta
+OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+
+class QueueFull(Exception):
+    """Hay demasiados trabajos en cola en este proceso."""
+
+
+# --- Acceso a la base de datos (se ejecuta en el pool de hilos de E/S) ---
+def get_job(db, job_id):
+    return db.query(models.SigningJob).filter(models.SigningJob.id == job_id).first()
+
+
+def _get_document(db, document_id):
+    return db.query(models.Document).filter(models.Document.id == document_id).first()
+
+
+def _add_job(db, job):
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def _set_status(db, job_id, from_status, **values):
+    """Cambiar el estado de un trabajo solo si sigue en from_status. Devuelve si cambió."""
+    query = db.query(models.SigningJob).filter(models.SigningJob.id == job_id)
+    if from_status is not None:
+        query = query.filter(models.SigningJob.status.in_(from_status))
+    updated = query.update(values, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+
+def _now():
+    return datetime.now(timezone.utc)
+
+
+def expire_if_stale(db, job):
+    """
+    Marcar como fallido un trabajo que lleva demasiado tiempo sin terminar en
+    otro proceso (que probablemente se reinició y perdió el certificado).
+    """
+    if job.status not in (JOB_QUEUED, JOB_RUNNING) or job.owner == OWNER or job.created_at is None:
+        return job
+    created_at = job.created_at if job.created_at.tzinfo else job.created_at.replace(tzinfo=timezone.utc)
+    if (_now() - created_at).total_seconds() < SIGNING_JOB_TIMEOUT_SECONDS:
+        return job
+    _set_status(
+        db, job.id, (JOB_QUEUED, JOB_RUNNING),
+        status=JOB_FAILED, finished_at=_now(),
+        detail="El trabajo no terminó a tiempo; vuelva a enviarlo."
+    )
+    db.refresh(job)
+    return job
+
+
+class SigningJobQueue:
+    """Workers de firma asíncrona de este proceso."""
+
+    def __init__(self, workers, max_queued):
+        self.workers = workers
+        self.max_queued = max_queued
+        self._queue = None
+        self._signers = {}  # id del trabajo -> PDFSigner, mientras está pendiente
+        self._busy_documents = {}  # id del documento -> evento que se activa al terminar su trabajo
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def __len__(self):
+        return len(self._signers)
+
+    async def enqueue(self, db, document_id, signer, **params):
+        """
+        Registrar un trabajo (con la AsyncSession de la petición) y ponerlo en cola.
+
+        Raises:
+            QueueFull: si ya hay SIGNING_JOB_MAX_QUEUED trabajos pendientes.
+        """
+        if len(self._signers) >= self.max_queued:
+            raise QueueFull()
+        job = models.SigningJob(id=uuid.uuid4(), document_id=document_id, status=JOB_QUEUED, owner=OWNER, **params)
+        await db.run_sync(_add_job, job)
+        self._signers[job.id] = signer
+        self._queue.put_nowait((job.id, document_id))
+        metrics.SIGNING_JOBS_PENDING.inc()
+        return job
+
+    async def _worker(self):
+        while True:
+            job_id, document_id = await self._queue.get()
+            # Los trabajos de un mismo documento se ejecutan de uno en uno
+            while document_id in self._busy_documents:
+                await self._busy_documents[document_id].wait()
+            done = self._busy_documents[document_id] = asyncio.Event()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                print(f"Error inesperado en el trabajo de firma {job_id}: {e}")
+            finally:
+                del self._busy_documents[document_id]
+                done.set()
+                metrics.SIGNING_JOBS_PENDING.dec()
+
+    async def _run(self, job_id):
+        signer = self._signers.pop(job_id)
+        trace = metrics.start_trace("sign_job")
+        db = database.SessionLocal()
+        temp_dir = create_temp_dir()
+        try:
+            if not await run_io(_set_status, db, job_id, (JOB_QUEUED,), status=JOB_RUNNING, started_at=_now()):
+                return
+            job = await run_io(get_job, db, job_id)
+            doc_record = await run_io(_get_document, db, job.document_id)
+            if not doc_record:
+                await self._fail(db, job_id, "Documento no encontrado.")
+                return
+            if doc_record.current_signer_level != job.signer_level:
+                await self._fail(db, job_id, f"No es el turno de este firmante. Se espera el nivel {doc_record.current_signer_level}.")
+                return
+
+            version = await run_io(current_version, db, doc_record)
+            signed = await sign_stored_document(
+                signer, version, temp_dir,
+                job.reason, job.location, job.page_index, job.x_coord, job.y_coord, job.width, trace,
+                field_name=planned_field_name(doc_record), appearance=job.appearance or STAMP_APPEARANCE
+            )
+            change = await run_io(record_signature, db, doc_record, signer.cert_subject, job.signer_level, signed)
+            job.status = JOB_COMPLETED
+            job.signature_id = change.signature.id
+            job.finished_at = _now()
+            with trace.span("db_commit"):
+                await run_io(db.commit)
+            await notify_signed(change)
+            page_thumbnails.schedule_signature(change)
+        except SigningError as e:
+            await run_io(db.rollback)
+            await self._fail(db, job_id, f"Error técnico al firmar: {e}")
+        except DocumentConflict as e:
+            await run_io(db.rollback)
+            await self._fail(db, job_id, str(e))
+        except Exception as e:
+            await run_io(db.rollback)
+            await self._fail(db, job_id, f"Error inesperado en el servidor: {e}")
+        finally:
+            await run_io(cleanup_temp_dir, temp_dir)
+            await run_io(db.close)
+            trace.finish(job_id=job_id)
+
+    async def _fail(self, db, job_id, detail):
+        await run_io(_set_status, db, job_id, None, status=JOB_FAILED, detail=detail, finished_at=_now())
+
+
+# Cola compartida por todo el proceso
+signing_jobs = SigningJobQueue(workers=SIGNING_JOB_WORKERS, max_queued=SIGNING_JOB_MAX_QUEUED)
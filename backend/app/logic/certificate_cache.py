@@ -0,0 +1,183 @@
+"""
+Caché en memoria de la inspección de certificados.
+
+El resumen de cada certificado (CertificateValidator.get_certificate_summary,
+sin la clave privada ni la información de depuración) se guarda indexado por
+la huella SHA-256 de su DER, de modo que un mismo certificado se analiza una
+sola vez aunque llegue en archivos distintos. La vigencia (is_valid,
+days_until_expiry) se recalcula en cada consulta.
+
+Desbloquear un .p12 es mucho más caro que analizar el certificado (PBKDF2
+con miles de iteraciones), así que también se recuerda qué certificado
+contiene cada archivo, indexado por el SHA-256 del archivo. La entrada solo
+se usa si la contraseña coincide, lo que se comprueba con un HMAC de la
+contraseña bajo una clave aleatoria del proceso: la contraseña nunca se
+guarda y una contraseña incorrecta vuelve a pasar por el desbloqueo.
+
+Con un ChainValidator, cada consulta añade el estado de la cadena
+(chain_status, chain_detail); no se guarda porque depende de las CRLs.
+"""
+
+import hashlib
+import hmac
+import secrets
+import threading
+from collections import OrderedDict, namedtuple
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+from .certificate_validator import CertificateValidator, validity_status
+from .chain_validation import STATUS_NOT_CONFIGURED
+
+# Formatos de archivo admitidos
+FORMAT_PKCS12 = "pkcs12"
+FORMAT_PEM = "pem"
+FORMAT_DER = "der"
+
+# Certificado extraído de un archivo: DER, formato, si traía clave privada
+# y los demás certificados que lo acompañan (intermedias), en DER
+CertificateFile = namedtuple("CertificateFile", ["der", "format", "has_private_key", "intermediates"])
+
+# Resumen guardado de un certificado, sus fechas de validez (para recalcular
+# la vigencia) y el certificado ya cargado (para validar su cadena)
+_CachedSummary = namedtuple("_CachedSummary", ["summary", "not_before", "not_after", "certificate"])
+
+# Archivo ya abierto: verificador de la contraseña, certificado que contiene e intermedias
+_CachedFile = namedtuple("_CachedFile", ["verifier", "fingerprint", "format", "has_private_key", "intermediates"])
+
+
+def read_certificate_file(data, password=None):
+    """
+    Extraer el certificado de un archivo .p12, .pem o .cer/.der. Desbloquear
+    un .p12 es trabajo de CPU: se ejecuta en el pool de procesos y solo
+    devuelve el certificado, nunca la clave privada.
+
+    Raises:
+        ValueError: si el archivo está corrupto, no contiene un certificado
+            o la contraseña es incorrecta.
+    """
+    to_der = lambda certificate: certificate.public_bytes(serialization.Encoding.DER)
+    if data.lstrip().startswith(b"-----BEGIN"):
+        # Un PEM puede traer la cadena: el primero es el certificado
+        certificate, *others = x509.load_pem_x509_certificates(data)
+        return CertificateFile(to_der(certificate), FORMAT_PEM, False, tuple(map(to_der, others)))
+    try:
+        x509.load_der_x509_certificate(data)
+        return CertificateFile(data, FORMAT_DER, False, ())
+    except ValueError:
+        pass
+    private_key, certificate, others = pkcs12.load_key_and_certificates(
+        data, password.encode("utf-8") if password else None
+    )
+    if certificate is None:
+        raise ValueError("El archivo no contiene un certificado.")
+    return CertificateFile(to_der(certificate), FORMAT_PKCS12, private_key is not None, tuple(map(to_der, others)))
+
+
+def summarize_certificate(der):
+    """Resumen de un certificado DER, sin la parte que depende de la hora actual."""
+    certificate = x509.load_der_x509_certificate(der)
+    validator = CertificateValidator()
+    validator.load_x509(certificate)
+    summary = validator.get_certificate_summary()
+    if summary is None:
+        raise ValueError("No se pudo leer la información del certificado.")
+    for key in ("is_valid", "days_until_expiry", "debug_info"):
+        summary.pop(key, None)
+    info = validator.certificate_info
+    return _CachedSummary(summary, info["not_valid_before"], info["not_valid_after"], certificate)
+
+
+class CertificateSummaryCache:
+    """Caché LRU acotada de resúmenes de certificados y de archivos ya abiertos, segura entre hilos."""
+
+    def __init__(self, max_entries, chain_validator=None):
+        self.max_entries = max_entries
+        self.chain_validator = chain_validator
+        self._summaries = OrderedDict()  # huella del DER -> _CachedSummary
+        self._files = OrderedDict()      # SHA-256 del archivo -> _CachedFile
+        self._secret = secrets.token_bytes(32)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _verifier(self, file_digest, password):
+        return hmac.new(self._secret, file_digest + (password or "").encode("utf-8"), hashlib.sha256).digest()
+
+    def lookup(self, data, password=None):
+        """
+        Resumen del certificado de un archivo ya inspeccionado con la misma
+        contraseña, o None si hay que abrirlo (ver read_certificate_file y add).
+        """
+        file_digest = hashlib.sha256(data).digest()
+        verifier = self._verifier(file_digest, password)
+        with self._lock:
+            entry = self._files.get(file_digest)
+            if entry is None or not hmac.compare_digest(entry.verifier, verifier):
+                self.misses += 1
+                return None
+            cached = self._summaries.get(entry.fingerprint)
+            if cached is None:
+                self.misses += 1
+                return None
+            self._files.move_to_end(file_digest)
+            self._summaries.move_to_end(entry.fingerprint)
+            self.hits += 1
+        return self._result(entry, cached)
+
+    def add(self, data, password, certificate_file: CertificateFile):
+        """
+        Registrar un archivo ya abierto y devolver el resumen de su
+        certificado, analizándolo solo si la huella no estaba en la caché.
+
+        Raises:
+            ValueError: si no se pudo leer la información del certificado.
+        """
+        fingerprint = hashlib.sha256(certificate_file.der).hexdigest()
+        with self._lock:
+            cached = self._summaries.get(fingerprint)
+        if cached is None:
+            cached = summarize_certificate(certificate_file.der)
+
+        file_digest = hashlib.sha256(data).digest()
+        entry = _CachedFile(
+            self._verifier(file_digest, password), fingerprint, certificate_file.format,
+            certificate_file.has_private_key,
+            tuple(x509.load_der_x509_certificate(der) for der in certificate_file.intermediates)
+        )
+        with self._lock:
+            self._summaries[fingerprint] = cached
+            self._summaries.move_to_end(fingerprint)
+            self._files[file_digest] = entry
+            self._files.move_to_end(file_digest)
+            for entries in (self._summaries, self._files):
+                while len(entries) > self.max_entries:
+                    entries.popitem(last=False)
+        return self._result(entry, cached)
+
+    def _result(self, entry: _CachedFile, cached: _CachedSummary):
+        is_valid, days_until_expiry = validity_status(cached.not_before, cached.not_after)
+        result = dict(
+            cached.summary,
+            fingerprint=entry.fingerprint,
+            format=entry.format,
+            has_private_key=entry.has_private_key,
+            is_valid=is_valid,
+            days_until_expiry=days_until_expiry,
+        )
+        if self.chain_validator is not None:
+            chain = self.chain_validator.validate(cached.certificate, entry.intermediates)
+            if chain.status != STATUS_NOT_CONFIGURED:
+                result.update(chain_status=chain.status, chain_detail=chain.detail)
+        return result
+
+    def clear(self):
+        with self._lock:
+            self._summaries.clear()
+            self._files.clear()
+
+    def __len__(self):
+        with self._lock:
+            return len(self._summaries)
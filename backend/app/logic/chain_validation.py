@@ -0,0 +1,356 @@
+"""
+Validación de cadenas de certificados sin conexión, contra archivos locales.
+
+- TrustStore: raíces e intermedias de un directorio (PEM, varias por archivo,
+  o DER), indexadas por Subject Key Identifier. Solo las raíces
+  (autofirmadas) son anclas de confianza; las intermedias sirven para
+  construir la ruta.
+- CrlIndex: CRLs de un directorio, cada una reducida a un conjunto de
+  números de serie revocados e indexada por el identificador de la clave
+  del emisor, de modo que comprobar un certificado es O(1).
+- ChainValidator: construye la ruta del certificado hasta una raíz,
+  verificando firmas, fechas, restricciones de CA y revocación.
+
+Los directorios se vuelven a leer solo cuando cambia el mtime (o la lista)
+de sus archivos, lo que se comprueba como mucho cada `reload_interval`
+segundos; al cambiar una CRL solo se vuelve a analizar ese archivo.
+"""
+
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes
+
+CERTIFICATE_SUFFIXES = (".pem", ".crt", ".cer", ".der")
+CRL_SUFFIXES = (".crl", ".pem", ".der")
+
+# Máximo de certificados de una ruta (hoja, intermedias y raíz)
+MAX_CHAIN_LENGTH = 10
+
+# Resultados de ChainValidator.validate
+STATUS_VALID = "valid"
+STATUS_NOT_CONFIGURED = "not_configured"
+STATUS_UNTRUSTED = "untrusted"
+STATUS_EXPIRED = "expired"
+STATUS_REVOKED = "revoked"
+STATUS_INVALID = "invalid"
+
+# Estado de revocación de un certificado según las CRLs cargadas
+REVOCATION_GOOD = "good"
+REVOCATION_REVOKED = "revoked"
+REVOCATION_UNKNOWN = "unknown"  # Sin CRL del emisor, firmada por otro o ya caducada
+
+ChainValidationResult = namedtuple("ChainValidationResult", ["valid", "status", "detail", "chain"])
+
+
+def fingerprint(certificate):
+    """SHA-256 del certificado en DER, en hexadecimal."""
+    return certificate.fingerprint(hashes.SHA256()).hex()
+
+
+def subject_key_id(certificate):
+    """Subject Key Identifier del certificado, o el calculado a partir de su clave pública."""
+    try:
+        return certificate.extensions.get_extension_for_class(x509.SubjectKeyIdentifier).value.digest
+    except x509.ExtensionNotFound:
+        return x509.SubjectKeyIdentifier.from_public_key(certificate.public_key()).digest
+
+
+def authority_key_id(obj):
+    """Authority Key Identifier de un certificado o una CRL, o None si no lo tiene."""
+    try:
+        return obj.extensions.get_extension_for_class(x509.AuthorityKeyIdentifier).value.key_identifier
+    except x509.ExtensionNotFound:
+        return None
+
+
+def is_self_issued(certificate):
+    return certificate.issuer == certificate.subject
+
+
+def is_ca(certificate):
+    try:
+        return certificate.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+    except x509.ExtensionNotFound:
+        return False
+
+
+def load_certificates(data):
+    """Certificados de un archivo PEM (uno o varios) o DER."""
+    if b"-----BEGIN" in data:
+        return x509.load_pem_x509_certificates(data)
+    return [x509.load_der_x509_certificate(data)]
+
+
+def load_crl(data):
+    if b"-----BEGIN" in data:
+        return x509.load_pem_x509_crl(data)
+    return x509.load_der_x509_crl(data)
+
+
+def scan_directory(directory, suffixes):
+    """Archivos del directorio con alguna de las extensiones, con su mtime (ns)."""
+    if not directory or not os.path.isdir(directory):
+        return {}
+    snapshot = {}
+    with os.scandir(directory) as entries:
+        for entry in entries:
+            if entry.is_file() and entry.name.lower().endswith(suffixes):
+                snapshot[entry.path] = entry.stat().st_mtime_ns
+    return snapshot
+
+
+class _WatchedDirectory:
+    """Directorio que se vuelve a leer cuando cambian sus archivos."""
+
+    suffixes = ()
+
+    def __init__(self, directory, reload_interval=30.0):
+        self.directory = directory
+        self.reload_interval = reload_interval
+        self._snapshot = None
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.loads = 0  # Veces que se leyó el directorio (para métricas y benchmarks)
+
+    def refresh(self, force=False):
+        """Releer el directorio si cambió; como mucho una comprobación cada reload_interval segundos."""
+        now = time.monotonic()
+        if not force and self._checked_at is not None and now - self._checked_at < self.reload_interval:
+            return
+        with self._lock:
+            if not force and self._checked_at is not None and now - self._checked_at < self.reload_interval:
+                return
+            snapshot = scan_directory(self.directory, self.suffixes)
+            self._checked_at = now
+            if snapshot != self._snapshot:
+                self._load(snapshot)
+                self._snapshot = snapshot
+                self.loads += 1
+
+    def _load(self, snapshot):
+        raise NotImplementedError
+
+
+class CertificateIndex:
+    """Certificados indexados para buscar el emisor de otro por su AKI (o, sin él, por nombre)."""
+
+    def __init__(self, certificates=()):
+        self._by_key_id = {}    # SKI -> [certificados]
+        self._by_subject = {}   # nombre del titular (DER) -> [certificados]
+        for certificate in certificates:
+            self.add(certificate)
+
+    def add(self, certificate):
+        self._by_key_id.setdefault(subject_key_id(certificate), []).append(certificate)
+        self._by_subject.setdefault(certificate.subject.public_bytes(), []).append(certificate)
+
+    def issuers_of(self, certificate):
+        """Posibles emisores de un certificado."""
+        key_id = authority_key_id(certificate)
+        if key_id is not None:
+            return self._by_key_id.get(key_id, [])
+        return self._by_subject.get(certificate.issuer.public_bytes(), [])
+
+    def __len__(self):
+        return sum(map(len, self._by_key_id.values()))
+
+
+class TrustStore(_WatchedDirectory):
+    """Raíces e intermedias de confianza indexadas por Subject Key Identifier."""
+
+    suffixes = CERTIFICATE_SUFFIXES
+
+    def __init__(self, directory, reload_interval=30.0):
+        super().__init__(directory, reload_interval)
+        self._index = CertificateIndex()
+        self._anchors = set()  # huellas de las raíces
+
+    def _load(self, snapshot):
+        index, anchors = CertificateIndex(), set()
+        for path in sorted(snapshot):
+            try:
+                with open(path, "rb") as f:
+                    certificates = load_certificates(f.read())
+            except (OSError, ValueError) as e:
+                print(f"No se pudo cargar el certificado de confianza '{path}': {e}")
+                continue
+            for certificate in certificates:
+                index.add(certificate)
+                if is_self_issued(certificate):
+                    anchors.add(fingerprint(certificate))
+        # Se sustituyen de una vez: las validaciones en curso ven el índice anterior o el nuevo
+        self._index, self._anchors = index, anchors
+        print(f"Almacén de confianza cargado: {len(index)} certificados, {len(anchors)} raíces.")
+
+    def is_anchor(self, certificate):
+        return fingerprint(certificate) in self._anchors
+
+    def issuers_of(self, certificate):
+        return self._index.issuers_of(certificate)
+
+    @property
+    def configured(self):
+        return len(self._index) > 0
+
+    def __len__(self):
+        return len(self._index)
+
+
+class _CrlEntry:
+    """Una CRL analizada: números de serie revocados y datos de su emisor."""
+
+    __slots__ = ("crl", "serials", "next_update", "verified_by")
+
+    def __init__(self, crl):
+        self.crl = crl
+        self.serials = frozenset(revoked.serial_number for revoked in crl)
+        self.next_update = crl.next_update_utc
+        self.verified_by = set()  # huellas de los emisores cuya firma se comprobó
+
+
+class CrlIndex(_WatchedDirectory):
+    """CRLs locales como conjuntos de números de serie, indexadas por la clave del emisor."""
+
+    suffixes = CRL_SUFFIXES
+
+    def __init__(self, directory, reload_interval=30.0):
+        super().__init__(directory, reload_interval)
+        self._entries = {}      # ruta -> (mtime, clave del emisor, _CrlEntry)
+        self._by_issuer = {}    # AKI (o nombre del emisor en DER) -> _CrlEntry
+        self.parsed = 0         # CRLs analizadas (para métricas y benchmarks)
+
+    @staticmethod
+    def _issuer_key(crl):
+        return authority_key_id(crl) or crl.issuer.public_bytes()
+
+    def _load(self, snapshot):
+        entries = {}
+        for path, mtime in snapshot.items():
+            current = self._entries.get(path)
+            if current is not None and current[0] == mtime:
+                entries[path] = current
+                continue
+            try:
+                with open(path, "rb") as f:
+                    crl = load_crl(f.read())
+            except (OSError, ValueError) as e:
+                print(f"No se pudo cargar la CRL '{path}': {e}")
+                continue
+            entries[path] = (mtime, self._issuer_key(crl), _CrlEntry(crl))
+            self.parsed += 1
+        by_issuer = {}
+        for _, key, entry in entries.values():
+            # Con varias CRLs del mismo emisor se usa la más reciente
+            other = by_issuer.get(key)
+            if other is None or entry.crl.last_update_utc > other.crl.last_update_utc:
+                by_issuer[key] = entry
+        self._entries, self._by_issuer = entries, by_issuer
+
+    def status(self, certificate, issuer, at=None):
+        """
+        Estado de revocación de `certificate` emitido por `issuer` en la fecha
+        `at`. La firma de la CRL se comprueba una vez por emisor; una CRL que
+        no verifica no cuenta, y una caducada (next_update anterior a `at`)
+        solo sirve para saber que un certificado está revocado.
+        """
+        key = authority_key_id(certificate) or certificate.issuer.public_bytes()
+        entry = self._by_issuer.get(key)
+        if entry is None:
+            return REVOCATION_UNKNOWN
+        issuer_fingerprint = fingerprint(issuer)
+        if issuer_fingerprint not in entry.verified_by:
+            if entry.crl.issuer != issuer.subject or not entry.crl.is_signature_valid(issuer.public_key()):
+                return REVOCATION_UNKNOWN
+            entry.verified_by.add(issuer_fingerprint)
+        if certificate.serial_number in entry.serials:
+            return REVOCATION_REVOKED
+        if entry.next_update is not None and at is not None and at > entry.next_update:
+            return REVOCATION_UNKNOWN
+        return REVOCATION_GOOD
+
+    def __len__(self):
+        return len(self._by_issuer)
+
+
+class ChainValidator:
+    """
+    Construye y valida la ruta de un certificado hasta una raíz del TrustStore.
+    Con require_crl, un certificado cuyo emisor no tiene CRL no es válido.
+    """
+
+    def __init__(self, trust_store: TrustStore, crl_index: CrlIndex, require_crl=False):
+        self.trust_store = trust_store
+        self.crl_index = crl_index
+        self.require_crl = require_crl
+
+    @classmethod
+    def from_directories(cls, trust_dir, crl_dir, reload_interval=30.0, require_crl=False):
+        return cls(TrustStore(trust_dir, reload_interval), CrlIndex(crl_dir, reload_interval), require_crl)
+
+    def validate(self, certificate, intermediates=(), at=None):
+        """
+        Validar `certificate` (cryptography.x509.Certificate) en la fecha `at`
+        (por defecto, ahora). `intermediates` son certificados sin confianza
+        que pueden completar la ruta, como los que acompañan al .p12.
+
+        Returns:
+            ChainValidationResult: valid, status (STATUS_*), detail y la ruta
+            como lista de huellas SHA-256 desde el certificado hasta la raíz.
+        """
+        self.trust_store.refresh()
+        self.crl_index.refresh()
+        if not self.trust_store.configured:
+            return ChainValidationResult(False, STATUS_NOT_CONFIGURED, "No hay certificados de confianza configurados.", [])
+
+        at = at or datetime.now(timezone.utc)
+        pool = CertificateIndex(intermediates)
+        current = certificate
+        chain = [fingerprint(certificate)]
+        for _ in range(MAX_CHAIN_LENGTH):
+            name = current.subject.rfc4514_string()
+            if not current.not_valid_before_utc <= at <= current.not_valid_after_utc:
+                return ChainValidationResult(False, STATUS_EXPIRED, f"El certificado '{name}' no está vigente.", chain)
+            if self.trust_store.is_anchor(current):
+                return ChainValidationResult(True, STATUS_VALID, "Cadena de confianza válida.", chain)
+            if is_self_issued(current):
+                return ChainValidationResult(False, STATUS_UNTRUSTED, f"La raíz '{name}' no es de confianza.", chain)
+
+            issuer = self._find_issuer(current, pool)
+            if issuer is None:
+                return ChainValidationResult(False, STATUS_UNTRUSTED, f"No se encontró el emisor de '{name}'.", chain)
+            if not is_ca(issuer):
+                return ChainValidationResult(False, STATUS_INVALID, f"El emisor de '{name}' no es una CA.", chain)
+
+            revocation = self.crl_index.status(current, issuer, at)
+            if revocation == REVOCATION_REVOKED:
+                return ChainValidationResult(False, STATUS_REVOKED, f"El certificado '{name}' está revocado.", chain)
+            if revocation == REVOCATION_UNKNOWN and self.require_crl:
+                return ChainValidationResult(False, STATUS_INVALID, f"No hay una CRL válida del emisor de '{name}'.", chain)
+
+            current = issuer
+            chain.append(fingerprint(issuer))
+        return ChainValidationResult(False, STATUS_INVALID, "La cadena de certificados es demasiado larga.", chain)
+
+    def _find_issuer(self, certificate, pool):
+        """Primer candidato (de confianza o del pool) cuya firma sobre el certificado verifica."""
+        for candidate in self.trust_store.issuers_of(certificate) + pool.issuers_of(certificate):
+            try:
+                certificate.verify_directly_issued_by(candidate)
+                return candidate
+            except (ValueError, TypeError, InvalidSignature):
+                continue
+        return None
+
+    def validate_der(self, der, intermediates_der=(), at=None):
+        """Como validate, con los certificados en DER (p. ej. desde asn1crypto o pyhanko)."""
+        return self.validate(
+            x509.load_der_x509_certificate(der),
+            [x509.load_der_x509_certificate(item) for item in intermediates_der],
+            at
+        )
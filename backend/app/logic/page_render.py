@@ -0,0 +1,69 @@
+"""
+Miniaturas y tamaños de página de un PDF con pypdfium2.
+
+Se ejecuta en el pool de procesos (ver app.thumbnails). pdfium no admite
+llamadas concurrentes desde varios hilos de un mismo proceso, y run_cpu usa
+hilos si el pool de procesos está desactivado: todas las llamadas pasan por
+_PDFIUM_LOCK.
+"""
+
+import hashlib
+import io
+import threading
+from collections import namedtuple
+
+import pypdfium2 as pdfium
+
+_PDFIUM_LOCK = threading.Lock()
+
+# Tamaño de una página en puntos tal como se muestra (con /Rotate aplicado),
+# rotación en grados y /MediaBox (izquierda, abajo, derecha, arriba)
+PageSize = namedtuple("PageSize", "width height rotation media_box")
+
+# Miniatura JPEG de una página: índice (0 = primera), bytes, SHA-256 y tamaño en píxeles
+Thumbnail = namedtuple("Thumbnail", "index data sha256 width height")
+
+
+def read_page_sizes(pdf_path):
+    """
+    Tamaño de cada página del PDF.
+
+    Raises:
+        pdfium.PdfiumError: si el PDF no se puede abrir.
+    """
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            sizes = []
+            for index in range(len(pdf)):
+                page = pdf[index]
+                width, height = page.get_size()
+                sizes.append(PageSize(width, height, page.get_rotation(), tuple(page.get_mediabox())))
+                page.close()
+            return sizes
+        finally:
+            pdf.close()
+
+
+def render_thumbnails(pdf_path, page_indexes, width, quality):
+    """
+    Miniaturas JPEG de `width` píxeles de ancho de las páginas indicadas,
+    con las apariencias de los campos de firma (las estampas).
+    """
+    thumbnails = []
+    with _PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            pdf.init_forms()
+            for index in page_indexes:
+                page = pdf[index]
+                page_width, _ = page.get_size()
+                image = page.render(scale=width / page_width, may_draw_forms=True).to_pil()
+                page.close()
+                buffer = io.BytesIO()
+                image.convert("RGB").save(buffer, "JPEG", quality=quality, optimize=True)
+                data = buffer.getvalue()
+                thumbnails.append(Thumbnail(index, data, hashlib.sha256(data).hexdigest(), image.width, image.height))
+        finally:
+            pdf.close()
+    return thumbnails
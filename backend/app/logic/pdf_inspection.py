@@ -0,0 +1,83 @@
+"""
+Datos de un PDF que se leen una sola vez, al subirlo (ver
+routers.documents.upload_document), para validar las peticiones de firma
+sin descargar el documento: número de páginas, /MediaBox y /Rotate de cada
+página, campos de firma existentes y si admite una firma incremental.
+
+Solo se recorren el árbol de páginas y el formulario, sin leer el contenido
+de las páginas.
+"""
+
+from collections import namedtuple
+
+from pyhanko.pdf_utils import generic
+from pyhanko.pdf_utils.misc import PdfError
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.fields import MDPPerm, enumerate_sig_fields
+from pyhanko.sign.validation.pdf_embedded import read_certification_data
+
+# /MediaBox (izquierda, abajo, derecha, arriba) y /Rotate de una página, con
+# los valores heredados del árbol de páginas si ella no los define
+PageBox = namedtuple("PageBox", "media_box rotation")
+
+# Resultado de read_pdf_metadata. page_count y pages son None si no se pudo
+# leer el árbol de páginas; problem explica por qué no es incremental_safe.
+PdfMetadata = namedtuple("PdfMetadata", "page_count pages signature_fields incremental_safe problem")
+
+# Tamaño Carta, el de pyhanko para páginas sin /MediaBox
+DEFAULT_MEDIA_BOX = (0.0, 0.0, 612.0, 792.0)
+
+
+def _read_pages(reader: PdfFileReader):
+    """Recorrer el árbol de páginas en orden, heredando /MediaBox y /Rotate."""
+    pages = []
+    pending = [(reader.root.raw_get("/Pages"), DEFAULT_MEDIA_BOX, 0, frozenset())]
+    while pending:
+        node_ref, media_box, rotation, seen = pending.pop()
+        if not isinstance(node_ref, generic.IndirectObject) or node_ref.reference in seen:
+            raise PdfError("El árbol de páginas tiene nodos directos o referencias circulares.")
+        node = node_ref.get_object()
+        if "/MediaBox" in node:
+            media_box = tuple(float(value) for value in node["/MediaBox"])
+        if "/Rotate" in node:
+            rotation = int(node["/Rotate"]) % 360
+        if "/Kids" in node:
+            seen = seen | {node_ref.reference}
+            # Al revés, para sacar de la pila los hijos en orden
+            for kid in reversed(list(node["/Kids"])):
+                pending.append((kid, media_box, rotation, seen))
+        else:
+            pages.append(PageBox(media_box, rotation))
+    if len(pages) != reader.root["/Pages"]["/Count"]:
+        raise PdfError("El /Count del árbol de páginas no coincide con sus páginas.")
+    return pages
+
+
+def read_pdf_metadata(stream):
+    """
+    Leer los datos del PDF de `stream` (un archivo binario con seek). No
+    lanza excepciones por PDFs dañados: los refleja en problem.
+    """
+    try:
+        reader = PdfFileReader(stream, strict=False)
+    except (PdfError, ValueError, KeyError, TypeError) as e:
+        return PdfMetadata(None, None, [], False, f"El PDF no se puede leer: {e}")
+    if reader.encrypted:
+        return PdfMetadata(None, None, [], False, "El PDF está cifrado.")
+
+    try:
+        pages = _read_pages(reader)
+    except (PdfError, ValueError, KeyError, TypeError) as e:
+        return PdfMetadata(None, None, [], False, f"El árbol de páginas del PDF no se puede leer: {e}")
+    if not pages:
+        return PdfMetadata(0, [], [], False, "El PDF no tiene páginas.")
+
+    try:
+        signature_fields = [str(name) for name, _, _ in enumerate_sig_fields(reader)]
+        certification = read_certification_data(reader)
+    except (PdfError, ValueError, KeyError, TypeError) as e:
+        return PdfMetadata(len(pages), pages, [], False, f"El formulario del PDF no se puede leer: {e}")
+    if certification is not None and certification.permission == MDPPerm.NO_CHANGES:
+        return PdfMetadata(len(pages), pages, signature_fields, False,
+                           "Una firma de certificación del PDF no permite más cambios.")
+    return PdfMetadata(len(pages), pages, signature_fields, True, None)
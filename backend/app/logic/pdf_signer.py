@@ -1,11 +1,11 @@
-import os
 import platform
 import datetime
 import random
-import qrcode
+import time
 import uuid
-from PIL import Image, ImageDraw, ImageFont
 
+from asn1crypto import algos as asn1_algos, keys as asn1_keys, x509 as asn1_x509
+from pyhanko_certvalidator.registry import SimpleCertificateStore
 from pyhanko.sign.signers import SimpleSigner, PdfSigner
 from pyhanko.sign import PdfSignatureMetadata
 from pyhanko.sign.fields import SigFieldSpec, append_signature_field
@@ -14,19 +14,103 @@ from pyhanko.pdf_utils.images import PdfImage
 from pyhanko.pdf_utils.reader import PdfFileReader
 from pyhanko.stamp import TextStampStyle
 
+from .stamp_renderer import render_stamp
+from .vector_stamp import VectorStampContent, build_vector_stamp
+
+def get_cert_subject(signer):
+    """Obtener el nombre a mostrar del titular del certificado de un SimpleSigner."""
+    cert_obj = getattr(signer, 'signer_cert', getattr(signer, 'signing_cert', None))
+    if cert_obj:
+        cert_subject_dict = cert_obj.subject.native
+        return cert_subject_dict.get("common_name",
+                                     cert_subject_dict.get("organization_name", "NOMBRE NO DISPONIBLE"))
+    return "NOMBRE NO DISPONIBLE"
+
+
+SIGNATURE_FIELD_PREFIX = "QRSignature"
+
+# Apariencia de la estampa: imagen generada con Pillow ("raster") o QR y
+# texto como trazados y texto PDF con una fuente incrustada ("vector")
+APPEARANCE_RASTER = "raster"
+APPEARANCE_VECTOR = "vector"
+STAMP_APPEARANCES = (APPEARANCE_RASTER, APPEARANCE_VECTOR)
+
+
+def signature_field_name(index):
+    """Nombre del campo de la firma número `index` (0 -> QRSignature, n -> QRSignature_n)."""
+    return SIGNATURE_FIELD_PREFIX if index == 0 else f"{SIGNATURE_FIELD_PREFIX}_{index}"
+
+
+def signature_field_index(name):
+    """Inverso de signature_field_name; None si el nombre no sigue ese esquema."""
+    if name == SIGNATURE_FIELD_PREFIX:
+        return 0
+    prefix, _, suffix = name.rpartition("_")
+    if prefix == SIGNATURE_FIELD_PREFIX and suffix.isdigit():
+        return int(suffix)
+    return None
+
+
+def next_signature_field_name(reader: PdfFileReader):
+    """
+    Siguiente nombre libre leyendo solo los campos de primer nivel de
+    /AcroForm /Fields (donde se añaden los campos de firma). Se usa el índice
+    más alto + 1, no el primer hueco, para que los nombres que se deriven
+    después desde la base de datos tampoco choquen.
+    """
+    try:
+        fields = reader.root["/AcroForm"]["/Fields"]
+    except KeyError:
+        return signature_field_name(0)
+    last = -1
+    for field in fields:
+        try:
+            index = signature_field_index(str(field.get_object()["/T"]))
+        except KeyError:
+            continue
+        if index is not None and index > last:
+            last = index
+    return signature_field_name(last + 1)
+
+
+def _dump_signer(signer):
+    """Serializar el material de un SimpleSigner en DER (para enviarlo a otro proceso)."""
+    return {
+        'signing_cert': signer.signing_cert.dump(),
+        'signing_key': signer.signing_key.dump(),
+        'other_certs': [cert.dump() for cert in signer.cert_registry],
+        'signature_mechanism': signer.signature_mechanism.dump() if signer.signature_mechanism else None,
+        'prefer_pss': signer.prefer_pss,
+        'embed_roots': signer.embed_roots,
+    }
+
+
+def _load_signer(data):
+    """Reconstruir un SimpleSigner a partir de lo generado por _dump_signer."""
+    mechanism = data['signature_mechanism']
+    return SimpleSigner(
+        signing_cert=asn1_x509.Certificate.load(data['signing_cert']),
+        signing_key=asn1_keys.PrivateKeyInfo.load(data['signing_key']),
+        cert_registry=SimpleCertificateStore.from_certs(
+            [asn1_x509.Certificate.load(cert) for cert in data['other_certs']]
+        ),
+        signature_mechanism=asn1_algos.SignedDigestAlgorithm.load(mechanism) if mechanism else None,
+        prefer_pss=data['prefer_pss'],
+        embed_roots=data['embed_roots'],
+    )
+
+
 class PDFSigner:
-    def __init__(self, cert_path, password, custom_settings=None):
-        self.signer = SimpleSigner.load_pkcs12(
-            pfx_file=cert_path,
-            passphrase=password.encode("utf-8") if password else None
-        )
-        cert_obj = getattr(self.signer, 'signer_cert', getattr(self.signer, 'signing_cert', None))
-        if cert_obj:
-            cert_subject_dict = cert_obj.subject.native
-            self.cert_subject = cert_subject_dict.get("common_name",
-                                 cert_subject_dict.get("organization_name", "NOMBRE NO DISPONIBLE"))
-        else:
-            self.cert_subject = "NOMBRE NO DISPONIBLE"
+    def __init__(self, cert_path=None, password=None, custom_settings=None, signer=None, cert_subject=None):
+        # Si se recibe un SimpleSigner ya cargado (p. ej. desde una sesión de
+        # firmante) no se vuelve a leer ni descifrar el PKCS#12.
+        if signer is None:
+            signer = SimpleSigner.load_pkcs12(
+                pfx_file=cert_path,
+                passphrase=password.encode("utf-8") if password else None
+            )
+        self.signer = signer
+        self.cert_subject = cert_subject or get_cert_subject(signer)
             
         # Configuraciones personalizables
         self.settings = {
@@ -47,33 +131,51 @@ class PDFSigner:
         if custom_settings:
             self.settings.update(custom_settings)
 
+    def __getstate__(self):
+        # Los objetos de asn1crypto no sobreviven a pickle entre procesos;
+        # el firmante viaja como DER y se reconstruye en el proceso destino.
+        state = self.__dict__.copy()
+        state['signer'] = _dump_signer(self.signer)
+        return state
+
+    def __setstate__(self, state):
+        state = dict(state)
+        state['signer'] = _load_signer(state['signer'])
+        self.__dict__.update(state)
+
+    @classmethod
+    def from_pkcs12_data(cls, pkcs12_bytes, password, custom_settings=None):
+        """
+        Crear un PDFSigner a partir del contenido de un .p12 en memoria.
+
+        Raises:
+            ValueError: si el archivo está corrupto o la contraseña es incorrecta.
+        """
+        signer = SimpleSigner.load_pkcs12_data(
+            pkcs12_bytes,
+            other_certs=None,
+            passphrase=password.encode("utf-8") if password else None
+        )
+        return cls(custom_settings=custom_settings, signer=signer)
+
+    @classmethod
+    def from_session(cls, session, custom_settings=None):
+        """Crear un PDFSigner a partir de una sesión de firmante ya desbloqueada."""
+        return cls(custom_settings=custom_settings, signer=session.signer, cert_subject=session.cert_subject)
+
     def _get_unique_field_name(self, reader: PdfFileReader):
         """
         Genera un nombre de campo de firma único (ej: QRSignature_1, QRSignature_2)
         leyendo los campos existentes del PDF.
         """
         try:
-            # Esta línea usa pyhanko para obtener todos los campos del formulario de forma eficiente
-            existing_fields = set(
-                f.field_name for f in reader.get_form_fields().values()
-            )
-            
-            base_name = "QRSignature"
-            counter = 1
-            unique_name = base_name
-            
-            while unique_name in existing_fields:
-                unique_name = f"{base_name}_{counter}"
-                counter += 1
-            
-            print(f"DEBUG: Nombre de campo de firma generado: {unique_name}")
-            return unique_name
-                
+            return next_signature_field_name(reader)
         except Exception:
             # Fallback si hay algún problema leyendo los campos
             return f"QRSignature_{uuid.uuid4().hex[:8]}"
 
-    def create_stamp_image(self, reason, location, timestamp=None):
+    def create_qr_text(self, reason, location, timestamp=None):
+        """Contenido del QR de la estampa."""
         # Si están vacíos, poner un espacio para evitar null en la validación
         if not reason:
             reason = " "
@@ -86,12 +188,6 @@ class PDFSigner:
         os_ver_detail = ""
         if os_name == "Windows": os_ver_detail = platform.win32_ver()[0] # e.g., "10"
         elif os_name == "Darwin": os_ver_detail = platform.mac_ver()[0] # e.g., "13.2.1"
-        elif os_name == "Linux":
-             # Buscar fuentes comunes en Linux, esto puede variar
-            common_fonts = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf"]
-            common_fonts_bold = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf"]
-            font_path_normal = next((f for f in common_fonts if os.path.exists(f)), "default")
-            font_path_bold = next((f for f in common_fonts_bold if os.path.exists(f)), "default")
         
         sis_operativo = f"{os_name} {os_ver_detail if os_ver_detail else os_release} 10.0"
         
@@ -106,7 +202,7 @@ class PDFSigner:
         nanoseg_aleatorio = random.randint(0, 999)
         fecha_iso = f"{now.strftime('%Y-%m-%dT%H:%M:%S')}.{microsegundos:06d}{nanoseg_aleatorio:03d}{tz_with_colon}"
 
-        qr_text = (
+        return (
             f"FIRMADO POR: {self.cert_subject}\n"
             f"RAZON: {reason}\n"
             f"LOCALIZACION: {location}\n"
@@ -115,184 +211,25 @@ class PDFSigner:
             f"Firmado digitalmente con {version_firma_ec}\n"
             f"{sis_operativo}"
         )
-        
-        QR_BOX_SIZE = self.settings['qr_box_size']
-        TEXT_FONT_SIZE_NORMAL = self.settings['text_font_size_normal']
-        TEXT_FONT_SIZE_BOLD = self.settings['text_font_size_bold']
-        SCALE_FACTOR = self.settings['scale_factor']
-
-        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=QR_BOX_SIZE, border=0)
-        qr.add_data(qr_text)
-        qr.make(fit=True)
-        img_qr = qr.make_image(fill_color="black", back_color="white").convert("RGB")
-        # Explicitly crop any remaining white border from the QR code image itself
-        bbox_qr_crop = img_qr.getbbox()
-        if bbox_qr_crop:
-            img_qr = img_qr.crop(bbox_qr_crop)
-        qr_px_width, qr_px_height = img_qr.size
-
-        # Intentar cargar fuentes específicas, si no, usar la default
-        font_path_normal, font_path_bold = "C:/Windows/Fonts/cour.ttf", "C:/Windows/Fonts/courbd.ttf" # Courrier New
-        if platform.system() == "Darwin": # macOS
-            font_path_normal, font_path_bold = "/System/Library/Fonts/Courier.dfont", "/System/Library/Fonts/Courier.dfont" # Bold variant might need specific name
-        elif platform.system() == "Linux":
-             # Buscar fuentes comunes en Linux, esto puede variar
-            common_fonts = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf"]
-            common_fonts_bold = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf"]
-            font_path_normal = next((f for f in common_fonts if os.path.exists(f)), "default")
-            font_path_bold = next((f for f in common_fonts_bold if os.path.exists(f)), "default")
-
-
-        try: font_normal_hr = ImageFont.truetype(font_path_normal, size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR) if font_path_normal != "default" else ImageFont.load_default(size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR)
-        except IOError: font_normal_hr = ImageFont.load_default(size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR)
-        try: font_bold_hr = ImageFont.truetype(font_path_bold, size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR) if font_path_bold != "default" else ImageFont.load_default(size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR)
-        except IOError: font_bold_hr = ImageFont.load_default(size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR)
-
-
-        SEPARACION_1_2 = self.settings['separacion_1_2']
-        SEPARACION_2_3 = self.settings['separacion_2_3']
-        SEPARACION_FINAL = self.settings['separacion_final']
-        DESFASE_VERTICAL_TEXTO = self.settings['desfase_vertical_texto']
-        line1_text = "Firmado electrónicamente por:"
-        tokens = self.cert_subject.upper().split()
-        name_line1_str = " ".join(tokens[:2]) if len(tokens) > 2 else " ".join(tokens) or "NO DISPONIBLE"
-        name_line2_str = " ".join(tokens[2:]) if len(tokens) > 2 else None
-        line3_text = "Validar únicamente con FirmaEC"
-
-        temp_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
-        text_lines_data = [
-            (line1_text, font_normal_hr),
-
-            (name_line1_str, font_bold_hr),
-
-        ]
-        if name_line2_str:
-            text_lines_data.append((name_line2_str, font_bold_hr))
-        text_lines_data.append((line3_text, font_normal_hr))
-
-        text_heights_scaled = []
-        max_text_width_scaled = 0
-        for text, font in text_lines_data:
-            bbox = temp_draw.textbbox((0,0), text, font=font) # left, top, right, bottom
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            text_heights_scaled.append(text_height)
-            max_text_width_scaled = max(max_text_width_scaled, text_width)
-
-        total_text_height_scaled = text_heights_scaled[0]
-        if len(text_heights_scaled) > 1: total_text_height_scaled += (SEPARACION_1_2 * SCALE_FACTOR) + text_heights_scaled[1]
-        if name_line2_str and len(text_heights_scaled) > 2: total_text_height_scaled += (SEPARACION_2_3 * SCALE_FACTOR) + text_heights_scaled[2]
-        # La última línea (line3_text)
-        idx_line3 = 2 if name_line2_str else 1
-        if len(text_heights_scaled) > idx_line3 : total_text_height_scaled += (SEPARACION_FINAL * SCALE_FACTOR) + text_heights_scaled[idx_line3+ (1 if name_line2_str else 0)]
-
-
-        TEXT_PADDING_HR = self.settings['text_padding_hr'] * SCALE_FACTOR
-        text_area_width_scaled = max_text_width_scaled + (2 * TEXT_PADDING_HR)
-        
-        final_img_width_scaled = (qr_px_width * SCALE_FACTOR) + TEXT_PADDING_HR + text_area_width_scaled # QR + padding + text_area
-        final_img_height_scaled = max(qr_px_height * SCALE_FACTOR, (DESFASE_VERTICAL_TEXTO * SCALE_FACTOR) + total_text_height_scaled)
 
+    def create_stamp_image(self, reason, location, timestamp=None):
+        qr_text = self.create_qr_text(reason, location, timestamp)
+        return render_stamp(self.cert_subject, qr_text, self.settings)
 
-        high_res_canvas = Image.new("RGB", (final_img_width_scaled, final_img_height_scaled), color="#FFFFFF")
-        draw = ImageDraw.Draw(high_res_canvas)
-        high_res_canvas.paste(img_qr.resize((qr_px_width * SCALE_FACTOR, qr_px_height * SCALE_FACTOR), resample=Image.NEAREST), (0, 0))
-
-        text_x_pos_scaled = (qr_px_width * SCALE_FACTOR) + TEXT_PADDING_HR
-        current_y_scaled = DESFASE_VERTICAL_TEXTO * SCALE_FACTOR
-
-        # Linea 1
-        bbox = draw.textbbox((0,0), line1_text, font=font_normal_hr)
-        draw.text((text_x_pos_scaled, current_y_scaled), line1_text, fill="black", font=font_normal_hr)
-        current_y_scaled += (bbox[3]-bbox[1]) + (SEPARACION_1_2 * SCALE_FACTOR)
-
-        # Nombre Linea 1
-        bbox = draw.textbbox((0,0), name_line1_str, font=font_bold_hr)
-        draw.text((text_x_pos_scaled, current_y_scaled), name_line1_str, fill="black", font=font_bold_hr)
-        current_y_scaled += (bbox[3]-bbox[1])
-        
-        if name_line2_str:
-            current_y_scaled += (SEPARACION_2_3 * SCALE_FACTOR)
-            bbox = draw.textbbox((0,0), name_line2_str, font=font_bold_hr)
-            draw.text((text_x_pos_scaled, current_y_scaled), name_line2_str, fill="black", font=font_bold_hr)
-            current_y_scaled += (bbox[3]-bbox[1])
-
-        current_y_scaled += (SEPARACION_FINAL * SCALE_FACTOR)
-        draw.text((text_x_pos_scaled, current_y_scaled), line3_text, fill="black", font=font_normal_hr)
-        
-        final_canvas_img = high_res_canvas.resize((final_img_width_scaled // SCALE_FACTOR, final_img_height_scaled // SCALE_FACTOR), resample=Image.LANCZOS)
-
-        # Calculate bounding box of QR code
-        qr_bbox = (0, 0, qr_px_width * SCALE_FACTOR, qr_px_height * SCALE_FACTOR)
-
-        # Initialize text bounding box with extreme values
-        text_min_x = float('inf')
-        text_min_y = float('inf')
-        text_max_x = float('-inf')
-        text_max_y = float('-inf')
-
-        # Draw text and update text bounding box
-        text_x_pos_scaled = (qr_px_width * SCALE_FACTOR) + TEXT_PADDING_HR
-        current_y_scaled_for_bbox = DESFASE_VERTICAL_TEXTO * SCALE_FACTOR # Use a separate variable for bbox calculation
-
-        # Line 1
-        bbox = draw.textbbox((text_x_pos_scaled, current_y_scaled_for_bbox), line1_text, font=font_normal_hr)
-        text_min_x = min(text_min_x, bbox[0])
-        text_min_y = min(text_min_y, bbox[1])
-        text_max_x = max(text_max_x, bbox[2])
-        text_max_y = max(text_max_y, bbox[3])
-        current_y_scaled_for_bbox += (bbox[3]-bbox[1]) + (SEPARACION_1_2 * SCALE_FACTOR)
-
-        # Nombre Linea 1
-        bbox = draw.textbbox((text_x_pos_scaled, current_y_scaled_for_bbox), name_line1_str, font=font_bold_hr)
-        text_min_x = min(text_min_x, bbox[0])
-        text_min_y = min(text_min_y, bbox[1])
-        text_max_x = max(text_max_x, bbox[2])
-        text_max_y = max(text_max_y, bbox[3])
-        current_y_scaled_for_bbox += (bbox[3]-bbox[1])
-        
-        if name_line2_str:
-            current_y_scaled_for_bbox += (SEPARACION_2_3 * SCALE_FACTOR)
-            bbox = draw.textbbox((text_x_pos_scaled, current_y_scaled_for_bbox), name_line2_str, font=font_bold_hr)
-            text_min_x = min(text_min_x, bbox[0])
-            text_min_y = min(text_min_y, bbox[1])
-            text_max_x = max(text_max_x, bbox[2])
-            text_max_y = max(text_max_y, bbox[3])
-            current_y_scaled_for_bbox += (bbox[3]-bbox[1])
-
-        current_y_scaled_for_bbox += (SEPARACION_FINAL * SCALE_FACTOR)
-        bbox = draw.textbbox((text_x_pos_scaled, current_y_scaled_for_bbox), line3_text, font=font_normal_hr)
-        text_min_x = min(text_min_x, bbox[0])
-        text_min_y = min(text_min_y, bbox[1])
-        text_max_x = max(text_max_x, bbox[2])
-        text_max_y = max(text_max_y, bbox[3])
-
-        text_bbox = (text_min_x, text_min_y, text_max_x, text_max_y)
-
-        # Combine QR and Text bounding boxes
-        final_bbox_min_x = min(qr_bbox[0], text_bbox[0])
-        final_bbox_min_y = min(qr_bbox[1], text_bbox[1])
-        final_bbox_max_x = max(qr_bbox[2], text_bbox[2])
-        final_bbox_max_y = max(qr_bbox[3], text_bbox[3])
-
-        final_combined_bbox = (final_bbox_min_x, final_bbox_min_y, final_bbox_max_x, final_bbox_max_y)
-
-        # Crop the high_res_canvas using the final combined bounding box
-        imagen_estampa_final_high_res = high_res_canvas.crop(final_combined_bbox)
-
-        # Resize to final resolution
-        imagen_estampa_final = imagen_estampa_final_high_res.resize(
-            (imagen_estampa_final_high_res.width // SCALE_FACTOR,
-             imagen_estampa_final_high_res.height // SCALE_FACTOR),
-            resample=Image.LANCZOS
-        )
-
-        # Auto-crop para eliminar espacios blancos adicionales
-        bbox_final = imagen_estampa_final.getbbox()
-        if bbox_final:
-            imagen_estampa_final = imagen_estampa_final.crop(bbox_final)
-
-        return imagen_estampa_final
+    def create_stamp_content(self, reason, location, appearance=APPEARANCE_RASTER):
+        """
+        Contenido PDF de la estampa para el fondo del TextStampStyle y su
+        relación alto/ancho. Si la fuente configurada no es TrueType, la
+        apariencia vectorial no es posible y se usa la imagen.
+        """
+        if appearance == APPEARANCE_VECTOR:
+            stamp = build_vector_stamp(self.cert_subject, self.create_qr_text(reason, location), self.settings)
+            if stamp is not None:
+                return VectorStampContent(stamp), stamp.height / stamp.width
+            print("La fuente de la estampa no es TrueType; se usa la apariencia de imagen.")
+        stamp_image = self.create_stamp_image(reason, location)
+        aspect_ratio = float(stamp_image.height) / float(stamp_image.width) if stamp_image.width > 0 else 1.0
+        return PdfImage(stamp_image), aspect_ratio
             
 
     def sign_file(self, input_pdf, output_pdf, reason, location, page_index, x_coord, y_coord, width):
@@ -370,7 +307,15 @@ class PDFSigner:
                 return False, f"Error: El PDF podría tener restricciones de firma. Intente con un nombre de archivo diferente.\nDetalle: {error_msg}"
             return False, f"Error durante la firma: {type(e).__name__}: {e}"
 
-    async def async_sign_file(self, input_pdf, output_pdf, reason, location, page_index, x_coord, y_coord, width):
+    async def async_sign_file(self, input_pdf, output_pdf, reason, location, page_index, x_coord, y_coord, width, timings=None, field_name=None,
+                              appearance=APPEARANCE_RASTER):
+        """
+        Firma input_pdf y escribe el resultado en output_pdf.
+        Si se pasa un diccionario en `timings`, se rellenan los segundos que
+        tomaron la estampa ("stamp") y la firma de pyhanko ("pdf_sign").
+        Sin `field_name`, el nombre del campo se busca en el formulario del PDF.
+        `appearance` elige la estampa de imagen o la vectorial (STAMP_APPEARANCES).
+        """
         if not reason: reason = " "
         if not location: location = " "
         
@@ -381,16 +326,18 @@ class PDFSigner:
                 reader = PdfFileReader(infile, strict=False)
                 writer = IncrementalPdfFileWriter.from_reader(reader)
                 
-                unique_field_name = self._get_unique_field_name(reader)
+                unique_field_name = field_name or self._get_unique_field_name(reader)
 
-                stamp_image = self.create_stamp_image(reason, location)
-                aspect_ratio = float(stamp_image.height) / float(stamp_image.width) if stamp_image.width > 0 else 1.0
+                started = time.perf_counter()
+                stamp_content, aspect_ratio = self.create_stamp_content(reason, location, appearance)
+                if timings is not None:
+                    timings["stamp"] = time.perf_counter() - started
                 height = round(width * aspect_ratio)
 
                 pdf_signer = PdfSigner(
                     signature_meta=PdfSignatureMetadata(field_name=unique_field_name, reason=reason, location=location),
                     signer=self.signer,
-                    stamp_style=TextStampStyle(background=PdfImage(stamp_image), stamp_text="")
+                    stamp_style=TextStampStyle(background=stamp_content, stamp_text="")
                 )
                 
                 append_signature_field(
@@ -402,8 +349,11 @@ class PDFSigner:
                     )
                 )
 
+                started = time.perf_counter()
                 with open(output_pdf, "wb") as outfile:
                     await pdf_signer.async_sign_pdf(writer, output=outfile)
+                if timings is not None:
+                    timings["pdf_sign"] = time.perf_counter() - started
 
             return True, f"¡Éxito! PDF firmado con QR guardado en:\n{output_pdf}"
         except Exception as e:
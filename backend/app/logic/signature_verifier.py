@@ -0,0 +1,219 @@
+"""
+Verificación de las firmas incrustadas en un PDF con pyhanko.
+
+Un documento se guarda como una serie de revisiones (la subida y una por
+cada firma), cada una prefijo de la siguiente. Lo que firma cada firma no
+cambia al añadir otras, así que cada una se verifica una sola vez, la
+primera vez que se ve la revisión guardada que la contiene:
+
+- integridad y firma criptográfica sobre su /ByteRange, y
+- las modificaciones (diff de pyhanko) desde la firma hasta el final de su
+  revisión guardada (modification_level), y las de esa revisión vistas
+  desde la firma anterior (update_level).
+
+El nivel de modificación efectivo de una firma es el peor entre el suyo y
+el update_level de las firmas posteriores (ver effective_modification_level),
+de modo que al añadir una firma solo se analiza el último tramo. pyhanko,
+en cambio, compara cada firma con todas las actualizaciones posteriores.
+
+Todo se lee con un único PdfFileReader del archivo completo: la revisión de
+cada firma sale de la tabla xref sin leer su diccionario (cuyo /Contents es
+lo más caro de analizar), así que solo se leen las firmas pendientes.
+
+La confianza en el certificado no se evalúa aquí (ver
+app.logic.chain_validation): se devuelve el certificado del firmante.
+"""
+
+import logging
+from collections import namedtuple
+
+from pyhanko.pdf_utils.generic import IndirectObject
+from pyhanko.pdf_utils.misc import PdfError
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.diff_analysis import DEFAULT_DIFF_POLICY, ModificationLevel, SuspiciousModification
+from pyhanko.sign.fields import enumerate_sig_fields
+from pyhanko.sign.validation import validate_pdf_signature
+from pyhanko.sign.validation.pdf_embedded import EmbeddedPdfSignature
+from pyhanko_certvalidator import ValidationContext
+
+# Sin raíces de confianza pyhanko registra como error la ruta de cada
+# certificado; la confianza la decide ChainValidator
+logging.getLogger("pyhanko.sign.validation.generic_cms").setLevel(logging.CRITICAL)
+
+# Niveles de modificación de pyhanko, de menor a mayor
+MODIFICATION_LEVELS = [level.name for level in sorted(ModificationLevel, key=lambda level: level.value)]
+# Cambios que no invalidan una firma anterior: ninguno, datos de validación
+# a largo plazo o rellenar campos (incluidos nuevos campos de firma)
+ALLOWED_MODIFICATION_LEVELS = ("NONE", "LTA_UPDATES", "FORM_FILLING")
+
+# Resultado de una firma. revision_end es el tamaño de la revisión guardada
+# que la contiene; byte_range_end, dónde termina lo que firma.
+SignatureCheck = namedtuple("SignatureCheck", [
+    "field_name", "revision_end", "byte_range_end", "intact", "valid", "covers_revision",
+    "signer_name", "signer_cert", "signing_time", "md_algorithm",
+    "modification_level", "update_level", "detail",
+])
+
+# Firma encontrada en el formulario, sin leer aún su diccionario: nombre del
+# campo, referencia al campo, revisión de pyhanko en la que se escribió y
+# tamaño de la revisión guardada que la contiene
+_SignatureField = namedtuple("_SignatureField", "name field_ref revision end")
+
+
+def worst_level(*levels):
+    """El mayor de varios niveles de modificación (los None se ignoran)."""
+    present = [level for level in levels if level is not None]
+    return max(present, key=MODIFICATION_LEVELS.index) if present else None
+
+
+def effective_modification_level(checks):
+    """
+    Nivel de modificación efectivo de cada firma de `checks` (en orden de
+    byte_range_end): el suyo y el de todas las actualizaciones posteriores.
+    """
+    levels = [None] * len(checks)
+    later = None
+    for index in range(len(checks) - 1, -1, -1):
+        levels[index] = worst_level(checks[index].modification_level, later)
+        later = worst_level(later, checks[index].update_level)
+    return levels
+
+
+class _SignedPdf:
+    """
+    Lector del PDF completo con la correspondencia entre las revisiones de
+    pyhanko (una por actualización incremental) y las revisiones guardadas.
+    """
+
+    def __init__(self, stream, revision_ends, file_size):
+        self.reader = PdfFileReader(stream, strict=False)
+        xrefs = self.reader.xrefs
+        # Revisión guardada de cada revisión de pyhanko: la primera que
+        # termina después de su tabla xref
+        self.ends = []
+        for revision in range(xrefs.total_revisions):
+            location = xrefs.get_xref_container_info(revision).end_location
+            self.ends.append(next((end for end in revision_ends if end >= location), file_size))
+        self._resolvers = {}
+
+    def last_revision(self, end):
+        """Última revisión de pyhanko dentro de la revisión guardada que termina en `end`."""
+        return max(revision for revision, revision_end in enumerate(self.ends) if revision_end == end)
+
+    def signature_fields(self):
+        """Campos de firma rellenos, en el orden en que se firmaron."""
+        fields = []
+        for name, value, field_ref in enumerate_sig_fields(self.reader, filled_status=True):
+            if not isinstance(value, IndirectObject):
+                continue  # pyhanko solo valida firmas guardadas como objetos indirectos
+            revision = self.reader.xrefs.get_last_change(value.reference)
+            fields.append(_SignatureField(str(name), field_ref, revision, self.ends[revision]))
+        return sorted(fields, key=lambda field: field.revision)
+
+    def _resolver(self, revision):
+        # Cada resolver guarda su índice de referencias, que el diff construye
+        # para la revisión base: se reutiliza entre firmas
+        if revision not in self._resolvers:
+            self._resolvers[revision] = self.reader.get_historical_resolver(revision)
+        return self._resolvers[revision]
+
+    def review(self, signature, base, first, last):
+        """
+        Nivel de las modificaciones de las revisiones first..last respecto a
+        la revisión base, como StandardDiffPolicy.review_file.
+        """
+        level = ModificationLevel.NONE
+        for revision in range(first, last + 1):
+            try:
+                result = DEFAULT_DIFF_POLICY.apply(
+                    self._resolver(base), self._resolver(revision),
+                    field_mdp_spec=signature.fieldmdp, doc_mdp=signature.docmdp_level
+                )
+            except SuspiciousModification:
+                return ModificationLevel.OTHER.name
+            level = max(level, result.modification_level)
+        return level.name
+
+    def check(self, field: _SignatureField):
+        """Verificar una firma y las modificaciones hasta el final de su revisión guardada."""
+        byte_range_end = None
+        try:
+            signature = EmbeddedPdfSignature(self.reader, field.field_ref, field.name)
+            byte_range = signature.byte_range
+            byte_range_end = int(byte_range[2] + byte_range[3])
+            status = validate_pdf_signature(
+                signature, ValidationContext(trust_roots=[], allow_fetching=False), skip_diff=True
+            )
+            # Una firma que no cubre su revisión entera no admite ningún cambio
+            covers_revision = status.coverage is not None and status.coverage.value >= 2
+            if covers_revision:
+                modification_level = self.review(signature, field.revision, field.revision + 1, self.last_revision(field.end))
+            else:
+                modification_level = ModificationLevel.OTHER.name
+            cert = status.signing_cert
+            return SignatureCheck(
+                field_name=field.name,
+                revision_end=field.end,
+                byte_range_end=byte_range_end,
+                intact=status.intact,
+                valid=status.valid,
+                covers_revision=covers_revision,
+                signer_name=cert.subject.native.get("common_name", cert.subject.human_friendly),
+                signer_cert=cert.dump(),
+                signing_time=status.signer_reported_dt,
+                md_algorithm=status.md_algorithm,
+                modification_level=modification_level,
+                update_level=None,
+                detail=None,
+            )
+        except (PdfError, ValueError, KeyError) as e:  # Los errores de firma de pyhanko son ValueError
+            return SignatureCheck(field.name, field.end, byte_range_end or field.end, False, False, False,
+                                  None, None, None, None, ModificationLevel.OTHER.name, None, str(e))
+
+    def update_level(self, previous: _SignatureField, end):
+        """Modificaciones de la revisión guardada `end` respecto a la firma anterior."""
+        try:
+            signature = EmbeddedPdfSignature(self.reader, previous.field_ref, previous.name)
+        except (PdfError, ValueError, KeyError):
+            return ModificationLevel.OTHER.name
+        return self.review(signature, previous.revision, self.last_revision(previous.end) + 1, self.last_revision(end))
+
+
+def verify_signatures(pdf_path, revision_ends, pending_ends, known=()):
+    """
+    Verificar las firmas del PDF (la última revisión) que están en las
+    revisiones guardadas pendientes. Se ejecuta en el pool de procesos.
+
+    Args:
+        pdf_path: PDF completo.
+        revision_ends: tamaño de cada revisión guardada, en orden.
+        pending_ends: tamaños de las revisiones aún no verificadas (None:
+            todas, para documentos sin registro de revisiones).
+        known: pares (revision_end, field_name) ya verificados antes, que se omiten.
+
+    Returns:
+        tuple: (checks, counts), con un SignatureCheck por firma verificada
+        (en orden) y el número de firmas de cada revisión pendiente.
+    """
+    with open(pdf_path, "rb") as f:
+        file_size = f.seek(0, 2)
+        f.seek(0)
+        pdf = _SignedPdf(f, revision_ends, file_size)
+        if pending_ends is None:
+            pending_ends = list(revision_ends) or [file_size]
+        pending_ends = set(pending_ends)
+        known = set(known)
+
+        counts = {end: 0 for end in pending_ends}
+        checks = []
+        previous = None  # Firma anterior, para el update_level de la siguiente
+        for field in pdf.signature_fields():
+            if field.end in pending_ends:
+                counts[field.end] += 1
+                if (field.end, field.name) not in known:
+                    check = pdf.check(field)
+                    if previous is not None and previous.end < field.end:
+                        check = check._replace(update_level=pdf.update_level(previous, field.end))
+                    checks.append(check)
+            previous = field
+    return checks, counts
@@ -0,0 +1,133 @@
+"""
+Caché en memoria de sesiones de firmante.
+
+Un certificado .p12 se desbloquea una sola vez; el SimpleSigner resultante y
+el nombre del titular se guardan indexados por la huella SHA-256 del
+certificado, y el cliente recibe un token de corta duración para firmar sin
+volver a enviar el archivo ni la contraseña.
+"""
+
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+
+from pyhanko.sign.signers import SimpleSigner
+
+from .pdf_signer import get_cert_subject
+
+
+@dataclass
+class SignerSession:
+    """Certificado desbloqueado y listo para firmar."""
+    token: str
+    fingerprint: str
+    signer: SimpleSigner
+    cert_subject: str
+    expires_at: datetime
+
+
+@dataclass
+class _CachedSigner:
+    signer: SimpleSigner
+    cert_subject: str
+    expires_at_monotonic: float
+    expires_at: datetime
+    tokens: set = field(default_factory=set)
+
+
+class SignerSessionCache:
+    """Caché LRU acotada con expiración por TTL, segura entre hilos."""
+
+    def __init__(self, ttl_seconds, max_entries):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # huella -> _CachedSigner
+        self._tokens = {}              # token -> huella
+        self._lock = threading.Lock()
+
+    def unlock(self, pkcs12_bytes, password):
+        """
+        Desbloquear un certificado PKCS#12 y abrir una sesión para él.
+
+        Raises:
+            ValueError: si el archivo está corrupto o la contraseña es incorrecta.
+        """
+        return self.open(SimpleSigner.load_pkcs12_data(
+            pkcs12_bytes,
+            other_certs=None,
+            passphrase=password.encode("utf-8") if password else None
+        ))
+
+    def open(self, signer: SimpleSigner):
+        """
+        Abrir una sesión para un certificado ya desbloqueado (por ejemplo, con
+        PDFSigner.from_pkcs12_data en el pool de procesos).
+        """
+        fingerprint = signer.signing_cert.sha256.hex()
+        token = secrets.token_urlsafe(32)
+        expires_at_monotonic = time.monotonic() + self.ttl_seconds
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.ttl_seconds)
+
+        with self._lock:
+            self._purge_expired()
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                entry = _CachedSigner(signer, get_cert_subject(signer), expires_at_monotonic, expires_at)
+                self._entries[fingerprint] = entry
+            else:
+                # Mismo certificado: se reutiliza el firmante ya cargado
+                entry.expires_at_monotonic = expires_at_monotonic
+                entry.expires_at = expires_at
+            self._entries.move_to_end(fingerprint)
+            entry.tokens.add(token)
+            self._tokens[token] = fingerprint
+
+            while len(self._entries) > self.max_entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop_tokens(evicted)
+
+            return SignerSession(token, fingerprint, entry.signer, entry.cert_subject, entry.expires_at)
+
+    def get(self, token):
+        """Obtener la sesión asociada a un token, o None si no existe o expiró."""
+        with self._lock:
+            fingerprint = self._tokens.get(token)
+            if fingerprint is None:
+                return None
+            entry = self._entries[fingerprint]
+            if entry.expires_at_monotonic <= time.monotonic():
+                del self._entries[fingerprint]
+                self._drop_tokens(entry)
+                return None
+            self._entries.move_to_end(fingerprint)
+            return SignerSession(token, fingerprint, entry.signer, entry.cert_subject, entry.expires_at)
+
+    def revoke(self, token):
+        """Cerrar una sesión. El firmante se libera cuando no quedan tokens."""
+        with self._lock:
+            fingerprint = self._tokens.pop(token, None)
+            if fingerprint is None:
+                return False
+            entry = self._entries[fingerprint]
+            entry.tokens.discard(token)
+            if not entry.tokens:
+                del self._entries[fingerprint]
+            return True
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def _drop_tokens(self, entry):
+        for token in entry.tokens:
+            self._tokens.pop(token, None)
+        entry.tokens.clear()
+
+    def _purge_expired(self):
+        now = time.monotonic()
+        expired = [fp for fp, entry in self._entries.items() if entry.expires_at_monotonic <= now]
+        for fingerprint in expired:
+            self._drop_tokens(self._entries.pop(fingerprint))
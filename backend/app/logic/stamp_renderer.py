@@ -0,0 +1,268 @@
+"""
+Motor de renderizado de la estampa visual de firma (QR + texto).
+
+Mantiene en memoria, a nivel de proceso, las fuentes TrueType, el diseño
+estático de cada firmante y la versión y máscara del QR de cada clase de
+contenido, para que cada firma solo tenga que codificar el QR, dibujar sus
+módulos y el texto una única vez y hacer un único redimensionado final.
+"""
+
+import os
+import platform
+from collections import namedtuple
+from functools import lru_cache
+
+import qrcode
+from PIL import Image, ImageDraw, ImageFont
+
+LINE_HEADER = "Firmado electrónicamente por:"
+LINE_FOOTER = "Validar únicamente con FirmaEC"
+
+# Claves de configuración de PDFSigner.settings que afectan al diseño del texto
+LAYOUT_SETTING_KEYS = (
+    'text_font_size_normal',
+    'text_font_size_bold',
+    'scale_factor',
+    'separacion_1_2',
+    'separacion_2_3',
+    'separacion_final',
+    'desfase_vertical_texto',
+    'text_padding_hr',
+)
+
+# Diseño del bloque de texto, con coordenadas relativas al origen del texto
+# (x = inicio del área de texto, y = 0 del lienzo).
+TextLayout = namedtuple(
+    "TextLayout",
+    ["lines", "max_width", "total_height", "bbox", "padding", "desfase", "scale"]
+)
+# Cada línea: (texto, fuente, y_relativa)
+TextLine = namedtuple("TextLine", ["text", "font", "y"])
+
+
+def _resolve_font_paths():
+    """Determinar (una sola vez) las rutas de fuente según el sistema operativo."""
+    font_path_normal, font_path_bold = "C:/Windows/Fonts/cour.ttf", "C:/Windows/Fonts/courbd.ttf"  # Courrier New
+    if platform.system() == "Darwin":  # macOS
+        font_path_normal, font_path_bold = "/System/Library/Fonts/Courier.dfont", "/System/Library/Fonts/Courier.dfont"
+    elif platform.system() == "Linux":
+        # Buscar fuentes comunes en Linux, esto puede variar
+        common_fonts = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Regular.ttf"]
+        common_fonts_bold = ["/usr/share/fonts/truetype/dejavu/DejaVuSansMono-Bold.ttf", "/usr/share/fonts/truetype/liberation/LiberationMono-Bold.ttf"]
+        font_path_normal = next((f for f in common_fonts if os.path.exists(f)), "default")
+        font_path_bold = next((f for f in common_fonts_bold if os.path.exists(f)), "default")
+    return font_path_normal, font_path_bold
+
+
+FONT_PATH_NORMAL, FONT_PATH_BOLD = _resolve_font_paths()
+
+
+@lru_cache(maxsize=32)
+def get_font(path, size):
+    """Cargar una fuente TrueType una sola vez por proceso, indexada por ruta y tamaño."""
+    try:
+        if path != "default":
+            return ImageFont.truetype(path, size=size)
+        return ImageFont.load_default(size=size)
+    except IOError:
+        return ImageFont.load_default(size=size)
+
+
+def split_signer_name(cert_subject):
+    """Dividir el nombre del firmante en una o dos líneas para la estampa."""
+    tokens = cert_subject.upper().split()
+    name_line1 = " ".join(tokens[:2]) if len(tokens) > 2 else " ".join(tokens) or "NO DISPONIBLE"
+    name_line2 = " ".join(tokens[2:]) if len(tokens) > 2 else None
+    return name_line1, name_line2
+
+
+def layout_key(settings):
+    """Extraer de la configuración solo los valores que afectan al diseño del texto."""
+    return tuple(settings[key] for key in LAYOUT_SETTING_KEYS)
+
+
+@lru_cache(maxsize=256)
+def get_text_layout(cert_subject, key):
+    """
+    Precalcular las métricas del texto de la estampa para un firmante y una
+    combinación de configuración. El resultado se reutiliza entre firmas.
+    """
+    (font_size_normal, font_size_bold, scale, sep_1_2, sep_2_3,
+     sep_final, desfase, padding) = key
+
+    font_normal = get_font(FONT_PATH_NORMAL, font_size_normal * scale)
+    font_bold = get_font(FONT_PATH_BOLD, font_size_bold * scale)
+    name_line1, name_line2 = split_signer_name(cert_subject)
+
+    text_lines_data = [(LINE_HEADER, font_normal), (name_line1, font_bold)]
+    if name_line2:
+        text_lines_data.append((name_line2, font_bold))
+    text_lines_data.append((LINE_FOOTER, font_normal))
+
+    temp_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    origin_bboxes = [temp_draw.textbbox((0, 0), text, font=font) for text, font in text_lines_data]
+    heights = [bbox[3] - bbox[1] for bbox in origin_bboxes]
+    max_width = max(bbox[2] - bbox[0] for bbox in origin_bboxes)
+
+    # Altura total tal y como la calculaba el renderizador original (incluida
+    # la selección de índice de la última línea), porque define el alto del lienzo.
+    total_height = heights[0]
+    if len(heights) > 1:
+        total_height += (sep_1_2 * scale) + heights[1]
+    if name_line2 and len(heights) > 2:
+        total_height += (sep_2_3 * scale) + heights[2]
+    idx_line3 = 2 if name_line2 else 1
+    if len(heights) > idx_line3:
+        total_height += (sep_final * scale) + heights[idx_line3 + (1 if name_line2 else 0)]
+
+    # Posición vertical de cada línea y caja envolvente del texto
+    gaps = [sep_1_2 * scale]
+    if name_line2:
+        gaps.append(sep_2_3 * scale)
+    gaps.append(sep_final * scale)
+
+    lines = []
+    y = desfase * scale
+    min_x = min_y = float('inf')
+    max_x = max_y = float('-inf')
+    for i, ((text, font), bbox) in enumerate(zip(text_lines_data, origin_bboxes)):
+        lines.append(TextLine(text, font, y))
+        min_x = min(min_x, bbox[0])
+        min_y = min(min_y, y + bbox[1])
+        max_x = max(max_x, bbox[2])
+        max_y = max(max_y, y + bbox[3])
+        if i < len(gaps):
+            y += heights[i] + gaps[i]
+
+    return TextLayout(
+        lines=tuple(lines),
+        max_width=max_width,
+        total_height=total_height,
+        bbox=(min_x, min_y, max_x, max_y),
+        padding=padding * scale,
+        desfase=desfase * scale,
+        scale=scale,
+    )
+
+
+# Versión y máscara del QR por "clase" de contenido: los segmentos (modo y
+# longitud) en que qrcode divide el texto. Entre firmas del mismo firmante,
+# razón y ubicación solo cambia la fecha, que siempre tiene la misma forma.
+QRShape = namedtuple("QRShape", ["version", "mask_pattern"])
+QR_SHAPE_CACHE_SIZE = 256
+_qr_shapes = {}
+
+
+def _qr_shape(qr):
+    """
+    Versión mínima y máscara del QR de este contenido, calculadas (con la
+    búsqueda completa de qrcode: 8 matrices y su penalización) solo la primera
+    vez que aparece su clase. La máscara reutilizada no es necesariamente la
+    de menor penalización para otro contenido, pero cualquiera de las 8 es
+    válida y la versión sí es exactamente la mínima.
+    """
+    key = tuple((chunk.mode, len(chunk)) for chunk in qr.data_list)
+    shape = _qr_shapes.get(key)
+    if shape is None:
+        version = qr.best_fit()
+        shape = QRShape(version, qr.best_mask_pattern())
+        if len(_qr_shapes) >= QR_SHAPE_CACHE_SIZE:
+            _qr_shapes.pop(next(iter(_qr_shapes)))
+        _qr_shapes[key] = shape
+    return shape
+
+
+def _module_bitmap(modules, module_px):
+    """
+    Imagen de 1 bit con cada módulo como un cuadrado de module_px píxeles
+    (negro = módulo oscuro), construida fila a fila sin pasar por RGB.
+    """
+    size = len(modules) * module_px
+    padding = "1" * (-size % 8)  # cada fila ocupa un número entero de bytes
+    row_bytes = (size + len(padding)) // 8
+    dark, light = "0" * module_px, "1" * module_px
+    rows = []
+    for row in modules:
+        bits = "".join(dark if module else light for module in row) + padding
+        rows.append(int(bits, 2).to_bytes(row_bytes, "big") * module_px)
+    return Image.frombytes("1", (size, size), b"".join(rows))
+
+
+def qr_modules(qr_text):
+    """Matriz de módulos del QR (True = oscuro), sin borde."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(qr_text)
+    qr.version, qr.mask_pattern = _qr_shape(qr)
+    qr.make(fit=False)
+    return qr.modules
+
+
+def render_qr(qr_text, module_px):
+    """
+    Imagen del código QR (1 bit, sin borde) con cada módulo de module_px
+    píxeles, ya al tamaño final del lienzo.
+    """
+    return _module_bitmap(qr_modules(qr_text), module_px)
+
+
+# Geometría de la estampa en píxeles del lienzo de alta resolución: posición
+# x del texto, tamaño del lienzo y caja final (unión del QR y del texto)
+StampGeometry = namedtuple("StampGeometry", ["text_x", "canvas_width", "canvas_height", "crop_box"])
+
+
+def stamp_geometry(layout, qr_size):
+    """Geometría de una estampa con un QR de qr_size píxeles de lado junto al texto de layout."""
+    text_x = qr_size + layout.padding
+    canvas_width = text_x + layout.max_width + (2 * layout.padding)
+    canvas_height = max(qr_size, layout.desfase + layout.total_height)
+
+    # Caja final = unión de la caja del QR y la del texto
+    text_min_x, text_min_y, text_max_x, text_max_y = layout.bbox
+    crop_box = (
+        min(0, text_x + text_min_x),
+        min(0, text_min_y),
+        max(qr_size, text_x + text_max_x),
+        max(qr_size, text_max_y),
+    )
+    return StampGeometry(text_x, canvas_width, canvas_height, crop_box)
+
+
+def render_stamp(cert_subject, qr_text, settings):
+    """
+    Renderizar la estampa completa (QR a la izquierda, texto a la derecha).
+
+    Solo se dibuja la región que sobrevive al recorte final, en una única
+    pasada y con un único redimensionado LANCZOS.
+    """
+    layout = get_text_layout(cert_subject, layout_key(settings))
+    scale = layout.scale
+    img_qr = render_qr(qr_text, settings['qr_box_size'] * scale)
+    text_x, canvas_width, canvas_height, crop_box = stamp_geometry(layout, img_qr.width)
+    # Parte de la caja que cae dentro del lienzo original; fuera de él el
+    # recorte original producía píxeles negros.
+    inner_box = (
+        max(crop_box[0], 0),
+        max(crop_box[1], 0),
+        min(crop_box[2], canvas_width),
+        min(crop_box[3], canvas_height),
+    )
+    offset_x, offset_y = inner_box[0], inner_box[1]
+
+    canvas = Image.new("RGB", (inner_box[2] - inner_box[0], inner_box[3] - inner_box[1]), color="#FFFFFF")
+    canvas.paste(img_qr, (-offset_x, -offset_y))
+    draw = ImageDraw.Draw(canvas)
+    for line in layout.lines:
+        draw.text((text_x - offset_x, line.y - offset_y), line.text, fill="black", font=line.font)
+
+    if inner_box != crop_box:
+        outer = Image.new("RGB", (crop_box[2] - crop_box[0], crop_box[3] - crop_box[1]), color="#000000")
+        outer.paste(canvas, (inner_box[0] - crop_box[0], inner_box[1] - crop_box[1]))
+        canvas = outer
+
+    stamp = canvas.resize((canvas.width // scale, canvas.height // scale), resample=Image.LANCZOS)
+
+    # Auto-crop para eliminar espacios blancos adicionales
+    bbox_final = stamp.getbbox()
+    if bbox_final:
+        stamp = stamp.crop(bbox_final)
+    return stamp
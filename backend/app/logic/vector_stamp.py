@@ -0,0 +1,254 @@
+"""
+Apariencia vectorial de la estampa de firma: el QR se dibuja como
+rectángulos de un trazado PDF y el texto como texto PDF con la misma fuente
+TrueType que usa el renderizador de imágenes, en lugar de incrustar un mapa
+de bits generado con Pillow.
+
+La fuente se incrusta como un subconjunto fijo de caracteres (no depende del
+texto de cada firma): la primera firma vectorial de un documento lo añade y
+las siguientes reutilizan el objeto de fuente de esa revisión anterior, de
+modo que cada firma solo añade su trazado y unas pocas líneas de texto.
+"""
+
+import hashlib
+import io
+import string
+from collections import namedtuple
+from functools import lru_cache
+
+from fontTools import subset
+from fontTools.ttLib import TTFont
+from pyhanko.pdf_utils import generic
+from pyhanko.pdf_utils.content import PdfContent, ResourceType
+from pyhanko.pdf_utils.generic import pdf_name
+from pyhanko.pdf_utils.layout import BoxConstraints
+
+from .stamp_renderer import get_text_layout, layout_key, qr_modules, stamp_geometry
+
+# Caracteres del subconjunto incrustado (todos existen en cp1252, la
+# codificación WinAnsi del texto); el resto se escribe como "?"
+STAMP_CHARSET = frozenset(
+    string.ascii_letters + string.digits + string.punctuation + " " + "ÁÉÍÓÚÜÑáéíóúüñ¿¡"
+)
+FIRST_CHAR, LAST_CHAR = 32, 255
+
+# Una fuente incrustable: nombre con etiqueta de subconjunto, TrueType del
+# subconjunto, anchos (/Widths) y métricas del /FontDescriptor (en 1/1000 em)
+EmbeddedFont = namedtuple("EmbeddedFont", ["base_font", "data", "widths", "bbox", "ascent", "descent", "cap_height", "bold", "fixed_pitch"])
+
+# Estampa ya compuesta, en unidades del espacio de la estampa: caja, trazado
+# del QR y cada línea de texto (fuente, tamaño, x e y de la línea base, texto)
+VectorStamp = namedtuple("VectorStamp", ["width", "height", "qr_ops", "lines"])
+VectorLine = namedtuple("VectorLine", ["font_path", "size", "x", "y", "text"])
+
+
+def supports_font(font):
+    """La apariencia vectorial necesita un archivo TrueType (no la fuente por defecto de Pillow)."""
+    return getattr(font, "path", None) is not None
+
+
+@lru_cache(maxsize=8)
+def load_font_subset(path):
+    """Subconjunto STAMP_CHARSET de la fuente TrueType en path, una vez por proceso."""
+    font = TTFont(path)
+    options = subset.Options()
+    options.hinting = False
+    options.layout_features = []
+    options.name_IDs = [1, 2, 4, 6]
+    options.drop_tables += ["FFTM"]
+    subsetter = subset.Subsetter(options)
+    subsetter.populate(unicodes=[ord(char) for char in STAMP_CHARSET])
+    subsetter.subset(font)
+    buffer = io.BytesIO()
+    font.save(buffer)
+    data = buffer.getvalue()
+
+    units = font["head"].unitsPerEm
+    to_pdf = lambda value: round(value * 1000 / units)
+    cmap = font.getBestCmap()
+    advances = font["hmtx"].metrics
+    missing = to_pdf(advances[".notdef"][0])
+    widths = []
+    for code in range(FIRST_CHAR, LAST_CHAR + 1):
+        char = bytes([code]).decode("cp1252", errors="ignore")
+        glyph = cmap.get(ord(char)) if char in STAMP_CHARSET else None
+        widths.append(to_pdf(advances[glyph][0]) if glyph else missing)
+
+    # La etiqueta depende del contenido: un subconjunto distinto (otra fuente
+    # u otro conjunto de caracteres) nunca se confunde con uno ya incrustado
+    digest = hashlib.sha256(data).digest()
+    tag = "".join(chr(ord("A") + byte % 26) for byte in digest[:6])
+    postscript_name = font["name"].getDebugName(6) or "Font"
+    head, os2 = font["head"], font["OS/2"]
+    return EmbeddedFont(
+        base_font=f"{tag}+{postscript_name}",
+        data=data,
+        widths=widths,
+        bbox=[to_pdf(head.xMin), to_pdf(head.yMin), to_pdf(head.xMax), to_pdf(head.yMax)],
+        ascent=to_pdf(font["hhea"].ascent),
+        descent=to_pdf(font["hhea"].descent),
+        cap_height=to_pdf(getattr(os2, "sCapHeight", 0) or font["hhea"].ascent),
+        bold=bool(head.macStyle & 1),
+        fixed_pitch=bool(font["post"].isFixedPitch),
+    )
+
+
+def _font_dictionary(writer, font: EmbeddedFont):
+    """Escribir en el PDF los objetos de la fuente y devolver la referencia al diccionario."""
+    font_file = generic.StreamObject(
+        {pdf_name("/Length1"): generic.NumberObject(len(font.data))},
+        stream_data=font.data
+    )
+    font_file.compress()
+    descriptor = generic.DictionaryObject({
+        pdf_name("/Type"): pdf_name("/FontDescriptor"),
+        pdf_name("/FontName"): pdf_name("/" + font.base_font),
+        # 32 = no simbólica (se usa /WinAnsiEncoding); 1 = ancho fijo, solo si
+        # la fuente lo es: los visores eligen con estos bits la sustituta
+        pdf_name("/Flags"): generic.NumberObject((1 if font.fixed_pitch else 0) | 32),
+        pdf_name("/FontBBox"): generic.ArrayObject(generic.NumberObject(v) for v in font.bbox),
+        pdf_name("/ItalicAngle"): generic.NumberObject(0),
+        pdf_name("/Ascent"): generic.NumberObject(font.ascent),
+        pdf_name("/Descent"): generic.NumberObject(font.descent),
+        pdf_name("/CapHeight"): generic.NumberObject(font.cap_height),
+        pdf_name("/StemV"): generic.NumberObject(140 if font.bold else 80),
+        pdf_name("/FontFile2"): writer.add_object(font_file),
+    })
+    return writer.add_object(generic.DictionaryObject({
+        pdf_name("/Type"): pdf_name("/Font"),
+        pdf_name("/Subtype"): pdf_name("/TrueType"),
+        pdf_name("/BaseFont"): pdf_name("/" + font.base_font),
+        pdf_name("/FirstChar"): generic.NumberObject(FIRST_CHAR),
+        pdf_name("/LastChar"): generic.NumberObject(LAST_CHAR),
+        pdf_name("/Widths"): generic.ArrayObject(generic.NumberObject(w) for w in font.widths),
+        pdf_name("/Encoding"): pdf_name("/WinAnsiEncoding"),
+        pdf_name("/FontDescriptor"): writer.add_object(descriptor),
+    }))
+
+
+def _embedded_fonts(resources, found, depth=0):
+    """Recorrer un diccionario de recursos (y sus XObject de formulario) buscando fuentes."""
+    if depth > 3 or not isinstance(resources, generic.DictionaryObject):
+        return
+    # DictionaryObject.get no resuelve las referencias indirectas; [] sí
+    fonts = resources["/Font"] if "/Font" in resources else None
+    if isinstance(fonts, generic.DictionaryObject):
+        for key in fonts:
+            reference = fonts.raw_get(key)
+            font = fonts[key]
+            if isinstance(reference, generic.IndirectObject) and "/BaseFont" in font:
+                found.setdefault(str(font["/BaseFont"])[1:], reference)
+    xobjects = resources["/XObject"] if "/XObject" in resources else None
+    if isinstance(xobjects, generic.DictionaryObject):
+        for key in xobjects:
+            xobject = xobjects[key]
+            if "/Subtype" in xobject and xobject["/Subtype"] == "/Form" and "/Resources" in xobject:
+                _embedded_fonts(xobject["/Resources"], found, depth + 1)
+
+
+def find_document_fonts(writer):
+    """
+    Fuentes (nombre -> referencia) usadas por las apariencias de los campos
+    de firma que ya tiene el documento.
+    """
+    found = {}
+    try:
+        root = writer.root
+        if "/AcroForm" not in root or "/Fields" not in root["/AcroForm"]:
+            return found
+        for field in root["/AcroForm"]["/Fields"]:
+            field = field.get_object()
+            if "/AP" not in field or "/N" not in field["/AP"]:
+                continue
+            normal = field["/AP"]["/N"]
+            if "/Resources" in normal:
+                _embedded_fonts(normal["/Resources"], found)
+    except Exception as e:
+        # Un formulario con una estructura inesperada solo impide reutilizar la fuente
+        print(f"No se pudieron leer las fuentes del documento: {e}")
+    return found
+
+
+def _encode_text(text):
+    """Texto en WinAnsi, escapado como cadena literal de PDF."""
+    text = "".join(char if char in STAMP_CHARSET else "?" for char in text)
+    raw = text.encode("cp1252")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _qr_path(modules, module, x0, top):
+    """Los módulos oscuros como rectángulos (uno por tramo horizontal), rellenados de una vez."""
+    ops = []
+    for row_index, row in enumerate(modules):
+        y = top - (row_index + 1) * module
+        column = 0
+        size = len(row)
+        while column < size:
+            if not row[column]:
+                column += 1
+                continue
+            start = column
+            while column < size and row[column]:
+                column += 1
+            ops.append(b"%g %g %g %g re" % (x0 + start * module, y, (column - start) * module, module))
+    return b"\n".join(ops) + b"\nf"
+
+
+def build_vector_stamp(cert_subject, qr_text, settings):
+    """
+    Componer la estampa con la misma disposición que render_stamp, en
+    unidades del lienzo de alta resolución divididas por scale_factor.
+    Devuelve None si alguna fuente no es TrueType.
+    """
+    layout = get_text_layout(cert_subject, layout_key(settings))
+    if not all(supports_font(line.font) for line in layout.lines):
+        return None
+    scale = layout.scale
+    modules = qr_modules(qr_text)
+    qr_size = len(modules) * settings['qr_box_size'] * scale
+    text_x, _, _, crop_box = stamp_geometry(layout, qr_size)
+    left, top = crop_box[0], crop_box[1]
+    height = (crop_box[3] - top) / scale
+
+    lines = []
+    for line in layout.lines:
+        ascent = line.font.getmetrics()[0]
+        lines.append(VectorLine(
+            font_path=line.font.path,
+            size=line.font.size / scale,
+            x=(text_x - left) / scale,
+            y=height - (line.y + ascent - top) / scale,
+            text=line.text,
+        ))
+    return VectorStamp(
+        width=(crop_box[2] - left) / scale,
+        height=height,
+        qr_ops=_qr_path(modules, settings['qr_box_size'], -left / scale, height + top / scale),
+        lines=lines,
+    )
+
+
+class VectorStampContent(PdfContent):
+    """Contenido PDF de una VectorStamp, para usarlo como fondo de un TextStampStyle."""
+
+    def __init__(self, stamp: VectorStamp):
+        super().__init__(box=BoxConstraints(width=stamp.width, height=stamp.height))
+        self.stamp = stamp
+
+    def render(self):
+        writer = self._ensure_writer
+        existing = find_document_fonts(writer)
+        names = {}
+        ops = [b"q 0 g", self.stamp.qr_ops, b"BT"]
+        for line in self.stamp.lines:
+            if line.font_path not in names:
+                font = load_font_subset(line.font_path)
+                name = pdf_name(f"/FirmaEC{len(names) + 1}")
+                reference = existing.get(font.base_font) or _font_dictionary(writer, font)
+                self.set_resource(ResourceType.FONT, name, reference)
+                names[line.font_path] = name
+            ops.append(b"%s %g Tf 1 0 0 1 %g %g Tm (%s) Tj" % (
+                names[line.font_path].encode("ascii"), line.size, line.x, line.y, _encode_text(line.text)
+            ))
+        ops.append(b"ET Q")
+        return b"\n".join(ops)
@@ -0,0 +1,157 @@
+"""
+Instrumentación: tiempos por etapa de subida, firma y descarga, tamaños de
+los archivos, gauges de trabajo en curso y uso de los pools de conexiones a
+la base de datos, expuestos en /metrics para Prometheus.
+
+Uso:
+    trace = metrics.start_trace("sign")
+    with trace.span("download"):
+        ...
+    trace.finish(document_id=...)
+
+Con METRICS_ENABLED=0 start_trace devuelve un objeto vacío compartido y
+span() un contexto nulo reutilizable: no se mide ni se reserva nada, y
+prometheus_client ni siquiera se importa.
+"""
+
+import contextlib
+import json
+import time
+
+from .config import METRICS_ENABLED, METRICS_LOG_TRACES
+
+# Cubetas de duración (segundos) y de tamaño (bytes)
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+SIZE_BUCKETS = (16 * 1024, 64 * 1024, 256 * 1024, 1024 ** 2, 4 * 1024 ** 2, 16 * 1024 ** 2, 64 * 1024 ** 2, 256 * 1024 ** 2)
+
+_NULL_CONTEXT = contextlib.nullcontext()
+
+
+class _NullTrace:
+    """Traza que no mide nada (métricas desactivadas)."""
+
+    def span(self, stage):
+        return _NULL_CONTEXT
+
+    def record(self, stage, seconds):
+        pass
+
+    def size(self, num_bytes):
+        pass
+
+    def finish(self, **fields):
+        pass
+
+
+_NULL_TRACE = _NullTrace()
+
+
+class _Span:
+    __slots__ = ("trace", "stage", "start")
+
+    def __init__(self, trace, stage):
+        self.trace = trace
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.trace.record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+class Trace:
+    """
+    Tiempos de las etapas de una operación (una petición o un trabajo). Los
+    histogramas se alimentan en finish(), con el nombre de operación final.
+    """
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.start = time.perf_counter()
+        self.spans = {}
+        self.sizes = []
+
+    def span(self, stage):
+        return _Span(self, stage)
+
+    def record(self, stage, seconds):
+        """Registrar una etapa medida en otro lugar (p. ej. en el pool de procesos)."""
+        self.spans[stage] = self.spans.get(stage, 0.0) + seconds
+
+    def size(self, num_bytes):
+        self.sizes.append(num_bytes)
+
+    def finish(self, **fields):
+        total = time.perf_counter() - self.start
+        OPERATION_DURATION.labels(self.operation).observe(total)
+        for stage, seconds in self.spans.items():
+            STAGE_DURATION.labels(self.operation, stage).observe(seconds)
+        for num_bytes in self.sizes:
+            PAYLOAD_SIZE.labels(self.operation).observe(num_bytes)
+        if METRICS_LOG_TRACES:
+            print(json.dumps({
+                "event": "timing",
+                "operation": self.operation,
+                "total_s": round(total, 6),
+                "spans_s": {stage: round(seconds, 6) for stage, seconds in self.spans.items()},
+                **{key: str(value) for key, value in fields.items()},
+            }))
+
+
+def start_trace(operation):
+    return Trace(operation) if METRICS_ENABLED else _NULL_TRACE
+
+
+class _NullGauge:
+    def labels(self, *values):
+        return self
+
+    def inc(self, amount=1):
+        pass
+
+    def dec(self, amount=1):
+        pass
+
+    def set(self, value):
+        pass
+
+    def observe(self, value):
+        pass
+
+
+if METRICS_ENABLED:
+    from prometheus_client import CONTENT_TYPE_LATEST, Gauge, Histogram, generate_latest
+
+    STAGE_DURATION = Histogram(
+        "firma_stage_duration_seconds", "Duración de cada etapa de una operación.",
+        ("operation", "stage"), buckets=DURATION_BUCKETS
+    )
+    OPERATION_DURATION = Histogram(
+        "firma_operation_duration_seconds", "Duración total de una operación.",
+        ("operation",), buckets=DURATION_BUCKETS
+    )
+    PAYLOAD_SIZE = Histogram(
+        "firma_payload_bytes", "Tamaño de los PDF subidos, firmados y descargados.",
+        ("operation",), buckets=SIZE_BUCKETS
+    )
+    TEMP_DIRS_IN_FLIGHT = Gauge("firma_temp_dirs_in_flight", "Directorios temporales de trabajo existentes.")
+    SIGNING_JOBS_PENDING = Gauge("firma_signing_jobs_pending", "Trabajos de firma asíncrona en cola o en proceso.")
+    DB_POOL_CHECKOUT = Histogram(
+        "firma_db_pool_checkout_seconds", "Espera por una conexión del pool de la base de datos.",
+        ("engine",), buckets=(0.0005, 0.001, 0.0025) + DURATION_BUCKETS
+    )
+    DB_POOL_IN_USE = Gauge("firma_db_pool_connections_in_use", "Conexiones del pool prestadas en este momento.", ("engine",))
+    DB_POOL_CAPACITY = Gauge("firma_db_pool_connections_max", "Máximo de conexiones del pool (pool_size + max_overflow).", ("engine",))
+else:
+    CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+    TEMP_DIRS_IN_FLIGHT = _NullGauge()
+    SIGNING_JOBS_PENDING = _NullGauge()
+    DB_POOL_CHECKOUT = DB_POOL_IN_USE = DB_POOL_CAPACITY = _NullGauge()
+
+
+def render_latest():
+    """Texto de exposición de Prometheus con todas las métricas registradas."""
+    return generate_latest()
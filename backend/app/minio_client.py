@@ -1,21 +1,95 @@
+import hashlib
+import io
 import os
+import re
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
 import boto3
+from boto3.s3.transfer import TransferConfig
 from botocore.client import Config
 from botocore.exceptions import ClientError
 
+from .config import IO_POOL_MAX_WORKERS
+
 # Leemos la configuración de MinIO desde las variables de entorno
 MINIO_ENDPOINT = os.environ.get("MINIO_ENDPOINT", "http://minio:9000")
 MINIO_ACCESS_KEY = os.environ.get("MINIO_ACCESS_KEY", "minioadmin")
 MINIO_SECRET_KEY = os.environ.get("MINIO_SECRET_KEY", "minioadmin")
 
-# Creamos el cliente de S3, configurado para apuntar a nuestro MinIO
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=MINIO_ENDPOINT,
-    aws_access_key_id=MINIO_ACCESS_KEY,
-    aws_secret_access_key=MINIO_SECRET_KEY,
-    config=Config(signature_version="s3v4")
-)
+# Tamaño de cada parte en las subidas por streaming (S3 exige al menos 5 MiB
+# por parte salvo la última) y de cada bloque en las descargas por streaming.
+MIN_MULTIPART_PART_SIZE = 5 * 1024 * 1024
+UPLOAD_PART_SIZE = max(MIN_MULTIPART_PART_SIZE, int(os.environ.get("STORAGE_UPLOAD_PART_SIZE", str(8 * 1024 * 1024))))
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get("STORAGE_DOWNLOAD_CHUNK_SIZE", str(256 * 1024)))
+
+# Subidas: tamaño a partir del cual se usa multipart y cuántas partes de una
+# misma subida se envían a la vez (cada una ocupa UPLOAD_PART_SIZE en memoria).
+MULTIPART_THRESHOLD = max(UPLOAD_PART_SIZE, int(os.environ.get("STORAGE_MULTIPART_THRESHOLD", str(UPLOAD_PART_SIZE))))
+TRANSFER_CONCURRENCY = max(1, int(os.environ.get("STORAGE_TRANSFER_CONCURRENCY", "4")))
+
+# Cliente: conexiones HTTP que se mantienen abiertas (por defecto, una por
+# cada hilo de E/S y parte en vuelo, para que ninguna petición espere ni se
+# descarte una conexión con "Connection pool is full"), modo y número de
+# reintentos ("adaptive" además limita el ritmo si MinIO responde con
+# throttling) y timeouts en segundos.
+MAX_POOL_CONNECTIONS = int(os.environ.get("STORAGE_MAX_POOL_CONNECTIONS", str(IO_POOL_MAX_WORKERS * TRANSFER_CONCURRENCY)))
+RETRY_MODE = os.environ.get("STORAGE_RETRY_MODE", "adaptive")
+MAX_ATTEMPTS = int(os.environ.get("STORAGE_MAX_ATTEMPTS", "5"))
+CONNECT_TIMEOUT = float(os.environ.get("STORAGE_CONNECT_TIMEOUT", "5"))
+READ_TIMEOUT = float(os.environ.get("STORAGE_READ_TIMEOUT", "60"))
+
+# Los objetos direccionados por contenido se guardan como sha256/<hex>
+CONTENT_PREFIX = "sha256/"
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Resultado de put_content; uploaded es False si el contenido ya existía
+StoredContent = namedtuple("StoredContent", "key sha256 size etag uploaded")
+
+# Parte de un archivo guardado como varios objetos concatenados (una
+# revisión base y los incrementos de las firmas). size=None: objeto entero
+# de tamaño desconocido (solo para lecturas completas).
+Segment = namedtuple("Segment", "key size")
+
+_BYTE_RANGE = re.compile(rb"/ByteRange\s*\[\s*(\d+)\s+(\d+)\s+(\d+)\s+(\d+)\s*\]")
+
+
+def create_s3_client(endpoint_url=None, **config_overrides):
+    """
+    Crear un cliente de S3 apuntando a MinIO con la configuración STORAGE_*.
+    config_overrides reemplaza opciones de botocore.config.Config (p. ej. en
+    los benchmarks, para comparar con la configuración por defecto).
+    """
+    options = {
+        "signature_version": "s3v4",
+        "max_pool_connections": MAX_POOL_CONNECTIONS,
+        "retries": {"mode": RETRY_MODE, "max_attempts": MAX_ATTEMPTS},
+        "connect_timeout": CONNECT_TIMEOUT,
+        "read_timeout": READ_TIMEOUT,
+        "tcp_keepalive": True,
+    }
+    options.update(config_overrides)
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint_url or MINIO_ENDPOINT,
+        aws_access_key_id=MINIO_ACCESS_KEY,
+        aws_secret_access_key=MINIO_SECRET_KEY,
+        config=Config(**options)
+    )
+
+
+def transfer_config():
+    """Umbrales, tamaño de parte y concurrencia de upload_file/download_file."""
+    return TransferConfig(
+        multipart_threshold=MULTIPART_THRESHOLD,
+        multipart_chunksize=UPLOAD_PART_SIZE,
+        max_concurrency=TRANSFER_CONCURRENCY,
+        io_chunksize=DOWNLOAD_CHUNK_SIZE,
+    )
+
+
+# Cliente de S3 compartido por todo el proceso (boto3 lo permite entre hilos)
+s3_client = create_s3_client()
 
 def create_bucket_if_not_exists(bucket_name: str):
     """Crea un bucket en MinIO si no existe ya."""
@@ -32,7 +106,7 @@ def create_bucket_if_not_exists(bucket_name: str):
 def upload_file(bucket_name: str, file_path: str, object_name: str):
     """Sube un archivo a un bucket de MinIO."""
     try:
-        s3_client.upload_file(file_path, bucket_name, object_name)
+        s3_client.upload_file(file_path, bucket_name, object_name, Config=transfer_config())
         print(f"Archivo '{file_path}' subido a '{bucket_name}/{object_name}'.")
     except ClientError as e:
         print(f"Error al subir archivo a MinIO: {e}")
@@ -41,8 +115,291 @@ def upload_file(bucket_name: str, file_path: str, object_name: str):
 def download_file(bucket_name: str, object_name: str, file_path: str):
     """Descarga un archivo desde un bucket de MinIO."""
     try:
-        s3_client.download_file(bucket_name, object_name, file_path)
+        s3_client.download_file(bucket_name, object_name, file_path, Config=transfer_config())
         print(f"Archivo '{bucket_name}/{object_name}' descargado a '{file_path}'.")
     except ClientError as e:
         print(f"Error al descargar archivo desde MinIO: {e}")
-        raise
\ No newline at end of file
+        raise
+
+def _iter_parts(head: bytes, fileobj):
+    """Partes de UPLOAD_PART_SIZE bytes: primero lo ya leído y luego el resto de fileobj."""
+    buffer = head
+    while True:
+        while len(buffer) < UPLOAD_PART_SIZE:
+            more = fileobj.read(UPLOAD_PART_SIZE - len(buffer))
+            if not more:
+                break
+            buffer += more
+        if not buffer:
+            return
+        yield buffer[:UPLOAD_PART_SIZE]
+        buffer = buffer[UPLOAD_PART_SIZE:]
+
+def upload_stream(bucket_name: str, fileobj, object_name: str, content_type: str = "application/pdf"):
+    """
+    Sube a MinIO el contenido de un objeto tipo archivo sin pasar por disco.
+
+    Si el contenido no supera MULTIPART_THRESHOLD se usa put_object; si no, se
+    hace una subida multipart con hasta TRANSFER_CONCURRENCY partes en vuelo,
+    de modo que la memoria usada depende del tamaño de parte y de la
+    concurrencia y no del tamaño del archivo.
+
+    Returns:
+        tuple: (número de bytes subidos, ETag del objeto creado).
+    """
+    head = fileobj.read(MULTIPART_THRESHOLD + 1)
+    try:
+        if len(head) <= MULTIPART_THRESHOLD:
+            response = s3_client.put_object(Bucket=bucket_name, Key=object_name, Body=head, ContentType=content_type)
+            print(f"Objeto '{bucket_name}/{object_name}' subido ({len(head)} bytes).")
+            return len(head), response["ETag"]
+
+        upload = s3_client.create_multipart_upload(Bucket=bucket_name, Key=object_name, ContentType=content_type)
+        upload_id = upload["UploadId"]
+        slots = threading.BoundedSemaphore(TRANSFER_CONCURRENCY)
+
+        def send(number, part):
+            try:
+                response = s3_client.upload_part(
+                    Bucket=bucket_name, Key=object_name, UploadId=upload_id,
+                    PartNumber=number, Body=part
+                )
+                return {"PartNumber": number, "ETag": response["ETag"]}
+            finally:
+                slots.release()
+
+        futures = []
+        total = 0
+        try:
+            with ThreadPoolExecutor(max_workers=TRANSFER_CONCURRENCY, thread_name_prefix="s3-part") as pool:
+                for number, part in enumerate(_iter_parts(head, fileobj), start=1):
+                    # No se lee la parte siguiente hasta que haya un hueco
+                    slots.acquire()
+                    futures.append(pool.submit(send, number, part))
+                    total += len(part)
+                parts = [future.result() for future in futures]
+            response = s3_client.complete_multipart_upload(
+                Bucket=bucket_name, Key=object_name, UploadId=upload_id,
+                MultipartUpload={"Parts": parts}
+            )
+        except Exception:
+            s3_client.abort_multipart_upload(Bucket=bucket_name, Key=object_name, UploadId=upload_id)
+            raise
+        print(f"Objeto '{bucket_name}/{object_name}' subido en {len(parts)} partes ({total} bytes).")
+        return total, response["ETag"]
+    except ClientError as e:
+        print(f"Error al subir archivo a MinIO: {e}")
+        raise
+
+def content_object_name(sha256: str):
+    """Clave en MinIO del contenido con ese SHA-256 (hexadecimal)."""
+    return f"{CONTENT_PREFIX}{sha256}"
+
+def put_content(bucket_name: str, fileobj, content_type: str = "application/pdf", claim=None):
+    """
+    Guarda el contenido de fileobj bajo su SHA-256. Si ya hay un objeto con
+    ese hash (el mismo PDF subido otra vez) no se sube nada.
+
+    fileobj debe admitir seek: el hash se calcula en una pasada previa por
+    bloques (el cuerpo de un UploadFile ya está en un archivo temporal de
+    Starlette) y luego se sube desde el principio con upload_stream.
+
+    claim(sha256, size), si se indica, se llama con el hash ya calculado y
+    antes de comprobar si el objeto existe (ver storage.claim_content).
+
+    Returns:
+        StoredContent: clave, hash, tamaño, ETag y si hubo que subirlo.
+    """
+    start = fileobj.tell()
+    digest = hashlib.sha256()
+    size = 0
+    for chunk in iter(lambda: fileobj.read(HASH_CHUNK_SIZE), b""):
+        digest.update(chunk)
+        size += len(chunk)
+    fileobj.seek(start)
+    sha256 = digest.hexdigest()
+    object_name = content_object_name(sha256)
+    if claim is not None:
+        claim(sha256, size)
+
+    try:
+        info = s3_client.head_object(Bucket=bucket_name, Key=object_name)
+        print(f"Objeto '{bucket_name}/{object_name}' ya existe; no se vuelve a subir.")
+        return StoredContent(object_name, sha256, size, info["ETag"], False)
+    except ClientError as e:
+        if e.response['Error']['Code'] not in ('404', 'NoSuchKey', 'NotFound'):
+            print(f"Error al consultar el objeto en MinIO: {e}")
+            raise
+
+    _, etag = upload_stream(bucket_name, fileobj, object_name, content_type)
+    return StoredContent(object_name, sha256, size, etag, True)
+
+def verify_increment_byte_range(increment: bytes, base_size: int, size: int):
+    """
+    Comprobar que la última firma del incremento cubre el archivo completo
+    (/ByteRange [0 a b c] con b + c = size) y que su /Contents, el hueco
+    entre a y b, queda dentro del incremento.
+
+    Raises:
+        ValueError: si no hay /ByteRange o los desplazamientos no cuadran.
+    """
+    matches = list(_BYTE_RANGE.finditer(increment))
+    if not matches:
+        raise ValueError("El incremento no contiene ninguna firma (/ByteRange).")
+    start1, length1, start2, length2 = (int(value) for value in matches[-1].groups())
+    if start1 != 0 or start2 + length2 != size or not base_size <= length1 < start2:
+        raise ValueError(
+            f"El /ByteRange [{start1} {length1} {start2} {length2}] no cuadra con "
+            f"una revisión base de {base_size} bytes y un archivo de {size} bytes."
+        )
+
+def put_increment(bucket_name: str, fileobj, base_size: int, base_sha256: str, content_type: str = "application/pdf", claim=None):
+    """
+    Guarda solo lo que una firma incremental añadió a la revisión anterior
+    (los base_size primeros bytes, con hash base_sha256), bajo su SHA-256.
+    claim es el de put_content.
+
+    Returns:
+        tuple: (SHA-256 del archivo completo, tamaño del archivo completo,
+        StoredContent del incremento).
+    Raises:
+        ValueError: si fileobj no empieza por la revisión base o si el
+        /ByteRange de la firma no cuadra; hay que guardarlo completo.
+    """
+    fileobj.seek(0)
+    digest = hashlib.sha256()
+    remaining = base_size
+    while remaining:
+        chunk = fileobj.read(min(HASH_CHUNK_SIZE, remaining))
+        if not chunk:
+            raise ValueError("El archivo es más corto que la revisión base.")
+        digest.update(chunk)
+        remaining -= len(chunk)
+    if digest.hexdigest() != base_sha256:
+        raise ValueError("El archivo no empieza por la revisión base.")
+
+    # El incremento (diccionario de firma, estampa y xref) es pequeño
+    increment = fileobj.read()
+    digest.update(increment)
+    size = base_size + len(increment)
+    verify_increment_byte_range(increment, base_size, size)
+    return digest.hexdigest(), size, put_content(bucket_name, io.BytesIO(increment), content_type, claim=claim)
+
+def delete_objects(bucket_name: str, object_names):
+    """Borra varios objetos (hasta 1000) en una sola petición."""
+    if not object_names:
+        return
+    response = s3_client.delete_objects(
+        Bucket=bucket_name,
+        Delete={"Objects": [{"Key": name} for name in object_names], "Quiet": True}
+    )
+    errors = response.get("Errors") or []
+    if errors:
+        raise RuntimeError(f"No se pudieron borrar {len(errors)} objetos de MinIO: {errors[0].get('Message')}")
+    print(f"{len(object_names)} objetos borrados de '{bucket_name}'.")
+
+def get_object_info(bucket_name: str, object_name: str):
+    """Obtiene los metadatos de un objeto (tamaño, ETag, versión, fecha) sin descargarlo."""
+    try:
+        return s3_client.head_object(Bucket=bucket_name, Key=object_name)
+    except ClientError as e:
+        print(f"Error al consultar el objeto en MinIO: {e}")
+        raise
+
+def read_object(bucket_name: str, object_name: str):
+    """Lee completo un objeto pequeño (p. ej. un índice JSON). None si no existe."""
+    try:
+        response = s3_client.get_object(Bucket=bucket_name, Key=object_name)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return None
+        print(f"Error al descargar archivo desde MinIO: {e}")
+        raise
+    body = response["Body"]
+    try:
+        return body.read()
+    finally:
+        body.close()
+
+def open_object_stream(bucket_name: str, object_name: str, byte_range=None):
+    """
+    Abre un objeto de MinIO para leerlo por bloques.
+
+    Args:
+        byte_range: (inicio, fin) inclusivos para leer solo una parte del objeto.
+
+    Returns:
+        tuple: (respuesta de get_object sin el cuerpo, iterador de bloques de bytes).
+        El iterador cierra la conexión al terminar.
+    """
+    params = {"Bucket": bucket_name, "Key": object_name}
+    if byte_range is not None:
+        params["Range"] = f"bytes={byte_range[0]}-{byte_range[1]}"
+    try:
+        response = s3_client.get_object(**params)
+    except ClientError as e:
+        print(f"Error al descargar archivo desde MinIO: {e}")
+        raise
+    body = response.pop("Body")
+
+    def chunks():
+        try:
+            for chunk in body.iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                yield chunk
+        finally:
+            body.close()
+
+    return response, chunks()
+
+def open_segments_stream(bucket_name: str, segments, byte_range=None):
+    """
+    Lee como un único archivo la concatenación de varios objetos, pidiendo a
+    MinIO solo las partes de cada uno que caen dentro de byte_range.
+
+    Args:
+        segments: lista de Segment en orden.
+        byte_range: (inicio, fin) inclusivos sobre el archivo completo.
+
+    Returns:
+        iterador de bloques de bytes. El primer objeto se abre antes de
+        devolverlo, de modo que un error de MinIO se produce aquí.
+    """
+    pieces = []
+    offset = 0
+    for segment in segments:
+        if byte_range is None:
+            pieces.append((segment.key, None))
+            continue
+        first = max(byte_range[0], offset)
+        last = min(byte_range[1], offset + segment.size - 1)
+        if first <= last:
+            whole = first == offset and last == offset + segment.size - 1
+            pieces.append((segment.key, None if whole else (first - offset, last - offset)))
+        offset += segment.size
+    if not pieces:
+        return iter(())
+
+    _, first_chunks = open_object_stream(bucket_name, *pieces[0])
+
+    def chunks():
+        yield from first_chunks
+        for object_name, piece_range in pieces[1:]:
+            _, more = open_object_stream(bucket_name, object_name, piece_range)
+            yield from more
+
+    return chunks()
+
+def download_segments_to_file(bucket_name: str, segments, file_path: str):
+    """
+    Descarga a un archivo local la concatenación de varios objetos.
+
+    Returns:
+        str: SHA-256 de lo descargado, para comprobarlo contra la revisión.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "wb") as f:
+        for chunk in open_segments_stream(bucket_name, segments):
+            digest.update(chunk)
+            f.write(chunk)
+    print(f"Archivo de {len(segments)} partes de '{bucket_name}' descargado a '{file_path}'.")
+    return digest.hexdigest()
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, String, DateTime, Integer, ForeignKey
+from sqlalchemy import Column, String, DateTime, Integer, BigInteger, Boolean, Float, ForeignKey, Index, LargeBinary, UniqueConstraint
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, text
 import uuid
 from sqlalchemy.dialects.postgresql import UUID
 
@@ -15,7 +15,7 @@ class Document(Base):
 
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     original_filename = Column(String, index=True)
-    storage_path = Column(String, nullable=False) # Ruta en MinIO
+    storage_path = Column(String, nullable=False) # Ruta en MinIO del objeto de la revisión actual (sha256/<hex>)
     
     # Estados: PENDING_SIGNATURE_LEVEL_1, PENDING_SIGNATURE_LEVEL_2, COMPLETED, REJECTED
     status = Column(String, default="PENDING_SIGNATURE_LEVEL_1", nullable=False)
@@ -25,8 +25,40 @@ class Document(Base):
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    # Firmas hechas por la plataforma: de aquí sale el nombre del siguiente
+    # campo de firma (QRSignature, QRSignature_1, ...) sin recorrer el PDF.
+    signature_count = Column(Integer, default=0, server_default=text("0"), nullable=False)
+
+    # Control de concurrencia optimista: aumenta con cada firma registrada, y
+    # una firma solo se registra si el documento sigue en la versión que se
+    # leyó al comprobar el turno (ver signing.record_signature).
+    version = Column(Integer, default=0, server_default=text("0"), nullable=False)
+
+    # Datos del PDF leídos al subirlo (ver app.logic.pdf_inspection), con los
+    # que se validan las peticiones de firma sin descargarlo. Nulos en los
+    # documentos anteriores, que no se validan.
+    page_count = Column(Integer, nullable=True)
+    # Admite una firma incremental (PDF legible, sin cifrar y sin una firma
+    # de certificación que prohíba cambios); si no, pdf_problem dice por qué
+    incremental_safe = Column(Boolean, nullable=True)
+    pdf_problem = Column(String, nullable=True)
+    # Nombres de los campos de firma del PDF (lista JSON), incluidos los que
+    # añade cada firma de la plataforma
+    signature_fields = Column(String, nullable=True)
+
     # Relación: Un documento puede tener muchas firmas
     signatures = relationship("Signature", back_populates="document")
+    # Versiones del PDF, de la subida (1) a la última firma; storage_path
+    # apunta al contenido de la última
+    revisions = relationship("DocumentRevision", back_populates="document", order_by="DocumentRevision.number")
+
+    # Índices de la bandeja de entrada: la paginación por cursor recorre
+    # (created_at, id) en orden descendente, con o sin filtro de estado/nivel.
+    __table_args__ = (
+        Index("ix_documents_created_at_id", "created_at", "id"),
+        Index("ix_documents_status_created_at_id", "status", "created_at", "id"),
+        Index("ix_documents_level_created_at_id", "current_signer_level", "created_at", "id"),
+    )
 
 
 class Signature(Base):
@@ -38,10 +70,175 @@ class Signature(Base):
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
     
     # Vinculamos esta firma a un documento
-    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"))
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), index=True)
     document = relationship("Document", back_populates="signatures")
 
     signed_by = Column(String, nullable=False)
     signer_level = Column(Integer, nullable=False) # Nivel 1, 2, 3...
+    field_name = Column(String, nullable=True) # Campo de firma del PDF (nulo en firmas antiguas)
     
-    signed_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
+    signed_at = Column(DateTime(timezone=True), server_default=func.now())
+
+
+class SigningJob(Base):
+    """
+    Modelo de la tabla de trabajos de firma asíncrona. La fila guarda los
+    parámetros de la firma y su estado; el certificado desbloqueado nunca se
+    persiste, solo vive en memoria del proceso que aceptó el trabajo.
+    """
+    __tablename__ = "signing_jobs"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False, index=True)
+
+    # Estados: EN_COLA, EN_PROCESO, COMPLETADO, FALLIDO
+    status = Column(String, default="EN_COLA", nullable=False, index=True)
+    # Proceso (host:pid) que tiene el certificado en memoria y ejecuta el trabajo
+    owner = Column(String, nullable=False)
+
+    signer_level = Column(Integer, nullable=False)
+    reason = Column(String, nullable=False)
+    location = Column(String, nullable=False)
+    page_index = Column(Integer, nullable=False)
+    x_coord = Column(Float, nullable=False)
+    y_coord = Column(Float, nullable=False)
+    width = Column(Float, nullable=False)
+    # Apariencia de la estampa ("raster" o "vector"); NULL = STAMP_APPEARANCE
+    appearance = Column(String, nullable=True)
+
+    detail = Column(String, nullable=True)  # Mensaje de error si falló
+    # Firma registrada; el PDF firmado es la revisión que la produjo
+    signature_id = Column(UUID(as_uuid=True), ForeignKey("signatures.id"), nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class DocumentPage(Base):
+    """
+    Caja de cada página del PDF de un documento, leída al subirlo: la firma
+    debe quedar dentro de la /MediaBox de su página.
+    """
+    __tablename__ = "document_pages"
+
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), primary_key=True)
+    page_index = Column(Integer, primary_key=True)  # 0 = primera página, como page_index al firmar
+    # /MediaBox en puntos PDF (heredada del árbol de páginas si la página no la define)
+    box_left = Column(Float, nullable=False)
+    box_bottom = Column(Float, nullable=False)
+    box_right = Column(Float, nullable=False)
+    box_top = Column(Float, nullable=False)
+    rotation = Column(Integer, default=0, nullable=False)  # /Rotate en grados
+
+
+class StoredObject(Base):
+    """
+    Contenido guardado en MinIO bajo su SHA-256 (clave sha256/<hex>). Un
+    mismo PDF subido varias veces se guarda una sola vez; ref_count cuenta
+    las revisiones de documentos que lo usan. Los que siguen sin revisiones
+    un tiempo después de escribirse se borran (ver storage.sweep_unreferenced).
+    """
+    __tablename__ = "stored_objects"
+
+    sha256 = Column(String(64), primary_key=True)
+    size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=0, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Última escritura del contenido (nulo en los anteriores, que no se recogen)
+    claimed_at = Column(DateTime(timezone=True), nullable=True)
+
+
+class DocumentRevision(Base):
+    """
+    Modelo de la tabla de revisiones de un documento: la versión subida y la
+    resultante de cada firma, en orden. Las revisiones no se sobrescriben.
+
+    Como pyhanko firma de forma incremental, una revisión firmada suele
+    guardarse solo como los bytes que añadió a la anterior (base_size no
+    nulo); el PDF completo se reconstruye concatenando la última revisión
+    completa y los incrementos posteriores (ver app.storage.get_version).
+    """
+    __tablename__ = "document_revisions"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    document_id = Column(UUID(as_uuid=True), ForeignKey("documents.id"), nullable=False)
+    document = relationship("Document", back_populates="revisions")
+
+    number = Column(Integer, nullable=False) # 1 = subida, 2.. = firmas
+    # Objeto guardado para esta revisión: el PDF completo o solo el incremento
+    object_sha256 = Column("sha256", String(64), ForeignKey("stored_objects.sha256"), nullable=False, index=True)
+    stored_object = relationship("StoredObject")
+    # Tamaño de la revisión anterior si el objeto es un incremento sobre ella
+    base_size = Column(BigInteger, nullable=True)
+    # Hash y tamaño del PDF completo de esta revisión (nulos en las filas
+    # anteriores a los incrementos, que siempre guardaban el PDF completo)
+    content_sha256 = Column(String(64), nullable=True)
+    content_size = Column(BigInteger, nullable=True)
+
+    # Firma que produjo esta revisión (nula en la subida)
+    signature_id = Column(UUID(as_uuid=True), ForeignKey("signatures.id"), nullable=True)
+    signature = relationship("Signature")
+
+    # Firmas del PDF que terminan en esta revisión y ya se verificaron (ver
+    # SignatureVerification); nulo mientras no se haya verificado
+    verified_signatures = Column(Integer, nullable=True)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("document_id", "number", name="uq_document_revisions_document_number"),
+    )
+
+    @property
+    def sha256(self):
+        """Hash del PDF completo de esta revisión."""
+        return self.content_sha256 or self.object_sha256
+
+    @property
+    def size(self):
+        return self.content_size if self.content_size is not None else self.stored_object.size
+
+    @property
+    def stored_size(self):
+        """Bytes guardados en MinIO para esta revisión."""
+        return self.size - (self.base_size or 0)
+
+
+class SignatureVerification(Base):
+    """
+    Resultado de verificar una firma incrustada en el PDF (ver
+    app.verification). Lo que firma una firma no cambia al añadir otras, así
+    que se verifica una sola vez y se guarda por el hash de la revisión que
+    la contiene y su campo de firma.
+    """
+    __tablename__ = "signature_verifications"
+
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    # Hash del PDF completo de la revisión guardada que contiene la firma
+    revision_sha256 = Column(String(64), nullable=False)
+    field_name = Column(String, nullable=False)
+    # Firma de la plataforma que la produjo (nula si el PDF ya venía firmado)
+    signature_id = Column(UUID(as_uuid=True), ForeignKey("signatures.id"), nullable=True, index=True)
+    signature = relationship("Signature")
+
+    # Fin del /ByteRange: la firma cubre el archivo completo si coincide con su tamaño
+    byte_range_end = Column(BigInteger, nullable=False)
+    intact = Column(Boolean, nullable=False)  # El hash del contenido firmado coincide
+    valid = Column(Boolean, nullable=False)   # La firma criptográfica es correcta
+    covers_revision = Column(Boolean, nullable=False)  # Cubre toda su revisión
+    signer_name = Column(String, nullable=True)
+    signer_cert = Column(LargeBinary, nullable=True)  # DER, para validar la cadena al consultar
+    signing_time = Column(DateTime(timezone=True), nullable=True)
+    md_algorithm = Column(String, nullable=True)
+    # Nivel de las modificaciones (pyhanko.sign.diff_analysis.ModificationLevel)
+    # desde la firma hasta el final de su revisión, y de esa revisión vista
+    # desde la firma anterior
+    modification_level = Column(String, nullable=True)
+    previous_update_level = Column(String, nullable=True)
+    detail = Column(String, nullable=True)  # Motivo si no se pudo verificar
+    verified_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("revision_sha256", "field_name", name="uq_signature_verifications_revision_field"),
+    )
@@ -0,0 +1,121 @@
+"""
+Datos del PDF de cada documento guardados en la base de datos al subirlo
+(app.logic.pdf_inspection), y validación de las peticiones de firma con ellos
+antes de cargar el certificado o descargar nada: la página existe, la
+estampa empieza dentro de su /MediaBox y el PDF admite una firma
+incremental.
+
+Los documentos anteriores (page_count e incremental_safe nulos) no se
+validan: los errores aparecen al firmar, como antes.
+"""
+
+import json
+
+from sqlalchemy import insert, tuple_
+
+from . import models
+from .logic.pdf_inspection import PdfMetadata
+
+
+class UnsignableDocument(Exception):
+    """El PDF del documento no admite una firma incremental (responder 422)."""
+
+
+class InvalidSignaturePosition(Exception):
+    """La página o la posición de la firma no están en el documento (responder 400)."""
+
+
+def record_pdf_metadata(db, document, metadata: PdfMetadata):
+    """Guardar los datos del PDF de un documento nuevo. No confirma la transacción."""
+    document.page_count = metadata.page_count
+    document.incremental_safe = metadata.incremental_safe
+    document.pdf_problem = metadata.problem
+    document.signature_fields = json.dumps(metadata.signature_fields)
+    if metadata.pages:
+        # Las páginas se insertan de una vez, después de la fila del documento
+        db.flush()
+        db.execute(insert(models.DocumentPage), [
+            dict(
+                document_id=document.id, page_index=index,
+                box_left=page.media_box[0], box_bottom=page.media_box[1],
+                box_right=page.media_box[2], box_top=page.media_box[3],
+                rotation=page.rotation,
+            )
+            for index, page in enumerate(metadata.pages)
+        ])
+
+
+def page_number(document, page_index):
+    """
+    Índice (desde 0) de la página page_index del documento, que como en
+    pyhanko puede ser negativo (-1 = última). None si no se conoce.
+    """
+    if document.page_count is None:
+        return None
+    return page_index + document.page_count if page_index < 0 else page_index
+
+
+def load_pages(db, targets):
+    """
+    Páginas de varios pares (documento, page_index) en una consulta.
+
+    Returns:
+        dict: (document_id, índice) -> DocumentPage.
+    """
+    keys = {
+        (document.id, page_number(document, page_index))
+        for document, page_index in targets
+        if page_number(document, page_index) is not None
+    }
+    if not keys:
+        return {}
+    rows = (
+        db.query(models.DocumentPage)
+        .filter(tuple_(models.DocumentPage.document_id, models.DocumentPage.page_index).in_(keys))
+        .all()
+    )
+    return {(row.document_id, row.page_index): row for row in rows}
+
+
+def check_sign_request(document, page_index, x_coord, y_coord, width, pages):
+    """
+    Validar una petición de firma con los datos guardados del documento y
+    las páginas de load_pages.
+
+    Raises:
+        UnsignableDocument: si el PDF no se puede leer o no admite más firmas.
+        InvalidSignaturePosition: si la página no existe o la estampa empieza
+            fuera de ella.
+    """
+    if document.incremental_safe is False:
+        raise UnsignableDocument(f"El documento no se puede firmar: {document.pdf_problem}")
+    index = page_number(document, page_index)
+    if index is None:
+        return
+    if width <= 0:
+        raise InvalidSignaturePosition("El ancho de la firma debe ser positivo.")
+    if not 0 <= index < document.page_count:
+        raise InvalidSignaturePosition(
+            f"La página {page_index} no existe: el documento tiene {document.page_count} páginas."
+        )
+    page = pages.get((document.id, index))
+    if page is not None and not (page.box_left <= x_coord <= page.box_right and page.box_bottom <= y_coord <= page.box_top):
+        raise InvalidSignaturePosition(
+            f"La posición ({x_coord}, {y_coord}) está fuera de la página {page_index} "
+            f"({page.box_left}, {page.box_bottom}, {page.box_right}, {page.box_top})."
+        )
+
+
+def validate_sign_request(db, document, page_index, x_coord, y_coord, width):
+    """check_sign_request de una sola petición, con la consulta de su página."""
+    check_sign_request(document, page_index, x_coord, y_coord, width, load_pages(db, [(document, page_index)]))
+
+
+def add_signature_field(document, field_name):
+    """Lista JSON de campos de firma con el nuevo (None si no se conocen)."""
+    if document.signature_fields is None:
+        return None
+    fields = json.loads(document.signature_fields)
+    if field_name not in fields:
+        fields.append(field_name)
+    return json.dumps(fields)
@@ -0,0 +1,131 @@
+import asyncio
+import hashlib
+import json
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException
+
+from .. import schemas
+from ..executors import run_cpu
+from ..logic.certificate_cache import CertificateSummaryCache, read_certificate_file
+from ..logic.chain_validation import ChainValidator
+from ..config import (
+    CERT_INSPECT_CACHE_MAX_ENTRIES, CERT_INSPECT_MAX_FILES, CERT_INSPECT_MAX_BYTES,
+    TRUST_STORE_DIR, CRL_DIR, TRUST_STORE_RELOAD_SECONDS, CERT_CHAIN_REQUIRE_CRL, CERT_CHAIN_VALIDATION
+)
+
+router = APIRouter(
+    prefix="/api/certificates",
+    tags=["certificates"],
+)
+
+# CAs de confianza y CRLs locales, indexadas una vez y recargadas al cambiar los archivos
+chain_validator = ChainValidator.from_directories(
+    TRUST_STORE_DIR, CRL_DIR,
+    reload_interval=TRUST_STORE_RELOAD_SECONDS,
+    require_crl=CERT_CHAIN_REQUIRE_CRL
+)
+
+# Resúmenes de certificados compartidos por todo el proceso
+certificate_summaries = CertificateSummaryCache(max_entries=CERT_INSPECT_CACHE_MAX_ENTRIES, chain_validator=chain_validator)
+
+
+def check_signer_chain(signer):
+    """
+    Con CERT_CHAIN_VALIDATION=enforce, rechazar (403) un SimpleSigner cuyo
+    certificado no tiene una cadena válida hasta una CA de confianza.
+    """
+    if CERT_CHAIN_VALIDATION != "enforce":
+        return
+    result = chain_validator.validate_der(
+        signer.signing_cert.dump(), [cert.dump() for cert in signer.cert_registry]
+    )
+    if not result.valid:
+        raise HTTPException(status_code=403, detail=f"El certificado no es de confianza: {result.detail}")
+
+
+async def inspect_certificate(data, password):
+    """
+    Resumen del certificado de un archivo, desde la caché si ya se abrió con
+    esa contraseña. El archivo se procesa en memoria, sin escribirlo en disco.
+
+    Raises:
+        ValueError: si el archivo está corrupto o la contraseña es incorrecta.
+    """
+    summary = certificate_summaries.lookup(data, password)
+    if summary is None:
+        certificate_file = await run_cpu(read_certificate_file, data, password)
+        summary = certificate_summaries.add(data, password, certificate_file)
+    return summary
+
+
+async def read_limited(upload: UploadFile):
+    data = await upload.read(CERT_INSPECT_MAX_BYTES + 1)
+    if len(data) > CERT_INSPECT_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=f"El archivo '{upload.filename}' supera el máximo de {CERT_INSPECT_MAX_BYTES} bytes.")
+    return data
+
+
+# --- INSPECCIONAR UN CERTIFICADO ---
+@router.post("/inspect", response_model=schemas.CertificateSummary)
+async def inspect_certificate_file(
+    cert_file: UploadFile = File(..., description="Certificado (.p12, .pem o .cer)."),
+    password: Optional[str] = Form(None, description="Contraseña del .p12.")
+):
+    """Datos del titular, emisor y vigencia de un certificado, sin guardarlo."""
+    data = await read_limited(cert_file)
+    try:
+        return await inspect_certificate(data, password)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Contraseña incorrecta o archivo corrupto.")
+
+
+# --- INSPECCIONAR VARIOS CERTIFICADOS A LA VEZ ---
+@router.post("/inspect/bulk", response_model=schemas.CertificateBulkInspection)
+async def inspect_certificate_files(
+    cert_files: List[UploadFile] = File(..., description="Certificados (.p12, .pem o .cer)."),
+    password: Optional[str] = Form(None, description="Contraseña común a todos los .p12."),
+    passwords: Optional[str] = Form(None, description="Lista JSON con la contraseña de cada archivo, en el mismo orden (tiene prioridad sobre password).")
+):
+    """
+    Inspecciona una lista de certificados. Los archivos idénticos con la
+    misma contraseña se abren una sola vez y los distintos se abren en
+    paralelo en el pool de procesos. Un archivo inválido no interrumpe el
+    resto: el resultado se informa por archivo.
+    """
+    if not cert_files:
+        raise HTTPException(status_code=400, detail="La lista de certificados está vacía.")
+    if len(cert_files) > CERT_INSPECT_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Se admiten como máximo {CERT_INSPECT_MAX_FILES} certificados por petición.")
+    if passwords is not None:
+        try:
+            password_list = json.loads(passwords)
+        except ValueError as e:
+            raise HTTPException(status_code=422, detail=f"Lista de contraseñas inválida: {e}")
+        if not isinstance(password_list, list) or len(password_list) != len(cert_files):
+            raise HTTPException(status_code=422, detail="La lista de contraseñas debe tener una por archivo.")
+    else:
+        password_list = [password] * len(cert_files)
+
+    items = [(await read_limited(upload), item_password) for upload, item_password in zip(cert_files, password_list)]
+
+    # Una sola inspección por archivo y contraseña distintos
+    unique = {}
+    for data, item_password in items:
+        unique.setdefault((hashlib.sha256(data).digest(), item_password), (data, item_password))
+    keys = list(unique)
+    outcomes = await asyncio.gather(*[inspect_certificate(*unique[key]) for key in keys], return_exceptions=True)
+    by_key = dict(zip(keys, outcomes))
+
+    results = []
+    for upload, (data, item_password) in zip(cert_files, items):
+        outcome = by_key[(hashlib.sha256(data).digest(), item_password)]
+        if isinstance(outcome, ValueError):
+            results.append(schemas.CertificateInspection(filename=upload.filename, success=False, status_code=400, detail="Contraseña incorrecta o archivo corrupto."))
+        elif isinstance(outcome, Exception):
+            results.append(schemas.CertificateInspection(filename=upload.filename, success=False, status_code=500, detail=f"Error inesperado en el servidor: {outcome}"))
+        else:
+            results.append(schemas.CertificateInspection(filename=upload.filename, success=True, status_code=200, detail="Certificado leído correctamente.", certificate=outcome))
+
+    inspected = sum(1 for result in results if result.success)
+    return schemas.CertificateBulkInspection(inspected=inspected, failed=len(results) - inspected, results=results)
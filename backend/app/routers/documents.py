@@ -1,19 +1,38 @@
+import asyncio
+import base64
+import json
 import os
-import tempfile
-import shutil
 import uuid
-from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException
-from fastapi.responses import FileResponse
+from fastapi import APIRouter, Depends, UploadFile, File, Form, HTTPException, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
 from starlette.background import BackgroundTask
-from sqlalchemy.orm import Session
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, selectinload
 from uuid import UUID
-from typing import List
+from datetime import datetime
+from typing import List, Optional
+from urllib.parse import quote
 
 # Importamos desde las carpetas correctas usando la estructura de paquetes
 from .. import database, models, schemas, minio_client
-from ..logic.pdf_signer import PDFSigner
+from ..http_utils import RangeNotSatisfiable, as_utc, format_http_date, if_range_allows, is_not_modified, parse_byte_range
+from ..logic.pdf_signer import PDFSigner, STAMP_APPEARANCES
+from ..signing import DocumentConflict, SigningError, sign_stored_document, planned_field_name, record_signature, notify_signed, create_temp_dir, cleanup_temp_dir
+from ..executors import run_cpu, run_io
+from ..cache import CachedPage, inbox_cache
+from ..storage import add_revision, claim_content, current_version, full_revision, get_version, list_revisions
+from ..jobs import QueueFull, signing_jobs
+from .. import events, metrics
+from .signer_sessions import get_signer_session
+from .certificates import chain_validator, check_signer_chain
+from ..verification import VerificationError, build_report, load_verification_state, pending_revisions, save_verifications, verify_pending
+from ..thumbnails import ThumbnailError, page_thumbnails
+from ..pdf_metadata import InvalidSignaturePosition, UnsignableDocument, check_sign_request, load_pages, record_pdf_metadata, validate_sign_request
+from ..logic.pdf_inspection import read_pdf_metadata
 # ¡CAMBIO! Importamos la configuración desde su nuevo hogar
-from ..config import DOCUMENTS_BUCKET
+from ..config import DOCUMENTS_BUCKET, BATCH_SIGN_MAX_DOCUMENTS, BATCH_SIGN_MAX_WORKERS, PENDING_PAGE_DEFAULT_SIZE, PENDING_PAGE_MAX_SIZE, EVENTS_HEARTBEAT_SECONDS, SIGN_SYNC_MAX_BYTES, STAMP_APPEARANCE
 
 # Creamos un router. Es como una mini-aplicación de FastAPI.
 router = APIRouter(
@@ -23,191 +42,720 @@ router = APIRouter(
 
 # DOCUMENTS_BUCKET = "documents"
 
-def cleanup_temp_dir(temp_dir: str):
+def check_appearance(appearance: Optional[str]) -> str:
+    """Apariencia de estampa pedida, o la configurada si no se indica ninguna."""
+    if appearance is None:
+        return STAMP_APPEARANCE
+    if appearance not in STAMP_APPEARANCES:
+        raise HTTPException(status_code=400, detail=f"La apariencia debe ser una de: {', '.join(STAMP_APPEARANCES)}.")
+    return appearance
+
+def content_disposition(filename: str, disposition: str = "attachment"):
+    """Cabecera Content-Disposition equivalente a la que genera FileResponse."""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+async def load_request_signer(session_token: Optional[str], cert_file: Optional[UploadFile], password: Optional[str], trace):
+    """
+    Obtener el firmante de una petición: desde una sesión de firmante abierta
+    o cargando en memoria el .p12 recibido (en el pool de CPU).
+    """
+    # Con una sesión de firmante no hace falta volver a subir el certificado
+    if session_token:
+        signer = PDFSigner.from_session(get_signer_session(session_token))
+    elif cert_file is None or not password:
+        raise HTTPException(status_code=400, detail="Debe enviar el certificado y su contraseña, o un token de sesión de firmante.")
+    else:
+        try:
+            with trace.span("pkcs12_load"):
+                signer = await run_cpu(PDFSigner.from_pkcs12_data, await cert_file.read(), password)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Contraseña incorrecta o archivo corrupto.")
+    # La revocación se vuelve a comprobar en cada firma (las CRLs ya están
+    # indexadas), en el pool de hilos: puede recargar los directorios de CAs
+    await run_io(check_signer_chain, signer.signer)
+    return signer
+
+# --- Acceso a la base de datos ---
+# Las rutas usan una AsyncSession; las funciones síncronas compartidas con los
+# trabajos de firma (storage, signing) se ejecutan con db.run_sync, que les
+# pasa la Session síncrona subyacente sin ocupar un hilo del pool de E/S.
+async def _get_document(db: AsyncSession, document_id: UUID):
+    return await db.get(models.Document, document_id)
+
+def _commit_and_refresh(db: Session, document: models.Document):
+    """Confirmar la transacción y recargar el documento (con sus firmas)."""
+    db.commit()
+    db.refresh(document)
+    document.signatures  # Carga la relación aquí y no al serializar la respuesta
+    return document
+
+def encode_cursor(document):
+    """Cursor opaco con la posición (created_at, id) del último documento de una página."""
+    raw = json.dumps({"created_at": document.created_at.isoformat(), "id": str(document.id)})
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii")
+
+def decode_cursor(cursor: str):
+    """Inverso de encode_cursor. Lanza ValueError si el cursor no es válido."""
     try:
-        shutil.rmtree(temp_dir)
-    except Exception as e:
-        print(f"Error limpiando el directorio temporal {temp_dir}: {e}")
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        return datetime.fromisoformat(data["created_at"]), UUID(data["id"])
+    except (TypeError, KeyError, UnicodeError, ValueError) as e:
+        raise ValueError("Cursor inválido.") from e
 
 # --- ENDPOINT 1: SUBIR Y REGISTRAR UN NUEVO DOCUMENTO ---
 @router.post("/", response_model=schemas.DocumentBase)
 async def upload_document(
-    db: Session = Depends(database.get_db),
+    db: AsyncSession = Depends(database.get_async_db),
     pdf_file: UploadFile = File(..., description="PDF inicial a firmar.")
 ):
-    temp_dir = tempfile.mkdtemp()
-    try:
-        input_pdf_path = os.path.join(temp_dir, pdf_file.filename)
-        with open(input_pdf_path, "wb") as buffer:
-            shutil.copyfileobj(pdf_file.file, buffer)
+    trace = metrics.start_trace("upload")
 
-        doc_id = uuid.uuid4()
-        storage_path = str(doc_id)
+    # El cuerpo recibido se guarda en MinIO bajo su SHA-256, por partes y sin
+    # copiarlo a otro directorio temporal; si ese contenido ya existe (el
+    # mismo PDF subido por otra persona) no se vuelve a subir.
+    with trace.span("storage_upload"):
+        stored = await run_io(minio_client.put_content, DOCUMENTS_BUCKET, pdf_file.file, claim=claim_content)
+    trace.size(stored.size)
 
-        minio_client.upload_file(
-            bucket_name=DOCUMENTS_BUCKET,
-            file_path=input_pdf_path,
-            object_name=storage_path
-        )
-        
-        new_document = models.Document(
-            id=doc_id,
-            original_filename=pdf_file.filename,
-            storage_path=storage_path,
-            status="PENDIENTE_FIRMA_NIVEL_1",
-            current_signer_level=1
-        )
-        db.add(new_document)
-        db.commit()
-        db.refresh(new_document)
-        
-        print(f"Documento '{pdf_file.filename}' registrado con ID: {new_document.id}.")
-        return new_document
-    finally:
-        cleanup_temp_dir(temp_dir)
+    # El PDF se analiza una sola vez, desde el mismo archivo temporal: páginas,
+    # campos de firma y si admite una firma incremental (ver app.pdf_metadata)
+    pdf_file.file.seek(0)
+    with trace.span("pdf_metadata"):
+        metadata = await run_io(read_pdf_metadata, pdf_file.file)
+    
+    # La revisión 1 viene de fuera: en su primera firma se leen los campos
+    # que ya tenga el PDF
+    new_document = models.Document(
+        id=uuid.uuid4(),
+        original_filename=pdf_file.filename,
+        storage_path=stored.key,
+        status="PENDIENTE_FIRMA_NIVEL_1",
+        current_signer_level=1
+    )
+    db.add(new_document)
+    await db.run_sync(add_revision, new_document, full_revision(stored))
+    await db.run_sync(record_pdf_metadata, new_document, metadata)
+    with trace.span("db_commit"):
+        await db.run_sync(_commit_and_refresh, new_document)
+    state = (new_document.status, new_document.current_signer_level)
+    inbox_cache.invalidate_document(new_document.created_at, new_document.id, after=state)
+    await events.publish_document_event("document.uploaded", new_document.id, new_document.created_at, state)
+    page_thumbnails.schedule_upload(new_document.id)
+    trace.finish(document_id=new_document.id, deduplicated=not stored.uploaded)
+    
+    print(f"Documento '{pdf_file.filename}' registrado con ID: {new_document.id}.")
+    return new_document
 
 # --- ENDPOINT 2: FIRMAR UN DOCUMENTO EXISTENTE ---
 @router.post("/{document_id}/sign")
 async def sign_existing_document(
     document_id: UUID,
-    db: Session = Depends(database.get_db),
-    cert_file: UploadFile = File(..., description="Certificado digital (.p12)."),
-    password: str = Form(..., description="Contraseña del certificado."),
+    db: AsyncSession = Depends(database.get_async_db),
+    cert_file: Optional[UploadFile] = File(None, description="Certificado digital (.p12)."),
+    password: Optional[str] = Form(None, description="Contraseña del certificado."),
+    session_token: Optional[str] = Form(None, description="Token de una sesión de firmante abierta en /api/signer-sessions."),
     signer_level: int = Form(..., description="Nivel jerárquico del firmante."),
     reason: str = Form("Documento revisado y aprobado", description="Razón de la firma."),
     location: str = Form("Ecuador", description="Ubicación de la firma."),
     page_index: int = Form(...),
     x_coord: float = Form(...),
     y_coord: float = Form(...),
-    width: float = Form(...)  # <--- ¡AQUÍ ESTÁ LA CORRECCIÓN!
+    width: float = Form(...),  # <--- ¡AQUÍ ESTÁ LA CORRECCIÓN!
+    mode: str = Form("sync", description="'sync' devuelve el PDF firmado; 'async' encola un trabajo y responde 202; 'auto' elige según el tamaño del documento."),
+    appearance: Optional[str] = Form(None, description="Estampa 'raster' (imagen) o 'vector' (trazado y texto PDF). Por defecto, STAMP_APPEARANCE.")
 ): # <--- Se añade el paréntesis de cierre aquí
     
-    doc_record = db.query(models.Document).filter(models.Document.id == document_id).first()
+    if mode not in ("sync", "async", "auto"):
+        raise HTTPException(status_code=400, detail="El modo debe ser 'sync', 'async' o 'auto'.")
+    appearance = check_appearance(appearance)
+
+    trace = metrics.start_trace("sign")
+    with trace.span("db_lookup"):
+        doc_record = await _get_document(db, document_id)
     if not doc_record:
         raise HTTPException(status_code=404, detail="Documento no encontrado.")
         
     if doc_record.current_signer_level != signer_level:
         raise HTTPException(status_code=403, detail=f"No es el turno de este firmante. Se espera el nivel {doc_record.current_signer_level}.")
 
-    temp_dir = tempfile.mkdtemp()
+    # Con los datos del PDF guardados al subirlo, antes de cargar el certificado
     try:
-        input_pdf_path = os.path.join(temp_dir, "current_version.pdf")
-        minio_client.download_file(
-            bucket_name=DOCUMENTS_BUCKET,
-            object_name=doc_record.storage_path,
-            file_path=input_pdf_path
-        )
+        with trace.span("db_lookup"):
+            await db.run_sync(validate_sign_request, doc_record, page_index, x_coord, y_coord, width)
+    except UnsignableDocument as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except InvalidSignaturePosition as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-        cert_path = os.path.join(temp_dir, cert_file.filename)
-        output_pdf_path = os.path.join(temp_dir, "signed_version.pdf")
+    signer = await load_request_signer(session_token, cert_file, password, trace)
 
-        with open(cert_path, "wb") as buffer:
-            shutil.copyfileobj(cert_file.file, buffer)
-            
-        signer = PDFSigner(cert_path=cert_path, password=password)
-        
+    version = None
+    if mode == "auto":
+        # Los documentos grandes se firman en segundo plano para no agotar
+        # el tiempo de espera de los proxies
+        version = await db.run_sync(current_version, doc_record)
+        size = version.size
+        if size is None:
+            object_info = await run_io(minio_client.get_object_info, DOCUMENTS_BUCKET, doc_record.storage_path)
+            size = object_info["ContentLength"]
+        mode = "async" if size > SIGN_SYNC_MAX_BYTES else "sync"
+
+    if mode == "async":
+        try:
+            job = await signing_jobs.enqueue(
+                db, doc_record.id, signer,
+                signer_level=signer_level, reason=reason, location=location,
+                page_index=page_index, x_coord=x_coord, y_coord=y_coord, width=width,
+                appearance=appearance
+            )
+        except QueueFull:
+            raise HTTPException(status_code=503, detail="Hay demasiados trabajos de firma en cola. Intente más tarde.")
+        trace.operation = "sign_enqueue"
+        trace.finish(document_id=document_id, job_id=job.id)
+        job_info = schemas.SigningJobInfo(
+            id=job.id, document_id=job.document_id, status=job.status, created_at=job.created_at
+        )
+        return JSONResponse(
+            status_code=202,
+            content=jsonable_encoder(job_info),
+            headers={"Location": f"/api/jobs/{job.id}"}
+        )
+
+    temp_dir = create_temp_dir()
+    try:
         # --- ¡AQUÍ ESTÁ LA CORRECCIÓN! ---
         # Eliminamos el cálculo dinámico y usamos directamente los parámetros
         # que nos llegan desde el frontend.
-        success, message = await signer.async_sign_file(
-            input_pdf=input_pdf_path,
-            output_pdf=output_pdf_path,
-            reason=reason, 
-            location=location,
-            page_index=page_index, 
-            x_coord=x_coord,
-            y_coord=y_coord, 
-            width=width
-        )
-        
-        if not success:
-            raise HTTPException(status_code=400, detail=f"Error técnico al firmar: {message}")
-
-        minio_client.upload_file(
-            bucket_name=DOCUMENTS_BUCKET,
-            file_path=output_pdf_path,
-            object_name=doc_record.storage_path
-        )
+        if version is None:
+            version = await db.run_sync(current_version, doc_record)
+        try:
+            signed = await sign_stored_document(
+                signer, version, temp_dir,
+                reason, location, page_index, x_coord, y_coord, width, trace,
+                field_name=planned_field_name(doc_record), appearance=appearance
+            )
+        except SigningError as e:
+            raise HTTPException(status_code=400, detail=f"Error técnico al firmar: {e}")
             
-        new_signature = models.Signature(document_id=doc_record.id, signed_by=signer.cert_subject, signer_level=signer_level)
-        db.add(new_signature)
-        
-        doc_record.current_signer_level += 1
-        doc_record.status = f"PENDIENTE_FIRMA_NIVEL_{doc_record.current_signer_level}"
-        # TODO: Lógica para cambiar a "COMPLETADO" si era el último firmante
-        
-        db.commit()
+        try:
+            change = await db.run_sync(record_signature, doc_record, signer.cert_subject, signer_level, signed)
+        except DocumentConflict as e:
+            # Otra petición firmó este nivel mientras tanto
+            raise HTTPException(status_code=409, detail=str(e))
+        with trace.span("db_commit"):
+            await db.commit()
+        await notify_signed(change)
+        page_thumbnails.schedule_signature(change)
+        trace.finish(document_id=document_id)
         
         cleanup_task = BackgroundTask(cleanup_temp_dir, temp_dir)
         return FileResponse(
-            path=output_pdf_path,
+            path=signed.path,
             filename=f"firmado_nivel_{signer_level}_{doc_record.original_filename}",
             media_type='application/pdf',
             background=cleanup_task
         )
     except Exception as e:
-        cleanup_temp_dir(temp_dir)
-        db.rollback()
+        await run_io(cleanup_temp_dir, temp_dir)
+        await db.rollback()
         if isinstance(e, HTTPException):
             raise e
         raise HTTPException(status_code=500, detail=f"Error inesperado en el servidor: {str(e)}")
 
+# --- ENDPOINT: FIRMAR VARIOS DOCUMENTOS CON UNA SOLA CARGA DEL CERTIFICADO ---
+@router.post("/batch-sign", response_model=schemas.BatchSignResponse)
+async def batch_sign_documents(
+    db: AsyncSession = Depends(database.get_async_db),
+    items: str = Form(..., description="Lista JSON de documentos: [{document_id, signer_level, page_index, x_coord, y_coord, width}]."),
+    cert_file: Optional[UploadFile] = File(None, description="Certificado digital (.p12)."),
+    password: Optional[str] = Form(None, description="Contraseña del certificado."),
+    session_token: Optional[str] = Form(None, description="Token de una sesión de firmante abierta en /api/signer-sessions."),
+    reason: str = Form("Documento revisado y aprobado", description="Razón de la firma."),
+    location: str = Form("Ecuador", description="Ubicación de la firma."),
+    appearance: Optional[str] = Form(None, description="Estampa 'raster' o 'vector' de todo el lote. Por defecto, STAMP_APPEARANCE.")
+):
+    """
+    Firma una lista de documentos, cada uno con su propia posición de firma.
+    El certificado se carga una sola vez y la descarga, firma y subida de cada
+    documento se ejecutan en paralelo en un pool acotado. Un documento que
+    falla no interrumpe el resto: el resultado se informa por documento.
+    """
+    try:
+        batch = [schemas.BatchSignItem(**item) for item in json.loads(items)]
+    except (ValueError, TypeError) as e:
+        raise HTTPException(status_code=422, detail=f"Lista de documentos inválida: {e}")
+    if not batch:
+        raise HTTPException(status_code=400, detail="La lista de documentos está vacía.")
+    if len(batch) > BATCH_SIGN_MAX_DOCUMENTS:
+        raise HTTPException(status_code=400, detail=f"Se admiten como máximo {BATCH_SIGN_MAX_DOCUMENTS} documentos por lote.")
+
+    doc_ids = {item.document_id for item in batch}
+    if len(doc_ids) != len(batch):
+        raise HTTPException(status_code=400, detail="Hay documentos repetidos en el lote.")
+    appearance = check_appearance(appearance)
+
+    trace = metrics.start_trace("batch_sign")
+    signer = await load_request_signer(session_token, cert_file, password, trace)
+
+    docs = {
+        doc.id: doc
+        for doc in (await db.scalars(select(models.Document).where(models.Document.id.in_(doc_ids)))).all()
+    }
+
+    pages = await db.run_sync(load_pages, [(docs[item.document_id], item.page_index) for item in batch if item.document_id in docs])
+
+    results = {}
+    pending = []
+    for item in batch:
+        doc_record = docs.get(item.document_id)
+        if not doc_record:
+            results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=404, detail="Documento no encontrado.")
+            continue
+        if doc_record.current_signer_level != item.signer_level:
+            results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=403, detail=f"No es el turno de este firmante. Se espera el nivel {doc_record.current_signer_level}.")
+            continue
+        try:
+            check_sign_request(doc_record, item.page_index, item.x_coord, item.y_coord, item.width, pages)
+        except UnsignableDocument as e:
+            results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=422, detail=str(e))
+            continue
+        except InvalidSignaturePosition as e:
+            results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=400, detail=str(e))
+            continue
+        pending.append(item)
+
+    # Las versiones se leen antes, de una en una: la sesión no admite consultas concurrentes
+    versions = await db.run_sync(lambda session: {item.document_id: current_version(session, docs[item.document_id]) for item in pending})
+
+    # Como máximo BATCH_SIGN_MAX_WORKERS documentos del lote en curso a la vez
+    semaphore = asyncio.Semaphore(BATCH_SIGN_MAX_WORKERS)
+
+    async def sign_item(item):
+        async with semaphore:
+            item_trace = metrics.start_trace("batch_sign_item")
+            doc_record = docs[item.document_id]
+            try:
+                return await sign_stored_document(
+                    signer, versions[item.document_id], os.path.join(temp_dir, str(item.document_id)),
+                    reason, location, item.page_index, item.x_coord, item.y_coord, item.width, item_trace,
+                    field_name=planned_field_name(doc_record), appearance=appearance
+                )
+            finally:
+                item_trace.finish(document_id=item.document_id)
+
+    temp_dir = create_temp_dir()
+    try:
+        outcomes = await asyncio.gather(*[sign_item(item) for item in pending], return_exceptions=True)
+        changes = []
+
+        for item, outcome in zip(pending, outcomes):
+            if isinstance(outcome, SigningError):
+                results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=400, detail=f"Error técnico al firmar: {outcome}")
+                continue
+            if isinstance(outcome, Exception):
+                results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=500, detail=f"Error inesperado en el servidor: {outcome}")
+                continue
+
+            try:
+                change = await db.run_sync(record_signature, docs[item.document_id], signer.cert_subject, item.signer_level, outcome)
+            except DocumentConflict as e:
+                results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=False, status_code=409, detail=str(e))
+                continue
+            changes.append(change)
+            results[item.document_id] = schemas.BatchSignResult(document_id=item.document_id, success=True, status_code=200, detail="Documento firmado.", signature_id=change.signature.id)
+
+        with trace.span("db_commit"):
+            await db.commit()
+        for change in changes:
+            await notify_signed(change)
+            page_thumbnails.schedule_signature(change)
+        trace.finish(documents=len(batch), signed=len(changes))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error inesperado en el servidor: {str(e)}")
+    finally:
+        await run_io(cleanup_temp_dir, temp_dir)
+
+    ordered = [results[item.document_id] for item in batch]
+    signed = sum(1 for r in ordered if r.success)
+    return schemas.BatchSignResponse(signed=signed, failed=len(ordered) - signed, results=ordered)
+
 # --- ENDPOINT NUEVO: DESCARGAR UN DOCUMENTO PARA PREVISUALIZACIÓN ---
 @router.get("/{document_id}/download")
 async def download_document_for_preview(
     document_id: UUID,
-    db: Session = Depends(database.get_db)
+    request: Request,
+    revision: Optional[int] = Query(None, ge=1, description="Número de revisión (por defecto, la actual)."),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
-    Descarga el archivo PDF actual de un documento desde MinIO para
-    que el frontend pueda previsualizarlo.
+    Descarga el archivo PDF actual de un documento (o una revisión anterior)
+    desde MinIO para que el frontend pueda previsualizarlo.
+
+    Admite peticiones condicionales (If-None-Match / If-Modified-Since → 304)
+    y rangos de bytes (Range → 206), de modo que pdf.js puede cargar solo las
+    páginas que muestra y el navegador revalida sin volver a descargar.
     """
     # 1. Buscamos el registro del documento en la base de datos
-    doc_record = db.query(models.Document).filter(models.Document.id == document_id).first()
+    trace = metrics.start_trace("download")
+    with trace.span("db_lookup"):
+        doc_record = await _get_document(db, document_id)
     if not doc_record:
         raise HTTPException(status_code=404, detail="Documento no encontrado.")
-    
-    # 2. Creamos un directorio temporal para la descarga
-    temp_dir = tempfile.mkdtemp()
-    local_pdf_path = os.path.join(temp_dir, doc_record.original_filename)
+
+    # 2. Revisión que se sirve: su hash es el ETag y su fecha, Last-Modified
+    with trace.span("db_lookup"):
+        version = await db.run_sync(get_version, document_id, revision)
+    if version is not None:
+        segments = version.segments
+        size = version.size
+        etag = f'"{version.sha256}"'
+        last_modified = as_utc(version.created_at) if version.created_at is not None else None
+    elif revision is not None:
+        raise HTTPException(status_code=404, detail="Revisión no encontrada.")
+    else:
+        # Documento anterior al registro de revisiones: metadatos del objeto
+        try:
+            with trace.span("storage_head"):
+                object_info = await run_io(
+                    minio_client.get_object_info,
+                    bucket_name=DOCUMENTS_BUCKET,
+                    object_name=doc_record.storage_path
+                )
+        except Exception as e:
+            raise HTTPException(status_code=500, detail=f"No se pudo obtener el archivo desde el almacenamiento: {e}")
+
+        size = object_info["ContentLength"]
+        last_modified = object_info.get("LastModified")
+        # El ETag se deriva de la versión del objeto (o de su ETag si el bucket no versiona)
+        version_id = object_info.get("VersionId")
+        etag = f'"{version_id}"' if version_id and version_id != "null" else object_info["ETag"]
+        segments = [minio_client.Segment(doc_record.storage_path, size)]
+
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        # El documento cambia al firmarse: el navegador debe revalidar siempre,
+        # salvo al pedir una revisión concreta, que no cambia nunca
+        "Cache-Control": "private, no-cache" if revision is None else "private, max-age=31536000, immutable",
+        "Content-Disposition": content_disposition(doc_record.original_filename),
+    }
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+
+    # 3. Si el cliente ya tiene esta versión, 304 sin cuerpo
+    if is_not_modified(request.headers, etag, last_modified):
+        del headers["Content-Disposition"]
+        trace.operation = "download_not_modified"
+        trace.finish(document_id=document_id)
+        return Response(status_code=304, headers=headers)
+
+    # 4. Rango de bytes, si se pidió y el recurso no cambió desde entonces
+    byte_range = None
+    if if_range_allows(request.headers, etag, last_modified):
+        try:
+            byte_range = parse_byte_range(request.headers.get("range"), size)
+        except RangeNotSatisfiable:
+            return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "ETag": etag})
 
     try:
-        # 3. Usamos nuestro cliente de MinIO para descargar el archivo
-        minio_client.download_file(
-            bucket_name=DOCUMENTS_BUCKET,
-            object_name=doc_record.storage_path,
-            file_path=local_pdf_path
-        )
-        
-        # 4. Devolvemos el archivo usando FileResponse, con una tarea de limpieza
-        cleanup_task = BackgroundTask(cleanup_temp_dir, temp_dir)
-        return FileResponse(
-            path=local_pdf_path,
-            filename=doc_record.original_filename,
-            media_type='application/pdf',
-            background=cleanup_task
-        )
+        # 5. Abrimos la revisión (o solo el rango pedido) en MinIO: la revisión
+        # base y los incrementos de las firmas se leen uno tras otro
+        with trace.span("storage_open"):
+            chunks = await run_io(
+                minio_client.open_segments_stream,
+                bucket_name=DOCUMENTS_BUCKET,
+                segments=segments,
+                byte_range=byte_range
+            )
     except Exception as e:
-        cleanup_temp_dir(temp_dir)
         raise HTTPException(status_code=500, detail=f"No se pudo obtener el archivo desde el almacenamiento: {e}")
 
+    # 6. Reenviamos los bloques de MinIO al cliente a medida que llegan. La
+    # traza termina aquí: el envío del cuerpo depende del cliente.
+    if byte_range is None:
+        headers["Content-Length"] = str(size)
+        trace.size(size)
+        trace.finish(document_id=document_id)
+        return StreamingResponse(chunks, media_type='application/pdf', headers=headers)
+
+    start, end = byte_range
+    trace.operation = "download_range"
+    trace.size(end - start + 1)
+    trace.finish(document_id=document_id)
+    headers["Content-Length"] = str(end - start + 1)
+    headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(chunks, status_code=206, media_type='application/pdf', headers=headers)
+
+
+# --- ENDPOINT: HISTORIAL DE REVISIONES DE UN DOCUMENTO ---
+@router.get("/{document_id}/revisions", response_model=List[schemas.DocumentRevisionInfo])
+async def get_document_revisions(document_id: UUID, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Versiones del PDF en orden (la subida y una por firma). Cada una se
+    descarga con /download?revision=<number>.
+    """
+    doc_record = await _get_document(db, document_id)
+    if not doc_record:
+        raise HTTPException(status_code=404, detail="Documento no encontrado.")
+    return await db.run_sync(list_revisions, document_id)
+
+
+# --- ENDPOINT: PÁGINAS Y MINIATURAS DE UN DOCUMENTO ---
+def revision_cache_control(revision: Optional[int]):
+    """La revisión actual cambia al firmar; una revisión concreta, nunca."""
+    return "private, no-cache" if revision is None else "private, max-age=31536000, immutable"
+
+
+async def _load_thumbnails(db: AsyncSession, document_id: UUID, revision: Optional[int], trace):
+    """Revisión pedida (por defecto, la actual) y el índice de sus miniaturas."""
+    with trace.span("db_lookup"):
+        doc_record = await _get_document(db, document_id)
+    if not doc_record:
+        raise HTTPException(status_code=404, detail="Documento no encontrado.")
+    with trace.span("db_lookup"):
+        version = await db.run_sync(get_version, document_id, revision)
+    if version is None or version.sha256 is None:
+        detail = "Revisión no encontrada." if revision is not None else "El documento no tiene registro de revisiones."
+        raise HTTPException(status_code=404, detail=detail)
+    try:
+        # Normalmente ya existen (se generan al subir y al firmar)
+        with trace.span("thumbnails"):
+            manifest = await page_thumbnails.ensure(version)
+    except ThumbnailError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudieron generar las miniaturas: {e}")
+    return version, manifest
+
+
+@router.get("/{document_id}/pages", response_model=schemas.DocumentPages)
+async def get_document_pages(
+    document_id: UUID,
+    request: Request,
+    revision: Optional[int] = Query(None, ge=1, description="Número de revisión (por defecto, la actual)."),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """
+    Número de páginas, tamaño de cada una en puntos PDF (para situar la
+    estampa sin descargar el PDF) y URL de su miniatura. Las URLs llevan el
+    número de revisión, así que el navegador guarda las imágenes sin
+    revalidarlas.
+    """
+    trace = metrics.start_trace("pages")
+    version, manifest = await _load_thumbnails(db, document_id, revision, trace)
+    etag = f'"{version.sha256}-w{manifest["width"]}"'
+    last_modified = as_utc(version.created_at) if version.created_at is not None else None
+    headers = {"ETag": etag, "Cache-Control": revision_cache_control(revision)}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_http_date(last_modified)
+    if is_not_modified(request.headers, etag, last_modified):
+        trace.operation = "pages_not_modified"
+        trace.finish(document_id=document_id)
+        return Response(status_code=304, headers=headers)
+
+    pages = [
+        schemas.PageInfo(
+            index=index,
+            width=page["width"],
+            height=page["height"],
+            rotation=page["rotation"],
+            media_box=page["media_box"],
+            thumbnail_url=f"/api/documents/{document_id}/pages/{index}/thumbnail?revision={version.number}",
+            thumbnail_width=page["thumbnail"]["width"],
+            thumbnail_height=page["thumbnail"]["height"],
+        )
+        for index, page in enumerate(manifest["pages"])
+    ]
+    body = schemas.DocumentPages(
+        document_id=document_id, revision=version.number, sha256=version.sha256,
+        page_count=len(pages), pages=pages
+    )
+    trace.finish(document_id=document_id)
+    return JSONResponse(content=jsonable_encoder(body), headers=headers)
+
+
+@router.get("/{document_id}/pages/{page_index}/thumbnail")
+async def get_page_thumbnail(
+    document_id: UUID,
+    page_index: int,
+    request: Request,
+    revision: Optional[int] = Query(None, ge=1, description="Número de revisión (por defecto, la actual)."),
+    db: AsyncSession = Depends(database.get_async_db)
+):
+    """Miniatura JPEG de una página (0 = primera) de una revisión."""
+    trace = metrics.start_trace("thumbnail")
+    _, manifest = await _load_thumbnails(db, document_id, revision, trace)
+    if not 0 <= page_index < len(manifest["pages"]):
+        raise HTTPException(status_code=404, detail="Página no encontrada.")
+    thumbnail = manifest["pages"][page_index]["thumbnail"]
+    etag = f'"{thumbnail["sha256"]}"'
+    headers = {"ETag": etag, "Cache-Control": revision_cache_control(revision)}
+    if is_not_modified(request.headers, etag, None):
+        trace.operation = "thumbnail_not_modified"
+        trace.finish(document_id=document_id)
+        return Response(status_code=304, headers=headers)
+
+    with trace.span("storage_get"):
+        data = await run_io(minio_client.read_object, DOCUMENTS_BUCKET, thumbnail["key"])
+    if data is None:
+        raise HTTPException(status_code=500, detail="No se pudo obtener la miniatura desde el almacenamiento.")
+    trace.size(len(data))
+    trace.finish(document_id=document_id)
+    return Response(content=data, media_type="image/jpeg", headers=headers)
+
+
+# --- ENDPOINT: VERIFICAR LAS FIRMAS DE UN DOCUMENTO ---
+@router.get("/{document_id}/verify", response_model=schemas.DocumentVerification)
+async def verify_document_signatures(document_id: UUID, db: AsyncSession = Depends(database.get_async_db)):
+    """
+    Verifica las firmas incrustadas en la versión actual del PDF: integridad,
+    firma criptográfica, cambios posteriores a cada firma y, si hay CAs
+    configuradas, la cadena de confianza del firmante.
+
+    Cada firma se verifica una sola vez y el resultado se guarda por el hash
+    de su revisión: tras una firma nueva solo se verifica la última revisión,
+    y si no hay revisiones pendientes se responde sin descargar el PDF.
+    """
+    trace = metrics.start_trace("verify")
+    with trace.span("db_lookup"):
+        doc_record = await _get_document(db, document_id)
+    if not doc_record:
+        raise HTTPException(status_code=404, detail="Documento no encontrado.")
+    with trace.span("db_lookup"):
+        state = await db.run_sync(load_verification_state, doc_record)
+
+    if state.revisions and not pending_revisions(state):
+        report = await db.run_sync(lambda _: build_report(doc_record, state, state.rows, 0, chain_validator))
+        trace.operation = "verify_cached"
+        trace.finish(document_id=document_id)
+        return report
+
+    temp_dir = create_temp_dir()
+    try:
+        checks, counts = await verify_pending(state, temp_dir, trace)
+        if state.revisions:
+            with trace.span("db_commit"):
+                rows = await db.run_sync(save_verifications, state, checks, counts)
+            report = await db.run_sync(lambda _: build_report(doc_record, state, rows, len(checks), chain_validator))
+        else:
+            # Documento anterior al registro de revisiones: sin hash por
+            # revisión no hay dónde guardar el resultado
+            file_size = os.path.getsize(os.path.join(temp_dir, "current_version.pdf"))
+            report = build_report(doc_record, state, checks, len(checks), chain_validator, file_size=file_size)
+    except VerificationError as e:
+        await db.rollback()
+        raise HTTPException(status_code=422, detail=str(e))
+    except Exception as e:
+        await db.rollback()
+        raise HTTPException(status_code=500, detail=f"Error inesperado en el servidor: {str(e)}")
+    finally:
+        await run_io(cleanup_temp_dir, temp_dir)
+    trace.finish(document_id=document_id)
+    return report
+
 
 # --- ENDPOINT 3: OBTENER DOCUMENTOS PENDIENTES (BANDEJA DE ENTRADA) ---
-@router.get("/pending", response_model=List[schemas.DocumentBase])
+@router.get("/pending", response_model=schemas.PendingDocumentsPage)
 async def get_pending_documents(
-    # Podemos añadir filtros, por ejemplo, para ver los pendientes de un nivel específico
-    # signer_level: Optional[int] = None, 
-    db: Session = Depends(database.get_db)
+    signer_level: Optional[int] = Query(None, description="Solo documentos que esperan a este nivel."),
+    status: Optional[str] = Query(None, description="Solo documentos en este estado (por defecto, todos menos 'COMPLETADO')."),
+    limit: int = Query(PENDING_PAGE_DEFAULT_SIZE, ge=1, le=PENDING_PAGE_MAX_SIZE),
+    cursor: Optional[str] = Query(None, description="Valor de next_cursor de la página anterior."),
+    db: AsyncSession = Depends(database.get_async_db)
 ):
     """
-    Obtiene una lista de todos los documentos que no están en estado 'COMPLETADO'.
+    Obtiene una página de documentos pendientes, del más reciente al más antiguo.
     Esta será la base para la bandeja de entrada de cada usuario.
+
+    La paginación es por cursor sobre (created_at, id): cada página es un
+    recorrido de índice acotado, sin OFFSET, y las firmas de todos los
+    documentos de la página se cargan en una única consulta adicional.
     """
+    cache_key = inbox_cache.make_key(status, signer_level, limit, cursor)
+    cached = inbox_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    generation = inbox_cache.generation()
+
     # TODO: Cuando tengamos usuarios, aquí filtraremos por el usuario actual.
-    query = db.query(models.Document).filter(models.Document.status != "COMPLETADO")
-    
-    # if signer_level:
-    #     query = query.filter(models.Document.current_signer_level == signer_level)
-        
-    pending_docs = query.order_by(models.Document.created_at.desc()).all()
-    return pending_docs
\ No newline at end of file
+    query = select(models.Document)
+    if status is not None:
+        query = query.where(models.Document.status == status)
+    else:
+        query = query.where(models.Document.status != "COMPLETADO")
+
+    if signer_level is not None:
+        query = query.where(models.Document.current_signer_level == signer_level)
+
+    before = None
+    if cursor:
+        try:
+            created_at, last_id = decode_cursor(cursor)
+            before = (created_at, last_id)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        query = query.where(tuple_(models.Document.created_at, models.Document.id) < (created_at, last_id))
+
+    # Pedimos una fila de más para saber si existe una página siguiente
+    query = (
+        query.options(selectinload(models.Document.signatures))
+        .order_by(models.Document.created_at.desc(), models.Document.id.desc())
+        .limit(limit + 1)
+    )
+    # La serialización de la respuesta ya no toca la base de datos (las
+    # firmas se cargan en la misma consulta).
+    documents = (await db.scalars(query)).all()
+
+    next_cursor = None
+    last = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        next_cursor = encode_cursor(documents[-1])
+        last = (documents[-1].created_at, documents[-1].id)
+
+    # Los documentos quedan desvinculados de la sesión al cerrarla, con sus
+    # firmas ya cargadas, así que pueden servirse desde la caché.
+    page = {"items": documents, "next_cursor": next_cursor}
+    inbox_cache.store(cache_key, CachedPage(status, signer_level, before, last, page), generation)
+    return page
+
+
+@router.get("/events")
+async def stream_document_events(request: Request):
+    """
+    Flujo de Server-Sent Events con los cambios de estado de los documentos
+    (document.uploaded, document.signed). Un evento "resync" indica que el
+    cliente se perdió eventos y debe volver a cargar la bandeja.
+    """
+    queue = events.broker.subscribe()
+
+    async def event_stream():
+        try:
+            # Ajusta el tiempo de reconexión del EventSource del navegador
+            yield "retry: 3000\n\n"
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(queue.get(), timeout=EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comentario SSE: mantiene la conexión abierta a través de proxies
+                    yield ": keep-alive\n\n"
+                    continue
+                yield events.format_sse(event)
+        finally:
+            events.broker.unsubscribe(queue)
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.get("/pending/cache-stats")
+async def get_pending_cache_stats():
+    """Aciertos, fallos e invalidaciones de la caché de la bandeja de entrada."""
+    return inbox_cache.stats()
\ No newline at end of file
@@ -0,0 +1,57 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+from uuid import UUID
+
+from .. import database, schemas, minio_client
+from ..config import DOCUMENTS_BUCKET
+from ..executors import run_io
+from ..jobs import JOB_COMPLETED, JOB_FAILED, get_job, expire_if_stale
+from ..storage import get_version
+from .documents import content_disposition
+
+router = APIRouter(
+    prefix="/api/jobs",
+    tags=["jobs"],
+)
+
+
+def _get_job_or_404(db: Session, job_id: UUID):
+    job = get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo de firma no encontrado.")
+    return expire_if_stale(db, job)
+
+
+# --- CONSULTAR EL ESTADO DE UN TRABAJO DE FIRMA ---
+@router.get("/{job_id}", response_model=schemas.SigningJobInfo)
+async def get_signing_job(job_id: UUID, db: Session = Depends(database.get_db)):
+    return await run_io(_get_job_or_404, db, job_id)
+
+
+# --- DESCARGAR EL PDF FIRMADO POR UN TRABAJO ---
+@router.get("/{job_id}/result")
+async def get_signing_job_result(job_id: UUID, db: Session = Depends(database.get_db)):
+    job = await run_io(_get_job_or_404, db, job_id)
+    if job.status == JOB_FAILED:
+        raise HTTPException(status_code=409, detail=f"El trabajo de firma falló: {job.detail}")
+    if job.status != JOB_COMPLETED:
+        raise HTTPException(status_code=409, detail="El trabajo de firma aún no ha terminado.")
+
+    # El PDF firmado es la revisión que produjo la firma del trabajo
+    version = await run_io(get_version, db, job.document_id, signature_id=job.signature_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail="No se encontró la revisión firmada por este trabajo.")
+    try:
+        chunks = await run_io(minio_client.open_segments_stream, DOCUMENTS_BUCKET, version.segments)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"No se pudo obtener el archivo desde el almacenamiento: {e}")
+
+    return StreamingResponse(
+        chunks,
+        media_type='application/pdf',
+        headers={
+            "Content-Length": str(version.size),
+            "Content-Disposition": content_disposition(f"firmado_nivel_{job.signer_level}_{job.document_id}.pdf"),
+        }
+    )
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, UploadFile, File, Form, HTTPException, Response
+
+from .. import schemas
+from ..executors import run_cpu, run_io
+from ..logic.pdf_signer import PDFSigner
+from ..logic.signer_sessions import SignerSessionCache
+from .certificates import check_signer_chain
+from ..config import SIGNER_SESSION_TTL_SECONDS, SIGNER_SESSION_MAX_ENTRIES
+
+router = APIRouter(
+    prefix="/api/signer-sessions",
+    tags=["signer-sessions"],
+)
+
+# Caché de certificados desbloqueados compartida por todo el proceso
+signer_sessions = SignerSessionCache(
+    ttl_seconds=SIGNER_SESSION_TTL_SECONDS,
+    max_entries=SIGNER_SESSION_MAX_ENTRIES
+)
+
+
+def get_signer_session(token: str):
+    """Obtener una sesión de firmante activa o responder 401."""
+    session = signer_sessions.get(token)
+    if session is None:
+        raise HTTPException(status_code=401, detail="Sesión de firmante inválida o expirada.")
+    return session
+
+
+# --- DESBLOQUEAR UN CERTIFICADO Y ABRIR UNA SESIÓN DE FIRMANTE ---
+@router.post("/", response_model=schemas.SignerSessionInfo)
+async def open_signer_session(
+    cert_file: UploadFile = File(..., description="Certificado digital (.p12)."),
+    password: str = Form(..., description="Contraseña del certificado.")
+):
+    """
+    Carga el certificado una sola vez y devuelve un token de corta duración
+    que puede usarse en lugar del .p12 y la contraseña al firmar.
+    """
+    # El descifrado del .p12 y la validación de la cadena no bloquean el bucle de eventos
+    try:
+        loaded = await run_cpu(PDFSigner.from_pkcs12_data, await cert_file.read(), password)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Contraseña incorrecta o archivo corrupto.")
+    await run_io(check_signer_chain, loaded.signer)
+    session = signer_sessions.open(loaded.signer)
+
+    return schemas.SignerSessionInfo(
+        token=session.token,
+        cert_subject=session.cert_subject,
+        fingerprint=session.fingerprint,
+        expires_at=session.expires_at
+    )
+
+
+# --- CERRAR UNA SESIÓN DE FIRMANTE ---
+@router.delete("/{token}", status_code=204)
+async def close_signer_session(token: str):
+    if not signer_sessions.revoke(token):
+        raise HTTPException(status_code=404, detail="Sesión de firmante no encontrada.")
+    return Response(status_code=204)
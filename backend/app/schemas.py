@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Union
 from uuid import UUID
 from datetime import datetime
 
@@ -21,6 +21,167 @@ class DocumentBase(BaseModel):
     current_signer_level: int
     created_at: datetime
     signatures: List[SignatureBase] = []
+    # Leídos del PDF al subirlo (nulos en documentos anteriores); si no admite
+    # una firma incremental, las peticiones de firma responden 422
+    page_count: Optional[int] = None
+    incremental_safe: Optional[bool] = None
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# Esquema de una revisión del PDF de un documento
+class DocumentRevisionInfo(BaseModel):
+    number: int
+    sha256: str
+    size: int
+    # Bytes guardados para esta revisión: solo el incremento si base_size no es nulo
+    stored_size: int
+    base_size: Optional[int] = None
+    signature_id: Optional[UUID] = None
+    created_at: datetime
+
+    class Config:
+        orm_mode = True
+
+# Página de la bandeja de entrada (paginación por cursor)
+class PendingDocumentsPage(BaseModel):
+    items: List[DocumentBase]
+    # Cursor opaco para pedir la página siguiente; None si no hay más
+    next_cursor: Optional[str] = None
+
+# Esquema de una sesión de firmante (certificado desbloqueado en memoria)
+class SignerSessionInfo(BaseModel):
+    token: str
+    cert_subject: str
+    fingerprint: str
+    expires_at: datetime
+
+
+# Estado de un trabajo de firma asíncrona
+class SigningJobInfo(BaseModel):
+    id: UUID
+    document_id: UUID
+    status: str
+    detail: Optional[str] = None
+    signature_id: Optional[UUID] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        orm_mode = True
+
+
+# Esquemas de la firma por lotes
+class BatchSignItem(BaseModel):
+    document_id: UUID
+    signer_level: int
+    page_index: int
+    x_coord: float
+    y_coord: float
+    width: float
+
+
+class BatchSignResult(BaseModel):
+    document_id: UUID
+    success: bool
+    status_code: int
+    detail: str
+    signature_id: Optional[UUID] = None
+
+
+class BatchSignResponse(BaseModel):
+    signed: int
+    failed: int
+    results: List[BatchSignResult]
+
+
+# Resumen de un certificado inspeccionado (sin la clave privada)
+class CertificateSummary(BaseModel):
+    fingerprint: str  # SHA-256 del certificado en DER
+    format: str       # pkcs12, pem o der
+    has_private_key: bool
+    subject_name: str
+    subject_organization: str
+    issuer_name: str
+    issuer_organization: str
+    valid_from: str
+    valid_to: str
+    is_valid: bool
+    days_until_expiry: int
+    serial_number: str
+    public_key_type: str
+    public_key_size: Union[int, str]
+    signature_algorithm: str
+    key_usage: List[str] = []
+    # Resultado de la validación de la cadena (solo con TRUST_STORE_DIR configurado)
+    chain_status: Optional[str] = None
+    chain_detail: Optional[str] = None
+
+
+class CertificateInspection(BaseModel):
+    filename: Optional[str] = None
+    success: bool
+    status_code: int
+    detail: str
+    certificate: Optional[CertificateSummary] = None
+
+
+class CertificateBulkInspection(BaseModel):
+    inspected: int
+    failed: int
+    results: List[CertificateInspection]
+
+
+# Resultado de verificar una firma incrustada en el PDF de un documento
+class SignatureVerificationInfo(BaseModel):
+    field_name: str
+    # Firma de la plataforma que la produjo (nula si el PDF ya venía firmado)
+    signature_id: Optional[UUID] = None
+    revision_sha256: Optional[str] = None
+    signer_name: Optional[str] = None
+    signing_time: Optional[datetime] = None
+    md_algorithm: Optional[str] = None
+    intact: bool              # El contenido firmado no cambió
+    valid: bool               # La firma criptográfica es correcta
+    covers_revision: bool     # Firma toda la revisión en la que se añadió
+    covers_entire_file: bool  # Es la última actualización del PDF
+    # Peor cambio posterior a la firma (NONE, LTA_UPDATES, FORM_FILLING, ANNOTATIONS, OTHER)
+    modification_level: Optional[str] = None
+    # Resultado de la validación de la cadena (solo con TRUST_STORE_DIR configurado)
+    chain_status: Optional[str] = None
+    chain_detail: Optional[str] = None
+    detail: Optional[str] = None
+    verified_at: Optional[datetime] = None
+
+
+class DocumentVerification(BaseModel):
+    document_id: UUID
+    revision: Optional[int] = None  # Revisión verificada (nula en documentos sin registro de revisiones)
+    sha256: Optional[str] = None
+    # Todas las firmas son correctas, sin cambios no permitidos después de
+    # ellas y, si hay CAs configuradas, con una cadena de confianza válida
+    valid: bool
+    verified_now: int  # Firmas verificadas en esta petición (el resto venía de la base de datos)
+    signatures: List[SignatureVerificationInfo]
+
+
+# Tamaño de una página en puntos PDF, tal como se muestra (con /Rotate
+# aplicado), y la URL de su miniatura (ver GET /{id}/pages/{n}/thumbnail)
+class PageInfo(BaseModel):
+    index: int  # 0 = primera página, como page_index al firmar
+    width: float
+    height: float
+    rotation: int
+    media_box: List[float]
+    thumbnail_url: str
+    thumbnail_width: int
+    thumbnail_height: int
+
+
+class DocumentPages(BaseModel):
+    document_id: UUID
+    revision: int
+    sha256: str
+    page_count: int
+    pages: List[PageInfo]
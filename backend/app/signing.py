@@ -0,0 +1,240 @@
+"""
+Flujo de firma de un documento almacenado en MinIO: descargar la versión
+actual, firmarla y guardar la versión firmada como una nueva revisión (solo
+los bytes que añadió la firma incremental).
+
+La descarga y la subida se ejecutan en el pool de hilos de E/S y la firma
+(estampa + hash del PDF + firma) en el pool de procesos, de modo que el
+bucle de eventos queda libre para atender otras peticiones.
+"""
+
+import asyncio
+import os
+import shutil
+import tempfile
+import uuid
+from collections import namedtuple
+
+from pyhanko.pdf_utils.reader import PdfFileReader
+from sqlalchemy import update
+from sqlalchemy.orm.attributes import set_committed_value
+
+from . import events, metrics, minio_client, models
+from .cache import inbox_cache
+from .config import DOCUMENTS_BUCKET, STAMP_APPEARANCE, STORAGE_MAX_DELTA_CHAIN
+from .executors import run_cpu, run_io
+from .pdf_metadata import add_signature_field, page_number
+from .storage import NewRevision, Version, add_revision, claim_content, full_revision
+from .logic.pdf_signer import next_signature_field_name, signature_field_index, signature_field_name
+
+
+class SigningError(Exception):
+    """Error de firma imputable al documento (PDF inválido, posición incorrecta, etc.)."""
+
+
+class DocumentConflict(Exception):
+    """Otra firma cambió el documento después de leerlo (responder 409)."""
+
+
+def create_temp_dir():
+    """Directorio temporal de trabajo (contado en firma_temp_dirs_in_flight)."""
+    temp_dir = tempfile.mkdtemp()
+    metrics.TEMP_DIRS_IN_FLIGHT.inc()
+    return temp_dir
+
+
+def cleanup_temp_dir(temp_dir: str):
+    try:
+        shutil.rmtree(temp_dir)
+    except Exception as e:
+        print(f"Error limpiando el directorio temporal {temp_dir}: {e}")
+    finally:
+        metrics.TEMP_DIRS_IN_FLIGHT.dec()
+
+
+def sign_pdf_file(signer, input_pdf_path, output_pdf_path, reason, location, page_index, x_coord, y_coord, width, field_name=None,
+                  appearance=STAMP_APPEARANCE):
+    """
+    Firmar un PDF local. Se ejecuta en un proceso del pool de CPU, por lo que
+    recibe el PDFSigner serializado y corre la corrutina en su propio bucle.
+    Sin field_name, el nombre del campo se obtiene de /AcroForm /Fields.
+
+    Returns:
+        tuple: (success, message, timings, field_name), donde success y
+        message son los de PDFSigner.async_sign_file, timings los segundos de
+        cada etapa y field_name el campo de firma usado.
+    """
+    timings = {}
+    if field_name is None:
+        with open(input_pdf_path, "rb") as f:
+            field_name = next_signature_field_name(PdfFileReader(f, strict=False))
+    success, message = asyncio.run(signer.async_sign_file(
+        input_pdf=input_pdf_path,
+        output_pdf=output_pdf_path,
+        reason=reason,
+        location=location,
+        page_index=page_index,
+        x_coord=x_coord,
+        y_coord=y_coord,
+        width=width,
+        timings=timings,
+        field_name=field_name,
+        appearance=appearance
+    ))
+    return success, message, timings, field_name
+
+
+# Resultado de sign_stored_document: PDF firmado local, campo de firma usado,
+# revisión guardada en MinIO (storage.NewRevision), página de la estampa y
+# hash de la revisión firmada (None si la descarga no coincidía con ella)
+SignedFile = namedtuple("SignedFile", "path field_name revision page_index base_sha256")
+
+
+def planned_field_name(doc_record):
+    """Nombre del próximo campo de firma según lo registrado en la base de datos."""
+    return signature_field_name(doc_record.signature_count or 0)
+
+
+def store_signed_file(path, version: Version, incremental: bool):
+    """
+    Guardar el PDF firmado: solo el incremento sobre `version` si se puede
+    (y el /ByteRange de la firma lo confirma), o el PDF completo si no.
+    """
+    with open(path, "rb") as f:
+        if incremental:
+            try:
+                sha256, size, stored = minio_client.put_increment(
+                    DOCUMENTS_BUCKET, f, version.size, version.sha256, claim=claim_content
+                )
+                return NewRevision(stored, sha256, size, version.size)
+            except ValueError as e:
+                print(f"La firma se guarda completa, no como incremento: {e}")
+                f.seek(0)
+        return full_revision(minio_client.put_content(DOCUMENTS_BUCKET, f, claim=claim_content))
+
+
+async def sign_stored_document(signer, version: Version, work_dir, reason, location, page_index, x_coord, y_coord, width,
+                               trace=None, field_name=None, appearance=STAMP_APPEARANCE):
+    """
+    Descargar, firmar y guardar la versión firmada como una nueva revisión
+    (sin sobrescribir la anterior). Si se pasa una traza de app.metrics, se
+    registra el tiempo de cada etapa.
+
+    La descarga se comprueba contra el hash de `version` (ver
+    storage.current_version). Si coincide, la firma se guarda solo como el
+    incremento añadido y, si la revisión actual la produjo otra firma de la
+    plataforma, se usa field_name (ver planned_field_name). Si no, el PDF
+    viene de fuera: el nombre se busca en su formulario y se guarda completo.
+    `appearance` es la apariencia de la estampa (ver pdf_signer.STAMP_APPEARANCES).
+
+    Returns:
+        SignedFile: ruta local del PDF firmado (dentro de work_dir), campo de
+        firma usado y revisión guardada. El documento no cambia hasta
+        record_signature.
+    Raises:
+        SigningError: si pyhanko no pudo firmar el documento.
+    """
+    if trace is None:
+        trace = metrics.start_trace("sign")
+    os.makedirs(work_dir, exist_ok=True)
+    input_pdf_path = os.path.join(work_dir, "current_version.pdf")
+    output_pdf_path = os.path.join(work_dir, "signed_version.pdf")
+
+    with trace.span("download"):
+        downloaded_sha256 = await run_io(
+            minio_client.download_segments_to_file,
+            bucket_name=DOCUMENTS_BUCKET,
+            segments=version.segments,
+            file_path=input_pdf_path
+        )
+    verified = version.sha256 is not None and downloaded_sha256 == version.sha256
+    if not (verified and version.signed):
+        field_name = None
+
+    # "sign" incluye el paso por el pool de procesos; "stamp" y "pdf_sign"
+    # son las etapas medidas dentro del proceso que firma
+    with trace.span("sign"):
+        success, message, timings, field_name = await run_cpu(
+            sign_pdf_file, signer, input_pdf_path, output_pdf_path,
+            reason, location, page_index, x_coord, y_coord, width, field_name, appearance
+        )
+    for stage, seconds in timings.items():
+        trace.record(stage, seconds)
+    if not success:
+        raise SigningError(message)
+
+    incremental = verified and version.chain_length < STORAGE_MAX_DELTA_CHAIN
+    with trace.span("upload"):
+        revision = await run_io(store_signed_file, output_pdf_path, version, incremental)
+    trace.size(revision.size)
+    return SignedFile(output_pdf_path, field_name, revision, page_index, version.sha256 if verified else None)
+
+
+# Cambio de estado de un documento al registrar una firma. Se capturan los
+# valores antes del commit porque este expira los atributos del documento.
+# page_index (desde 0, nunca negativo si se conoce el número de páginas) y
+# base_sha256 son los de SignedFile (para las miniaturas).
+SignatureChange = namedtuple("SignatureChange", "signature document_id created_at before after page_index base_sha256")
+
+
+def record_signature(db, doc_record, cert_subject, signer_level, signed: SignedFile):
+    """
+    Registrar la firma, su revisión del PDF, y avanzar el documento al
+    siguiente nivel. No confirma la transacción.
+
+    El avance es un único UPDATE condicionado a que el documento siga en la
+    versión con la que se leyó (doc_record.version). Si otra firma lo avanzó
+    mientras tanto no se registra nada: la revisión ya subida no sustituye a
+    ninguna otra (cada una se guarda bajo su hash) y queda sin referencias.
+
+    Raises:
+        DocumentConflict: si el documento ya no está en esa versión.
+    """
+    # El siguiente campo será el posterior al usado (que puede venir del PDF
+    # si se modificó por fuera) y la versión subida pasa a ser la conocida
+    index = signature_field_index(signed.field_name)
+    count = doc_record.signature_count or 0
+    level = doc_record.current_signer_level + 1
+    values = {
+        "signature_count": max(count, index) + 1 if index is not None else count + 1,
+        "current_signer_level": level,
+        "status": f"PENDIENTE_FIRMA_NIVEL_{level}",
+        # TODO: Lógica para cambiar a "COMPLETADO" si era el último firmante
+        "storage_path": signed.revision.stored.key,
+        "version": doc_record.version + 1,
+    }
+    signature_fields = add_signature_field(doc_record, signed.field_name)
+    if signature_fields is not None:
+        values["signature_fields"] = signature_fields
+    result = db.execute(
+        update(models.Document)
+        .where(models.Document.id == doc_record.id, models.Document.version == doc_record.version)
+        .values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    if result.rowcount != 1:
+        raise DocumentConflict(f"El documento cambió mientras se firmaba. Se esperaba la versión {doc_record.version}.")
+
+    before = (doc_record.status, doc_record.current_signer_level)
+    # El documento en memoria pasa a la fila ya escrita, sin otro UPDATE al hacer flush
+    for key, value in values.items():
+        set_committed_value(doc_record, key, value)
+
+    signature = models.Signature(
+        id=uuid.uuid4(), document_id=doc_record.id, signed_by=cert_subject,
+        signer_level=signer_level, field_name=signed.field_name
+    )
+    db.add(signature)
+    add_revision(db, doc_record, signed.revision, signature=signature)
+    after = (doc_record.status, doc_record.current_signer_level)
+    # Como en pyhanko, -1 es la última página: las miniaturas comparan índices desde 0
+    page_index = page_number(doc_record, signed.page_index)
+    if page_index is None:
+        page_index = signed.page_index
+    return SignatureChange(signature, doc_record.id, doc_record.created_at, before, after, page_index, signed.base_sha256)
+
+
+async def notify_signed(change: SignatureChange):
+    """Después del commit: invalidar la caché de la bandeja y publicar el evento."""
+    inbox_cache.invalidate_document(change.created_at, change.document_id, before=change.before, after=change.after)
+    await events.publish_document_event("document.signed", change.document_id, change.created_at, change.after, previous=change.before)
@@ -0,0 +1,233 @@
+"""
+Registro en la base de datos del almacenamiento direccionado por contenido.
+
+minio_client.put_content guarda cada PDF bajo su SHA-256 (y no lo vuelve a
+subir si ya existe); aquí se anota cada revisión de un documento y una
+referencia más al contenido que usa, en la misma transacción que el cambio
+del documento.
+
+Una revisión firmada puede guardarse solo como el incremento que la firma
+añadió (minio_client.put_increment); get_version devuelve la lista de
+objetos que hay que concatenar para leer una revisión completa.
+
+Cada escritura reclama antes su contenido (claim_content), en una
+transacción propia. Si la revisión no llega a registrarse (la firma falló o
+perdió la comprobación de versión), el objeto queda con ref_count = 0 y
+sweep_unreferenced lo borra pasado STORAGE_GC_GRACE_SECONDS.
+"""
+
+import asyncio
+import uuid
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
+
+from . import database, minio_client, models
+from .config import DOCUMENTS_BUCKET, STORAGE_GC_BATCH_SIZE, STORAGE_GC_GRACE_SECONDS, STORAGE_GC_INTERVAL_SECONDS
+from .executors import run_io
+from .minio_client import Segment, StoredContent, content_object_name
+
+# Revisión que se va a registrar: objeto guardado (PDF completo o incremento),
+# hash y tamaño del PDF completo, y tamaño de la revisión base si es un incremento
+NewRevision = namedtuple("NewRevision", "stored sha256 size base_size")
+
+# Cómo leer una revisión: objetos a concatenar, hash y tamaño del PDF
+# completo (sha256 es None si no se conoce), fecha, si la produjo una firma
+# de la plataforma y cuántos incrementos hay desde la última revisión completa
+Version = namedtuple("Version", "number segments sha256 size created_at signed chain_length")
+
+
+def full_revision(stored: StoredContent):
+    """NewRevision de un PDF guardado completo."""
+    return NewRevision(stored, stored.sha256, stored.size, None)
+
+
+def _insert(db):
+    return postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+
+
+def claim_content(sha256, size):
+    """
+    Anotar que se va a escribir ese contenido, antes de comprobar si ya está
+    en MinIO (es el claim de minio_client.put_content). Se confirma en una
+    sesión propia: el barrido no borra un objeto reclamado hace menos de
+    STORAGE_GC_GRACE_SECONDS, y si lo estaba borrando, esta sentencia espera
+    a que termine y la escritura vuelve a subirlo.
+    """
+    db = database.SessionLocal()
+    try:
+        table = models.StoredObject.__table__
+        now = datetime.now(timezone.utc)
+        statement = _insert(db)(table).values(sha256=sha256, size=size, ref_count=0, claimed_at=now)
+        db.execute(statement.on_conflict_do_update(index_elements=[table.c.sha256], set_={"claimed_at": now}))
+        db.commit()
+    finally:
+        db.close()
+
+
+def _add_reference(db, stored: StoredContent):
+    """Crear la fila del contenido o sumarle una referencia, en una sola sentencia."""
+    insert = _insert(db)
+    table = models.StoredObject.__table__
+    statement = insert(table).values(sha256=stored.sha256, size=stored.size, ref_count=1)
+    statement = statement.on_conflict_do_update(
+        index_elements=[table.c.sha256],
+        set_={"ref_count": table.c.ref_count + 1}
+    )
+    db.execute(statement)
+
+
+def add_revision(db, document, new: NewRevision, signature=None):
+    """
+    Registrar una nueva revisión del documento y convertirla en la actual.
+    No confirma la transacción.
+    """
+    _add_reference(db, new.stored)
+    if inspect(document).persistent:
+        last = (
+            db.query(func.max(models.DocumentRevision.number))
+            .filter(models.DocumentRevision.document_id == document.id)
+            .scalar()
+        )
+    else:
+        last = None
+    revision = models.DocumentRevision(
+        id=uuid.uuid4(),
+        document=document,
+        number=(last or 0) + 1,
+        object_sha256=new.stored.sha256,
+        base_size=new.base_size,
+        content_sha256=new.sha256,
+        content_size=new.size,
+        signature=signature
+    )
+    db.add(revision)
+    document.storage_path = new.stored.key
+    return revision
+
+
+def list_revisions(db, document_id):
+    """Revisiones de un documento en orden, con el tamaño de su contenido."""
+    return (
+        db.query(models.DocumentRevision)
+        .options(selectinload(models.DocumentRevision.stored_object))
+        .filter(models.DocumentRevision.document_id == document_id)
+        .order_by(models.DocumentRevision.number)
+        .all()
+    )
+
+
+def get_version(db, document_id, number=None, signature_id=None):
+    """
+    Objetos que forman una revisión (la actual, la número `number` o la que
+    produjo la firma `signature_id`). None si no existe o si el documento es
+    anterior al registro de revisiones.
+    """
+    query = (
+        db.query(models.DocumentRevision)
+        .options(selectinload(models.DocumentRevision.stored_object))
+        .filter(models.DocumentRevision.document_id == document_id)
+    )
+    if signature_id is not None:
+        target = query.filter(models.DocumentRevision.signature_id == signature_id).first()
+        if target is None:
+            return None
+        number = target.number
+    if number is not None:
+        query = query.filter(models.DocumentRevision.number <= number)
+    rows = query.order_by(models.DocumentRevision.number.desc()).all()
+    if not rows or (number is not None and rows[0].number != number):
+        return None
+
+    # Desde la revisión pedida hacia atrás hasta la última guardada completa
+    segments = []
+    for row in rows:
+        segments.append(Segment(content_object_name(row.object_sha256), row.stored_size))
+        if row.base_size is None:
+            break
+    segments.reverse()
+    current = rows[0]
+    return Version(
+        number=current.number,
+        segments=segments,
+        sha256=current.sha256,
+        size=current.size,
+        created_at=current.created_at,
+        signed=current.signature_id is not None,
+        chain_length=len(segments) - 1
+    )
+
+
+def current_version(db, document):
+    """
+    Versión actual de un documento para firmarlo. Los documentos anteriores al
+    registro de revisiones se leen de storage_path sin poder verificarlos.
+    """
+    version = get_version(db, document.id)
+    if version is None:
+        version = Version(None, [Segment(document.storage_path, None)], None, None, None, False, 0)
+    return version
+
+
+
+def sweep_unreferenced(db, grace_seconds=STORAGE_GC_GRACE_SECONDS, limit=STORAGE_GC_BATCH_SIZE):
+    """
+    Borrar, de la base de datos y de MinIO, hasta `limit` objetos sin
+    revisiones reclamados hace más de grace_seconds. Las filas se borran
+    primero y se confirma después de borrar los objetos: mientras tanto
+    quedan bloqueadas para claim_content y para las firmas que las usen.
+
+    Returns:
+        int: número de objetos borrados.
+    """
+    table = models.StoredObject.__table__
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=grace_seconds)
+    unreferenced = (table.c.ref_count == 0, table.c.claimed_at < cutoff)
+    candidates = select(table.c.sha256).where(*unreferenced).limit(limit)
+    try:
+        deleted = db.execute(
+            delete(table).where(table.c.sha256.in_(candidates), *unreferenced).returning(table.c.sha256)
+        ).scalars().all()
+        minio_client.delete_objects(DOCUMENTS_BUCKET, [content_object_name(sha256) for sha256 in deleted])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return len(deleted)
+
+
+class StorageSweeper:
+    """Barrido periódico de sweep_unreferenced en este proceso."""
+
+    def __init__(self, interval_seconds):
+        self.interval_seconds = interval_seconds
+        self._task = None
+
+    def start(self):
+        if self.interval_seconds > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval_seconds)
+            db = database.SessionLocal()
+            try:
+                deleted = await run_io(sweep_unreferenced, db)
+                if deleted:
+                    print(f"Recolección del almacenamiento: {deleted} objetos sin revisiones borrados.")
+            except Exception as e:
+                print(f"Error en la recolección del almacenamiento: {e}")
+            finally:
+                await run_io(db.close)
+
+
+storage_sweeper = StorageSweeper(STORAGE_GC_INTERVAL_SECONDS)
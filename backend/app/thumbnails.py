@@ -0,0 +1,229 @@
+"""
+Miniaturas de las páginas de cada revisión de un documento, guardadas en
+MinIO junto al PDF:
+
+    thumbnails/<SHA-256 de la revisión>/w<ancho>/pages.json  índice
+    thumbnails/<SHA-256 de la revisión>/w<ancho>/<página>.jpg
+
+Una revisión no cambia nunca, y sus miniaturas tampoco: se sirven con caché
+de larga duración y los índices se guardan además en memoria. El índice
+(tamaño de cada página y su miniatura) se escribe el último, así que su
+existencia indica que la revisión está completa.
+
+Se generan en segundo plano al subir un documento y tras cada firma, o en la
+petición si aún no existen, sin repetir el trabajo si ya está en curso. Las
+páginas se reparten en grupos entre el pool de procesos. Una firma solo
+cambia la página en la que se estampa: el resto de miniaturas se toman de la
+revisión anterior.
+"""
+
+import asyncio
+import io
+import json
+import os
+from collections import OrderedDict
+
+from pypdfium2 import PdfiumError
+
+from . import database, metrics, minio_client
+from .config import (
+    DOCUMENTS_BUCKET, THUMBNAILS_ENABLED, THUMBNAIL_CACHE_MAX_ENTRIES, THUMBNAIL_MAX_CONCURRENT,
+    THUMBNAIL_PAGES_PER_TASK, THUMBNAIL_QUALITY, THUMBNAIL_WIDTH
+)
+from .executors import run_cpu, run_io
+from .logic.page_render import read_page_sizes, render_thumbnails
+from .signing import SignatureChange, cleanup_temp_dir, create_temp_dir
+from .storage import Version, get_version
+
+
+class ThumbnailError(Exception):
+    """El PDF de la revisión no se puede leer (responder 422)."""
+
+
+def thumbnail_prefix(sha256, width):
+    """Prefijo en MinIO de las miniaturas de una revisión."""
+    return f"thumbnails/{sha256}/w{width}/"
+
+
+class PageThumbnails:
+    """
+    Generación y lectura de las miniaturas de las revisiones. Un objeto por
+    proceso, usado solo desde el bucle de eventos.
+    """
+
+    def __init__(self, bucket, width, quality, pages_per_task, max_concurrent, max_entries):
+        self.bucket = bucket
+        self.width = width
+        self.quality = quality
+        self.pages_per_task = max(1, pages_per_task)
+        self.max_concurrent = max(1, max_concurrent)
+        self.max_entries = max_entries
+        self._manifests = OrderedDict()  # SHA-256 de la revisión -> índice
+        self._in_flight = {}  # SHA-256 de la revisión -> tarea que la genera
+        self._background = set()
+        self._slots = None
+
+    def _remember(self, sha256, manifest):
+        self._manifests[sha256] = manifest
+        self._manifests.move_to_end(sha256)
+        while len(self._manifests) > self.max_entries:
+            self._manifests.popitem(last=False)
+
+    async def get_manifest(self, sha256):
+        """Índice de las miniaturas de una revisión, o None si aún no existen."""
+        manifest = self._manifests.get(sha256)
+        if manifest is not None:
+            self._manifests.move_to_end(sha256)
+            return manifest
+        data = await run_io(minio_client.read_object, self.bucket, thumbnail_prefix(sha256, self.width) + "pages.json")
+        if data is None:
+            return None
+        manifest = json.loads(data)
+        self._remember(sha256, manifest)
+        return manifest
+
+    async def ensure(self, version: Version, base_sha256=None, changed_pages=()):
+        """
+        Índice de las miniaturas de `version`, generándolas si no existen. Si
+        se indica la revisión base, solo se vuelven a dibujar las páginas de
+        changed_pages (y las que no estén en la base).
+
+        Raises:
+            ThumbnailError: si el PDF no se puede leer.
+        """
+        manifest = await self.get_manifest(version.sha256)
+        if manifest is not None:
+            return manifest
+        task = self._in_flight.get(version.sha256)
+        if task is None:
+            task = asyncio.ensure_future(self._generate(version, base_sha256, set(changed_pages)))
+            self._in_flight[version.sha256] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(version.sha256, None))
+        # Si se cancela la petición que espera, la generación sigue para las demás
+        return await asyncio.shield(task)
+
+    async def _generate(self, version: Version, base_sha256, changed_pages):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        trace = metrics.start_trace("thumbnails")
+        # La base se espera antes de ocupar un hueco: puede estar esperando uno
+        base = None
+        if base_sha256 is not None:
+            base = await self.get_manifest(base_sha256)
+            if base is None and base_sha256 in self._in_flight:
+                try:
+                    base = await asyncio.shield(self._in_flight[base_sha256])
+                except Exception:
+                    base = None
+        async with self._slots:
+            temp_dir = create_temp_dir()
+            try:
+                pdf_path = os.path.join(temp_dir, "revision.pdf")
+                with trace.span("download"):
+                    downloaded_sha256 = await run_io(
+                        minio_client.download_segments_to_file,
+                        bucket_name=self.bucket,
+                        segments=version.segments,
+                        file_path=pdf_path
+                    )
+                if downloaded_sha256 != version.sha256:
+                    raise RuntimeError("El contenido almacenado no coincide con la revisión registrada.")
+
+                try:
+                    with trace.span("page_sizes"):
+                        sizes = await run_cpu(read_page_sizes, pdf_path)
+                except PdfiumError as e:
+                    raise ThumbnailError(f"El PDF no se puede leer: {e}")
+                pages = [
+                    dict(width=size.width, height=size.height, rotation=size.rotation, media_box=list(size.media_box))
+                    for size in sizes
+                ]
+                # De la base se reutilizan las páginas que no cambiaron de tamaño.
+                # Los índices negativos (documentos sin número de páginas
+                # guardado) cuentan desde el final, como en pyhanko
+                changed_pages = {index + len(pages) if index < 0 else index for index in changed_pages}
+                reused = {}
+                if base is not None:
+                    for index, page in enumerate(pages):
+                        if index < len(base["pages"]) and index not in changed_pages:
+                            previous = base["pages"][index]
+                            if (previous["width"], previous["height"], previous["rotation"]) == (page["width"], page["height"], page["rotation"]):
+                                reused[index] = previous["thumbnail"]
+                pending = [index for index in range(len(pages)) if index not in reused]
+
+                chunks = [pending[i:i + self.pages_per_task] for i in range(0, len(pending), self.pages_per_task)]
+                with trace.span("render"):
+                    rendered = await asyncio.gather(*[
+                        run_cpu(render_thumbnails, pdf_path, chunk, self.width, self.quality) for chunk in chunks
+                    ])
+            finally:
+                await run_io(cleanup_temp_dir, temp_dir)
+
+            prefix = thumbnail_prefix(version.sha256, self.width)
+            thumbnails = [thumbnail for chunk in rendered for thumbnail in chunk]
+            with trace.span("upload"):
+                await asyncio.gather(*[
+                    run_io(minio_client.upload_stream, self.bucket, io.BytesIO(thumbnail.data), prefix + f"{thumbnail.index}.jpg", "image/jpeg")
+                    for thumbnail in thumbnails
+                ])
+            for thumbnail in thumbnails:
+                reused[thumbnail.index] = dict(
+                    key=prefix + f"{thumbnail.index}.jpg", sha256=thumbnail.sha256,
+                    width=thumbnail.width, height=thumbnail.height, size=len(thumbnail.data)
+                )
+            for index, page in enumerate(pages):
+                page["thumbnail"] = reused[index]
+
+            manifest = dict(sha256=version.sha256, width=self.width, pages=pages)
+            await run_io(
+                minio_client.upload_stream, self.bucket,
+                io.BytesIO(json.dumps(manifest).encode("utf-8")), prefix + "pages.json", "application/json"
+            )
+        self._remember(version.sha256, manifest)
+        trace.size(sum(len(thumbnail.data) for thumbnail in thumbnails))
+        trace.finish(sha256=version.sha256, pages=len(pages), rendered=len(thumbnails))
+        return manifest
+
+    def _spawn(self, coroutine):
+        task = asyncio.ensure_future(coroutine)
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+
+    async def _generate_for(self, document_id, signature_id=None, base_sha256=None, changed_pages=()):
+        try:
+            # Sesión propia: la de la petición se cierra al responder
+            db = database.SessionLocal()
+            try:
+                version = await run_io(get_version, db, document_id, signature_id=signature_id)
+            finally:
+                await run_io(db.close)
+            if version is not None and version.sha256 is not None:
+                await self.ensure(version, base_sha256, changed_pages)
+        except Exception as e:
+            print(f"Error generando las miniaturas del documento {document_id}: {e}")
+
+    def schedule_upload(self, document_id):
+        """Generar en segundo plano las miniaturas de un documento recién subido."""
+        if THUMBNAILS_ENABLED:
+            self._spawn(self._generate_for(document_id))
+
+    def schedule_signature(self, change: SignatureChange):
+        """Después del commit de una firma: generar las miniaturas de su revisión."""
+        if THUMBNAILS_ENABLED:
+            self._spawn(self._generate_for(
+                change.document_id, change.signature.id, change.base_sha256, (change.page_index,)
+            ))
+
+    async def stop(self):
+        """Cancelar las generaciones en curso al apagar."""
+        tasks = list(self._background) + list(self._in_flight.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+# Miniaturas compartidas por todo el proceso
+page_thumbnails = PageThumbnails(
+    DOCUMENTS_BUCKET, THUMBNAIL_WIDTH, THUMBNAIL_QUALITY, THUMBNAIL_PAGES_PER_TASK,
+    THUMBNAIL_MAX_CONCURRENT, THUMBNAIL_CACHE_MAX_ENTRIES
+)
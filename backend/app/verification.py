@@ -0,0 +1,215 @@
+"""
+Verificación de las firmas de un documento almacenado, con los resultados
+guardados en la base de datos (models.SignatureVerification).
+
+Cada revisión guardada es un prefijo de la siguiente y lo que firma una
+firma no cambia al añadir otras, así que cada firma se verifica una sola
+vez: la primera vez que se pide la verificación de un documento con
+revisiones pendientes (verified_signatures nulo) se descarga la versión
+actual y se verifican solo las firmas de esas revisiones. Si no hay
+pendientes, la respuesta sale de la base de datos sin descargar nada.
+
+La descarga se ejecuta en el pool de hilos de E/S y la verificación con
+pyhanko en el pool de procesos. La cadena de confianza del firmante se
+valida en cada consulta, porque depende de las CRLs del momento.
+"""
+
+import os
+from collections import namedtuple
+from datetime import datetime, timezone
+
+from pyhanko.pdf_utils.misc import PdfError
+from sqlalchemy.exc import IntegrityError
+
+from . import metrics, minio_client, models
+from .config import DOCUMENTS_BUCKET
+from .executors import run_cpu, run_io
+from .logic.chain_validation import STATUS_NOT_CONFIGURED, STATUS_VALID
+from .logic.signature_verifier import (
+    ALLOWED_MODIFICATION_LEVELS, SignatureCheck, effective_modification_level, verify_signatures
+)
+from .storage import current_version, list_revisions
+
+
+class VerificationError(Exception):
+    """El PDF del documento no se puede leer (responder 422)."""
+
+
+# Estado guardado de un documento: sus revisiones, la versión actual, los
+# resultados ya guardados de esas revisiones y el campo de firma de cada firma
+# de la plataforma (field_name -> signature_id)
+VerificationState = namedtuple("VerificationState", "revisions version rows signature_ids")
+
+
+def load_verification_state(db, document):
+    """Leer de la base de datos todo lo necesario para verificar el documento."""
+    revisions = list_revisions(db, document.id)
+    hashes = {revision.sha256 for revision in revisions}
+    rows = []
+    if hashes:
+        rows = (
+            db.query(models.SignatureVerification)
+            .filter(models.SignatureVerification.revision_sha256.in_(hashes))
+            .all()
+        )
+    signature_ids = {
+        signature.field_name: signature.id
+        for signature in (
+            db.query(models.Signature)
+            .filter(models.Signature.document_id == document.id, models.Signature.field_name.isnot(None))
+            .all()
+        )
+    }
+    return VerificationState(revisions, current_version(db, document), rows, signature_ids)
+
+
+def pending_revisions(state: VerificationState):
+    """Revisiones cuyas firmas aún no se verificaron (todas si el documento no tiene registro)."""
+    return [revision for revision in state.revisions if revision.verified_signatures is None]
+
+
+async def verify_pending(state: VerificationState, work_dir, trace=None):
+    """
+    Descargar la versión actual y verificar las firmas de las revisiones
+    pendientes (las ya guardadas de esas revisiones se omiten).
+
+    Returns:
+        tuple: (checks, counts) de signature_verifier.verify_signatures.
+    Raises:
+        VerificationError: si el PDF no se puede leer.
+        RuntimeError: si la descarga no coincide con la versión registrada.
+    """
+    if trace is None:
+        trace = metrics.start_trace("verify")
+    pdf_path = os.path.join(work_dir, "current_version.pdf")
+    with trace.span("download"):
+        downloaded_sha256 = await run_io(
+            minio_client.download_segments_to_file,
+            bucket_name=DOCUMENTS_BUCKET,
+            segments=state.version.segments,
+            file_path=pdf_path
+        )
+    if state.version.sha256 is not None and downloaded_sha256 != state.version.sha256:
+        raise RuntimeError("El contenido almacenado no coincide con la revisión registrada.")
+
+    revision_ends = [revision.size for revision in state.revisions]
+    if state.revisions:
+        pending = pending_revisions(state)
+        ends = {revision.sha256: revision.size for revision in state.revisions}
+        pending_ends = [revision.size for revision in pending]
+        known = [(ends[row.revision_sha256], row.field_name) for row in state.rows if row.revision_sha256 in ends]
+    else:
+        pending_ends, known = None, ()
+    try:
+        with trace.span("verify"):
+            return await run_cpu(verify_signatures, pdf_path, revision_ends, pending_ends, known)
+    except PdfError as e:
+        raise VerificationError(f"El PDF no se puede leer: {e}")
+
+
+def save_verifications(db, state: VerificationState, checks, counts):
+    """
+    Guardar los resultados nuevos y marcar las revisiones pendientes como
+    verificadas, en una transacción. Si otra petición guardó lo mismo a la
+    vez, se descarta esta escritura: el resultado es el mismo.
+
+    Returns:
+        list: filas de todas las firmas de las revisiones del documento.
+    """
+    by_end = {revision.size: revision for revision in state.revisions}
+    rows = list(state.rows)
+    verified_at = datetime.now(timezone.utc)
+    for check in checks:
+        row = models.SignatureVerification(
+            revision_sha256=by_end[check.revision_end].sha256,
+            field_name=check.field_name,
+            signature_id=state.signature_ids.get(check.field_name),
+            byte_range_end=check.byte_range_end,
+            intact=check.intact,
+            valid=check.valid,
+            covers_revision=check.covers_revision,
+            signer_name=check.signer_name,
+            signer_cert=check.signer_cert,
+            signing_time=check.signing_time,
+            md_algorithm=check.md_algorithm,
+            modification_level=check.modification_level,
+            previous_update_level=check.update_level,
+            detail=check.detail,
+            verified_at=verified_at,
+        )
+        db.add(row)
+        rows.append(row)
+    for end, count in counts.items():
+        by_end[end].verified_signatures = count
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        rows = load_verification_state(db, state.revisions[0].document).rows
+    return rows
+
+
+def _as_check(row: models.SignatureVerification):
+    """Fila guardada como signature_verifier.SignatureCheck (sin revision_end)."""
+    return SignatureCheck(
+        row.field_name, None, row.byte_range_end, row.intact, row.valid, row.covers_revision,
+        row.signer_name, row.signer_cert, row.signing_time, row.md_algorithm,
+        row.modification_level, row.previous_update_level, row.detail,
+    )
+
+
+def build_report(document, state: VerificationState, rows, verified_now, chain_validator=None, file_size=None):
+    """
+    Respuesta de /verify: una entrada por firma, en orden, con el nivel de
+    modificación efectivo y el estado de la cadena del firmante.
+
+    `rows` son filas de SignatureVerification o, en documentos sin registro de
+    revisiones (que no se guardan), los SignatureCheck recién calculados;
+    para ellos file_size es el tamaño del PDF descargado.
+    """
+    checks = [_as_check(row) if isinstance(row, models.SignatureVerification) else row for row in rows]
+    order = sorted(range(len(checks)), key=lambda index: checks[index].byte_range_end)
+    checks = [checks[index] for index in order]
+    rows = [rows[index] for index in order]
+    levels = effective_modification_level(checks)
+
+    if state.version.size is not None:
+        file_size = state.version.size
+    signatures = []
+    valid = bool(checks)
+    for row, check, level in zip(rows, checks, levels):
+        chain_status = chain_detail = None
+        if chain_validator is not None and check.signer_cert is not None:
+            chain = chain_validator.validate_der(check.signer_cert)
+            if chain.status != STATUS_NOT_CONFIGURED:
+                chain_status, chain_detail = chain.status, chain.detail
+        valid = (
+            valid and check.intact and check.valid and level in ALLOWED_MODIFICATION_LEVELS
+            and chain_status in (None, STATUS_VALID)
+        )
+        saved = isinstance(row, models.SignatureVerification)
+        signatures.append(dict(
+            field_name=check.field_name,
+            signature_id=state.signature_ids.get(check.field_name),
+            revision_sha256=row.revision_sha256 if saved else state.version.sha256,
+            signer_name=check.signer_name,
+            signing_time=check.signing_time,
+            md_algorithm=check.md_algorithm,
+            intact=check.intact,
+            valid=check.valid,
+            covers_revision=check.covers_revision,
+            covers_entire_file=check.byte_range_end == file_size,
+            modification_level=level,
+            chain_status=chain_status,
+            chain_detail=chain_detail,
+            detail=check.detail,
+            verified_at=row.verified_at if saved else None,
+        ))
+    return dict(
+        document_id=document.id,
+        revision=state.version.number,
+        sha256=state.version.sha256,
+        valid=valid,
+        verified_now=verified_now,
+        signatures=signatures,
+    )
@@ -0,0 +1,94 @@
+"""
+Benchmark de la inspección de certificados.
+
+Inspecciona --requests veces archivos .p12 elegidos entre --certificates
+certificados distintos (como usuarios que vuelven a consultar el suyo) y
+compara:
+
+- legacy: CertificateValidator.load_certificate_data y get_certificate_summary
+          en cada petición (desbloqueo del .p12 y análisis completos)
+- cached: el flujo de POST /api/certificates/inspect (CertificateSummaryCache
+          y read_certificate_file), sin pasar por HTTP ni por el pool de procesos
+
+Antes de medir comprueba que ambos devuelven el mismo resumen.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_certificate_inspect [--certificates 20] [--requests 400]
+"""
+
+import argparse
+import json
+import random
+import time
+import warnings
+
+from app.logic.certificate_cache import CertificateSummaryCache, read_certificate_file
+from app.logic.certificate_validator import CertificateValidator
+
+from .fixtures import make_p12
+from .stats import percentiles
+
+PASSWORD = "benchmark"
+
+
+def legacy_inspect(data, password):
+    validator = CertificateValidator()
+    success, message = validator.load_certificate_data(data, password)
+    if not success:
+        raise ValueError(message)
+    return validator.get_certificate_summary()
+
+
+def cached_inspect(cache, data, password):
+    summary = cache.lookup(data, password)
+    if summary is None:
+        summary = cache.add(data, password, read_certificate_file(data, password))
+    return summary
+
+
+def run(func, workload):
+    samples = []
+    for data in workload:
+        start = time.perf_counter()
+        func(data)
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--certificates", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args(argv)
+
+    # cryptography avisa de las fechas sin zona horaria de CertificateValidator
+    warnings.simplefilter("ignore")
+    certificates = [make_p12(common_name=f"FIRMANTE {index}", password=PASSWORD) for index in range(args.certificates)]
+    rng = random.Random(args.seed)
+    workload = [rng.choice(certificates) for _ in range(args.requests)]
+
+    cache = CertificateSummaryCache(max_entries=args.certificates * 2)
+    for data in certificates:
+        expected = legacy_inspect(data, PASSWORD)
+        actual = cached_inspect(cache, data, PASSWORD)
+        for key in ("subject_name", "issuer_name", "serial_number", "valid_to", "is_valid", "days_until_expiry", "key_usage"):
+            if expected[key] != actual[key]:
+                raise SystemExit(f"'{key}' difiere: {expected[key]!r} != {actual[key]!r}")
+    cache.clear()
+    cache.hits = cache.misses = 0
+
+    legacy = run(lambda data: legacy_inspect(data, PASSWORD), workload)
+    cached = run(lambda data: cached_inspect(cache, data, PASSWORD), workload)
+    report = {
+        "certificates": args.certificates,
+        "requests": args.requests,
+        "legacy": percentiles(legacy),
+        "cached": {**percentiles(cached), "hits": cache.hits, "misses": cache.misses},
+        "speedup_total": round(sum(legacy) / sum(cached), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
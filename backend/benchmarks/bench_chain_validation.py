@@ -0,0 +1,187 @@
+"""
+Benchmark de la validación de cadenas sin conexión (app.logic.chain_validation).
+
+Genera en un directorio temporal una PKI de prueba (raíz, intermedia y
+--leaves certificados finales) y una CRL de la intermedia con --revoked
+números de serie, y compara por validación:
+
+- naive:   leer y analizar en cada validación los certificados de confianza
+           y la CRL, buscando el número de serie en ella
+- indexed: ChainValidator (índice por SKI y conjuntos de números de serie,
+           recargados solo al cambiar los archivos)
+
+Antes de medir comprueba los resultados (válido, revocado, raíz
+desconocida y caducado) y que al reescribir la CRL se vuelve a analizar una
+sola vez.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_chain_validation [--leaves 50] [--revoked 20000] [--iterations 200]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import tempfile
+import time
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import NameOID
+
+from app.logic import chain_validation
+from app.logic.chain_validation import ChainValidator
+
+from .stats import percentiles
+
+NOW = datetime.datetime.now(datetime.timezone.utc)
+
+
+def _name(common_name):
+    return x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, common_name)])
+
+
+def make_certificate(common_name, issuer=None, issuer_key=None, ca=False, serial=None, expired=False):
+    """Certificado con clave EC (rápida de generar); sin emisor, autofirmado."""
+    key = ec.generate_private_key(ec.SECP256R1())
+    issuer_name = issuer.subject if issuer else _name(common_name)
+    signing_key = issuer_key or key
+    not_after = NOW - datetime.timedelta(days=1) if expired else NOW + datetime.timedelta(days=365)
+    builder = (
+        x509.CertificateBuilder()
+        .subject_name(_name(common_name))
+        .issuer_name(issuer_name)
+        .public_key(key.public_key())
+        .serial_number(serial or x509.random_serial_number())
+        .not_valid_before(NOW - datetime.timedelta(days=30))
+        .not_valid_after(not_after)
+        .add_extension(x509.BasicConstraints(ca=ca, path_length=None), critical=True)
+        .add_extension(x509.SubjectKeyIdentifier.from_public_key(key.public_key()), critical=False)
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(signing_key.public_key()), critical=False)
+    )
+    return builder.sign(signing_key, hashes.SHA256()), key
+
+
+def make_crl(issuer, issuer_key, serials):
+    builder = (
+        x509.CertificateRevocationListBuilder()
+        .issuer_name(issuer.subject)
+        .last_update(NOW - datetime.timedelta(hours=1))
+        .next_update(NOW + datetime.timedelta(days=7))
+        .add_extension(x509.AuthorityKeyIdentifier.from_issuer_public_key(issuer_key.public_key()), critical=False)
+    )
+    for serial in serials:
+        builder = builder.add_revoked_certificate(
+            x509.RevokedCertificateBuilder().serial_number(serial).revocation_date(NOW - datetime.timedelta(days=1)).build()
+        )
+    return builder.sign(issuer_key, hashes.SHA256())
+
+
+def write_pem(path, obj):
+    with open(path, "wb") as f:
+        f.write(obj.public_bytes(serialization.Encoding.PEM))
+
+
+def naive_validate(trust_dir, crl_path, certificate, intermediates=()):
+    """Referencia: todo se lee y analiza en cada llamada."""
+    trusted = []
+    for name in sorted(os.listdir(trust_dir)):
+        with open(os.path.join(trust_dir, name), "rb") as f:
+            trusted.extend(x509.load_pem_x509_certificates(f.read()))
+    with open(crl_path, "rb") as f:
+        crl = x509.load_pem_x509_crl(f.read())
+    current = certificate
+    for _ in range(chain_validation.MAX_CHAIN_LENGTH):
+        if any(current == candidate and current.issuer == current.subject for candidate in trusted):
+            return True
+        issuer = next((c for c in list(trusted) + list(intermediates) if c.subject == current.issuer), None)
+        if issuer is None:
+            return False
+        current.verify_directly_issued_by(issuer)
+        if crl.issuer == issuer.subject and crl.get_revoked_certificate_by_serial_number(current.serial_number) is not None:
+            return False
+        current = issuer
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--leaves", type=int, default=50)
+    parser.add_argument("--revoked", type=int, default=20000, help="entradas de la CRL")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        trust_dir = os.path.join(work_dir, "trust")
+        crl_dir = os.path.join(work_dir, "crl")
+        os.makedirs(trust_dir)
+        os.makedirs(crl_dir)
+
+        root, root_key = make_certificate("RAIZ DE PRUEBA", ca=True)
+        intermediate, intermediate_key = make_certificate("INTERMEDIA DE PRUEBA", root, root_key, ca=True)
+        write_pem(os.path.join(trust_dir, "root.pem"), root)
+        write_pem(os.path.join(trust_dir, "intermediate.pem"), intermediate)
+
+        leaves = [make_certificate(f"FIRMANTE {i}", intermediate, intermediate_key)[0] for i in range(args.leaves)]
+        revoked_leaf = leaves[-1]
+        serials = list(range(10 ** 6, 10 ** 6 + args.revoked - 1)) + [revoked_leaf.serial_number]
+        crl_path = os.path.join(crl_dir, "intermediate.crl")
+        write_pem(crl_path, make_crl(intermediate, intermediate_key, serials))
+
+        other_root, other_key = make_certificate("OTRA RAIZ", ca=True)
+        foreign_leaf = make_certificate("AJENO", other_root, other_key)[0]
+        expired_leaf = make_certificate("CADUCADO", intermediate, intermediate_key, expired=True)[0]
+
+        validator = ChainValidator.from_directories(trust_dir, crl_dir, reload_interval=3600)
+        expected = [
+            (leaves[0], chain_validation.STATUS_VALID),
+            (revoked_leaf, chain_validation.STATUS_REVOKED),
+            (foreign_leaf, chain_validation.STATUS_UNTRUSTED),
+            (expired_leaf, chain_validation.STATUS_EXPIRED),
+        ]
+        for certificate, status in expected:
+            result = validator.validate(certificate)
+            if result.status != status:
+                raise SystemExit(f"Se esperaba '{status}' y se obtuvo '{result.status}': {result.detail}")
+        if naive_validate(trust_dir, crl_path, leaves[0]) is not True or naive_validate(trust_dir, crl_path, revoked_leaf) is not False:
+            raise SystemExit("La referencia no coincide con ChainValidator.")
+
+        # Revocar otro certificado: solo se vuelve a analizar la CRL reescrita
+        parsed = validator.crl_index.parsed
+        write_pem(crl_path, make_crl(intermediate, intermediate_key, serials + [leaves[0].serial_number]))
+        os.utime(crl_path, ns=(time.time_ns(), time.time_ns() + 10 ** 9))
+        validator.crl_index.refresh(force=True)
+        validator.trust_store.refresh(force=True)
+        if validator.validate(leaves[0]).status != chain_validation.STATUS_REVOKED or validator.crl_index.parsed != parsed + 1:
+            raise SystemExit("La CRL modificada no se recargó.")
+        if validator.trust_store.loads != 1:
+            raise SystemExit("El almacén de confianza se recargó sin cambios.")
+        print("Resultados correctos; la CRL modificada se recargó una vez.", flush=True)
+
+        workload = [leaves[i % len(leaves)] for i in range(args.iterations)]
+
+        def timed(func):
+            samples = []
+            for certificate in workload:
+                start = time.perf_counter()
+                func(certificate)
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        naive = timed(lambda certificate: naive_validate(trust_dir, crl_path, certificate))
+        indexed = timed(validator.validate)
+
+    report = {
+        "leaves": args.leaves,
+        "crl_entries": len(serials) + 1,
+        "iterations": args.iterations,
+        "naive": percentiles(naive),
+        "indexed": percentiles(indexed),
+        "speedup_p50": round(percentiles(naive)["p50_ms"] / max(percentiles(indexed)["p50_ms"], 0.001), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
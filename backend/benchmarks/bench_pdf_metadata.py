@@ -0,0 +1,123 @@
+"""
+Benchmark de la validación de las peticiones de firma con los datos del PDF
+guardados al subirlo (app.pdf_metadata).
+
+Con un PDF sintético de --pages páginas compara, para una petición de firma
+en una página que no existe:
+
+- sign_attempt: lo que costaba descubrirlo antes, sin contar la descarga ni
+                la carga del certificado: abrir el PDF y que pyhanko falle
+                al añadir el campo de firma
+- db_check:     validate_sign_request contra la base de datos (SQLite en
+                memoria), antes de cualquier E/S
+
+y mide además read_pdf_metadata (upload_parse), el coste que se paga una
+sola vez al subir el documento.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_pdf_metadata [--pages 200] [--iterations 50]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.logic.pdf_inspection import read_pdf_metadata
+from app.logic.pdf_signer import PDFSigner
+
+from .fixtures import make_p12, make_pdf
+from .stats import percentiles
+
+PASSWORD = "benchmark"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args(argv)
+
+    pdf = make_pdf(pages=args.pages)
+    metadata = read_pdf_metadata(io.BytesIO(pdf))
+    if metadata.page_count != args.pages or not metadata.incremental_safe:
+        raise SystemExit(f"Datos del PDF inesperados: {metadata.page_count} páginas, {metadata.problem}")
+
+    # database.py crea su motor al importarse: los modelos se importan después
+    # de elegir la base de datos, aunque el benchmark usa su propio motor
+    os.environ.setdefault("DATABASE_URL", "sqlite://")
+    from app import models
+    from app.pdf_metadata import InvalidSignaturePosition, record_pdf_metadata, validate_sign_request
+
+    engine = create_engine("sqlite://")
+    models.Base.metadata.create_all(bind=engine, tables=[models.Document.__table__, models.DocumentPage.__table__])
+    db = sessionmaker(bind=engine, expire_on_commit=False)()
+    document = models.Document(id=uuid.uuid4(), original_filename="bench.pdf", storage_path="sha256/bench",
+                               status="PENDIENTE_FIRMA_NIVEL_1", current_signer_level=1)
+    db.add(document)
+    record_pdf_metadata(db, document, metadata)
+    db.commit()
+
+    signer = PDFSigner.from_pkcs12_data(make_p12(password=PASSWORD), PASSWORD)
+    missing_page = args.pages
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        input_path = os.path.join(work_dir, "input.pdf")
+        output_path = os.path.join(work_dir, "output.pdf")
+        with open(input_path, "wb") as f:
+            f.write(pdf)
+
+        def sign_attempt():
+            # La traza que imprime pdf_signer al fallar no interesa aquí
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                success, _ = asyncio.run(signer.async_sign_file(
+                    input_path, output_path, "Documento revisado y aprobado", "Quito", missing_page, 40, 40, 200
+                ))
+            return success
+
+        def db_check():
+            try:
+                validate_sign_request(db, document, missing_page, 40, 40, 200)
+            except InvalidSignaturePosition:
+                return False
+            return True
+
+        if sign_attempt() or db_check():
+            raise SystemExit("La página inexistente no se rechazó.")
+        validate_sign_request(db, document, -1, 40, 40, 200)
+        print("Página inexistente rechazada por pyhanko y por la base de datos.", flush=True)
+
+        def timed(func):
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                func()
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        attempt = timed(sign_attempt)
+        check = timed(db_check)
+        upload_parse = timed(lambda: read_pdf_metadata(io.BytesIO(pdf)))
+
+    report = {
+        "pages": args.pages,
+        "pdf_bytes": len(pdf),
+        "iterations": args.iterations,
+        "upload_parse": percentiles(upload_parse),
+        "sign_attempt": percentiles(attempt),
+        "db_check": percentiles(check),
+        "speedup_p50": round(percentiles(attempt)["p50_ms"] / max(percentiles(check)["p50_ms"], 0.001), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Micro-benchmark de la etapa del QR de la estampa.
+
+Compara el QR original (qrcode con fit=True y búsqueda de máscara,
+make_image en RGB, recorte y ampliación NEAREST; copiado aquí como
+referencia) con app.logic.stamp_renderer.render_qr, que reutiliza la versión
+y la máscara de cada clase de contenido y dibuja los módulos directamente en
+una imagen de 1 bit al tamaño final.
+
+Antes de medir comprueba, para cada firmante, que:
+- la versión reutilizada es la que elige fit=True para cada fecha, y
+- la imagen es idéntica píxel a píxel a la de referencia con la misma
+  versión y máscara.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_qr [--iterations 200] [--box-size 12] [--scale 4]
+"""
+
+import argparse
+import time
+
+import qrcode
+from PIL import Image
+
+from app.logic import stamp_renderer
+from app.logic.stamp_renderer import render_qr
+
+from .bench_stamp_renderer import SUBJECTS, _qr_text
+
+
+def legacy_render_qr(qr_text, box_size, scale, version=None, mask_pattern=None):
+    """QR original de la estampa, ya ampliado al tamaño del lienzo."""
+    qr = qrcode.QRCode(version=version, error_correction=qrcode.constants.ERROR_CORRECT_M,
+                       box_size=box_size, border=0, mask_pattern=mask_pattern)
+    qr.add_data(qr_text)
+    qr.make(fit=version is None)
+    img_qr = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+    bbox_qr_crop = img_qr.getbbox()
+    if bbox_qr_crop:
+        img_qr = img_qr.crop(bbox_qr_crop)
+    return img_qr.resize((img_qr.width * scale, img_qr.height * scale), resample=Image.NEAREST)
+
+
+def fit_version(qr_text):
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(qr_text)
+    return qr.best_fit()
+
+
+def verify(box_size, scale, samples=20):
+    for subject in SUBJECTS:
+        for i in range(samples):
+            text = _qr_text(subject, i)
+            render_qr(text, box_size * scale)
+            qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+            qr.add_data(text)
+            shape = stamp_renderer._qr_shape(qr)
+            if shape.version != fit_version(text):
+                raise SystemExit(f"Versión {shape.version} para '{subject}' distinta de la de fit=True.")
+            expected = legacy_render_qr(text, box_size, scale, *shape).convert("1")
+            actual = render_qr(text, box_size * scale)
+            if expected.size != actual.size or expected.tobytes() != actual.tobytes():
+                raise SystemExit(f"El QR de '{subject}' difiere del de referencia ({expected.size} vs {actual.size}).")
+    print("Versión mínima y salida idéntica píxel a píxel a la referencia.")
+
+
+def time_per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        for subject in SUBJECTS:
+            func(_qr_text(subject, i))
+    return (time.perf_counter() - start) / (iterations * len(SUBJECTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--box-size", type=int, default=12, help="qr_box_size de la configuración")
+    parser.add_argument("--scale", type=int, default=4, help="scale_factor de la configuración")
+    args = parser.parse_args()
+
+    verify(args.box_size, args.scale)
+
+    legacy = time_per_call(lambda text: legacy_render_qr(text, args.box_size, args.scale), args.iterations)
+    cached = time_per_call(lambda text: render_qr(text, args.box_size * args.scale), args.iterations)
+
+    def uncached(text):
+        stamp_renderer._qr_shapes.clear()
+        render_qr(text, args.box_size * args.scale)
+
+    cold = time_per_call(uncached, max(1, args.iterations // 10))
+    print(f"Original:           {legacy * 1000:8.2f} ms/QR")
+    print(f"Nuevo (sin caché):  {cold * 1000:8.2f} ms/QR  (x{legacy / cold:.2f})")
+    print(f"Nuevo (con caché):  {cached * 1000:8.2f} ms/QR  (x{legacy / cached:.2f})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,249 @@
+"""
+Benchmark del flujo de firma, etapa por etapa y de extremo a extremo.
+
+Para cada combinación de páginas y firmas previas genera un PDF sintético
+(firmado N veces con un certificado autofirmado) y mide:
+
+- unlock:        PDFSigner.from_pkcs12_data (desbloquear el .p12)
+- stamp:         PDFSigner.create_stamp_image
+- field_name:    PDFSigner._get_unique_field_name sobre un PdfFileReader ya abierto
+- sign_file:     PDFSigner.async_sign_file con archivos locales
+- endpoint_sign: POST /api/documents/{id}/sign con sesión de firmante, contra
+                 un S3 en memoria y SQLite (o el Postgres de --database-url)
+
+La salida es JSON con throughput, percentiles de latencia y pico de RSS por
+etapa, más las versiones de las dependencias, para comparar ejecuciones
+(por ejemplo antes y después de actualizar pyhanko o Pillow). Con
+--baseline se añade a cada resultado la relación p50 actual / p50 anterior.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_signing_path --pages 1 50 500 --signatures 0 5 20 \\
+        --iterations 10 --output resultados.json [--baseline anterior.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from importlib import metadata
+
+from .fixtures import make_p12, make_pdf
+from .stats import peak_rss_mb, percentiles
+
+PASSWORD = "benchmark"
+STAGES = ("unlock", "stamp", "field_name", "sign_file", "endpoint_sign")
+PACKAGES = ("pyhanko", "pyhanko-certvalidator", "Pillow", "qrcode", "cryptography", "SQLAlchemy", "fastapi", "boto3")
+
+
+def measure(func, iterations, warmup=1):
+    """Ejecutar func iterations veces (tras un calentamiento) y devolver las latencias."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def summarize(stage, pages, signatures, samples):
+    total = sum(samples)
+    return {
+        "stage": stage,
+        "pages": pages,
+        "signatures": signatures,
+        "throughput_per_s": round(len(samples) / total, 2) if total else None,
+        "latency": percentiles(samples),
+        "peak_rss": peak_rss_mb(),
+    }
+
+
+def sign_bytes(signer, pdf_bytes, work_dir, index):
+    """Firmar un PDF en memoria con PDFSigner y devolver el resultado."""
+    input_path = os.path.join(work_dir, f"in_{index}.pdf")
+    output_path = os.path.join(work_dir, f"out_{index}.pdf")
+    with open(input_path, "wb") as f:
+        f.write(pdf_bytes)
+    # Cada firma previa en un sitio distinto de la primera página
+    x = 40 + (index % 3) * 180
+    y = 40 + (index // 3) * 90
+    success, message = asyncio.run(signer.async_sign_file(input_path, output_path, "Benchmark", "Ecuador", 0, x, y, 150))
+    if not success:
+        raise RuntimeError(message)
+    with open(output_path, "rb") as f:
+        return f.read()
+
+
+def make_signed_pdf(signer, pages, signatures, work_dir):
+    """PDF sintético de `pages` páginas con `signatures` firmas incrementales."""
+    pdf = make_pdf(pages=pages)
+    for index in range(signatures):
+        pdf = sign_bytes(signer, pdf, work_dir, index)
+    return pdf
+
+
+def run_stages(args, p12, signer, pdf, pages, signatures, work_dir, client, session_token):
+    from pyhanko.pdf_utils.reader import PdfFileReader
+    from app.logic.pdf_signer import PDFSigner
+
+    results = []
+    if "unlock" in args.stages:
+        samples = measure(lambda: PDFSigner.from_pkcs12_data(p12, PASSWORD), args.iterations)
+        results.append(summarize("unlock", pages, signatures, samples))
+
+    if "stamp" in args.stages:
+        samples = measure(lambda: signer.create_stamp_image("Benchmark", "Ecuador"), args.iterations)
+        results.append(summarize("stamp", pages, signatures, samples))
+
+    if "field_name" in args.stages:
+        reader = PdfFileReader(io.BytesIO(pdf), strict=False)
+        samples = measure(lambda: signer._get_unique_field_name(reader), args.iterations)
+        results.append(summarize("field_name", pages, signatures, samples))
+
+    if "sign_file" in args.stages:
+        input_path = os.path.join(work_dir, "stage_in.pdf")
+        output_path = os.path.join(work_dir, "stage_out.pdf")
+        with open(input_path, "wb") as f:
+            f.write(pdf)
+
+        def sign_once():
+            success, message = asyncio.run(signer.async_sign_file(input_path, output_path, "Benchmark", "Ecuador", 0, 300, 500, 150))
+            if not success:
+                raise RuntimeError(message)
+
+        samples = measure(sign_once, args.iterations)
+        results.append(summarize("sign_file", pages, signatures, samples))
+
+    if "endpoint_sign" in args.stages:
+        samples = []
+        for _ in range(args.iterations + 1):
+            # Documento nuevo en cada iteración (la subida no se mide)
+            response = client.post("/api/documents/", files={"pdf_file": ("bench.pdf", pdf, "application/pdf")})
+            response.raise_for_status()
+            document_id = response.json()["id"]
+            start = time.perf_counter()
+            response = client.post(f"/api/documents/{document_id}/sign", data={
+                "session_token": session_token,
+                "signer_level": "1",
+                "page_index": "0",
+                "x_coord": "300",
+                "y_coord": "500",
+                "width": "150",
+            })
+            elapsed = time.perf_counter() - start
+            if response.status_code != 200:
+                raise RuntimeError(f"/sign respondió {response.status_code}: {response.text}")
+            samples.append(elapsed)
+        # La primera iteración hace de calentamiento (arranque del pool de procesos)
+        results.append(summarize("endpoint_sign", pages, signatures, samples[1:]))
+
+    return results
+
+
+def environment_info(args):
+    versions = {}
+    for package in PACKAGES:
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    return {
+        "started_at": datetime.now(timezone.utc).isoformat(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "database": "postgres" if args.database_url.startswith("postgresql") else "sqlite",
+        "iterations": args.iterations,
+        "packages": versions,
+    }
+
+
+def compare_with_baseline(results, baseline_path):
+    """Añadir a cada resultado la relación entre su p50 y el de la ejecución de referencia."""
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+    previous = {
+        (r["stage"], r["pages"], r["signatures"]): r["latency"].get("p50_ms")
+        for r in baseline.get("results", [])
+    }
+    for result in results:
+        old = previous.get((result["stage"], result["pages"], result["signatures"]))
+        new = result["latency"].get("p50_ms")
+        result["p50_vs_baseline"] = round(new / old, 3) if old and new else None
+
+
+def run(args):
+    # La base de datos se elige antes de importar la aplicación (database.py
+    # crea el motor al importarse)
+    os.environ["DATABASE_URL"] = args.database_url
+
+    from fastapi.testclient import TestClient
+    from app import minio_client
+    from app.logic.pdf_signer import PDFSigner
+    from .memory_s3 import MemoryS3
+
+    minio_client.s3_client = MemoryS3()
+    import main
+
+    p12 = make_p12(password=PASSWORD)
+    signer = PDFSigner.from_pkcs12_data(p12, PASSWORD)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir, TestClient(main.app) as client:
+        session_token = None
+        if "endpoint_sign" in args.stages:
+            response = client.post(
+                "/api/signer-sessions/",
+                files={"cert_file": ("bench.p12", p12, "application/x-pkcs12")},
+                data={"password": PASSWORD},
+            )
+            response.raise_for_status()
+            session_token = response.json()["token"]
+
+        for pages in args.pages:
+            for signatures in args.signatures:
+                print(f"Preparando PDF de {pages} páginas con {signatures} firmas...", file=sys.stderr)
+                pdf = make_signed_pdf(signer, pages, signatures, work_dir)
+                results.extend(run_stages(args, p12, signer, pdf, pages, signatures, work_dir, client, session_token))
+
+    if args.baseline:
+        compare_with_baseline(results, args.baseline)
+    # Al cerrar la aplicación ya terminó el pool de firma: aquí children_mb
+    # incluye el pico de los procesos que firmaron
+    return {"environment": environment_info(args), "results": results, "peak_rss": peak_rss_mb()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[1, 50, 500])
+    parser.add_argument("--signatures", type=int, nargs="+", default=[0, 5, 20], help="firmas previas en el PDF")
+    parser.add_argument("--iterations", type=int, default=10)
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    parser.add_argument("--database-url", default=None, help="por defecto, un SQLite temporal")
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto, la salida estándar)")
+    parser.add_argument("--baseline", help="JSON de una ejecución anterior para comparar")
+    args = parser.parse_args()
+
+    if args.database_url is None:
+        args.database_url = f"sqlite:///{tempfile.mkdtemp()}/bench.sqlite"
+
+    # Los mensajes de la aplicación van a stderr para no mezclarse con el JSON
+    with contextlib.redirect_stdout(sys.stderr):
+        report = json.dumps(run(args), indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark de la apariencia de la estampa: imagen (raster) frente a
+trazado y texto PDF (vector).
+
+Con cada apariencia firma --documents PDFs sintéticos --signatures veces
+seguidas (firmas incrementales, como el flujo multinivel) con
+PDFSigner.async_sign_file y mide:
+
+- stamp:    creación del contenido de la estampa (imagen o VectorStamp)
+- pdf_sign: firma con pyhanko, que incluye escribir la apariencia (y, en
+            modo vector, incrustar la fuente la primera vez)
+- bytes:    bytes que añade cada firma al PDF
+
+Las métricas se separan entre la primera firma de cada documento y las
+siguientes, que en modo vector reutilizan la fuente ya incrustada. Antes de
+medir se valida la integridad de todas las firmas del último documento.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_stamp_appearance --documents 10 --signatures 4 \\
+        [--pages 1] [--output resultados.json]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import statistics
+import tempfile
+
+from app.logic.pdf_signer import PDFSigner, STAMP_APPEARANCES
+
+from .fixtures import make_p12, make_pdf
+from .stats import peak_rss_mb, percentiles
+
+PASSWORD = "benchmark"
+
+
+def sign_chain(signer, appearance, pdf, signatures, work_dir, prefix):
+    """Firmar pdf `signatures` veces; devuelve [(stamp, pdf_sign, bytes añadidos)] y la ruta final."""
+    previous = os.path.join(work_dir, f"{prefix}_0.pdf")
+    with open(previous, "wb") as f:
+        f.write(pdf)
+    samples = []
+    for index in range(signatures):
+        output = os.path.join(work_dir, f"{prefix}_{index + 1}.pdf")
+        timings = {}
+        # Cada firma en una fila distinta de la primera página
+        success, message = asyncio.run(signer.async_sign_file(
+            previous, output, "Documento revisado y aprobado", "Quito", 0,
+            40, 40 + index * 110, 200, timings=timings, appearance=appearance
+        ))
+        if not success:
+            raise RuntimeError(message)
+        added = os.path.getsize(output) - os.path.getsize(previous)
+        samples.append((timings["stamp"], timings["pdf_sign"], added))
+        previous = output
+    return samples, previous
+
+
+def validate(path):
+    from pyhanko.pdf_utils.reader import PdfFileReader
+    from pyhanko.sign.validation import validate_pdf_signature
+    from pyhanko_certvalidator import ValidationContext
+
+    with open(path, "rb") as f:
+        reader = PdfFileReader(f, strict=False)
+        for signature in reader.embedded_signatures:
+            status = validate_pdf_signature(signature, ValidationContext(allow_fetching=False))
+            if not status.intact:
+                raise SystemExit(f"La firma {signature.field_name} de {path} no está íntegra.")
+
+
+def summarize(appearance, which, samples):
+    return {
+        "appearance": appearance,
+        "signatures": which,
+        "stamp": percentiles([s[0] for s in samples]),
+        "pdf_sign": percentiles([s[1] for s in samples]),
+        "bytes_added_mean": round(statistics.fmean(s[2] for s in samples)) if samples else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--signatures", type=int, default=4, help="firmas sucesivas por documento")
+    parser.add_argument("--pages", type=int, default=1)
+    parser.add_argument("--appearances", nargs="+", choices=STAMP_APPEARANCES, default=list(STAMP_APPEARANCES))
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    # Los avisos de validación (certificado autofirmado) no interesan aquí
+    logging.disable(logging.WARNING)
+    signer = PDFSigner.from_pkcs12_data(make_p12(password=PASSWORD), PASSWORD)
+    pdf = make_pdf(pages=args.pages)
+
+    results = []
+    with tempfile.TemporaryDirectory() as work_dir:
+        for appearance in args.appearances:
+            # Calentamiento: fuentes, disposición del texto y forma del QR en caché
+            sign_chain(signer, appearance, pdf, 1, work_dir, f"warmup_{appearance}")
+            first, later = [], []
+            final_size = None
+            for document in range(args.documents):
+                samples, path = sign_chain(signer, appearance, pdf, args.signatures, work_dir, f"{appearance}_{document}")
+                first.append(samples[0])
+                later.extend(samples[1:])
+                final_size = os.path.getsize(path)
+            validate(path)
+            results.append(summarize(appearance, "first", first))
+            results.append(summarize(appearance, "later", later))
+            results.append({"appearance": appearance, "signatures": "all",
+                            **summarize(appearance, "all", first + later), "final_pdf_bytes": final_size})
+
+    report = {
+        "documents": args.documents,
+        "signatures": args.signatures,
+        "pages": args.pages,
+        "source_pdf_bytes": len(pdf),
+        "results": results,
+        "peak_rss": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+"""
+Micro-benchmark del renderizado de la estampa de firma.
+
+Compara el renderizador original (copiado aquí como referencia, incluido el
+QR con qrcode make(fit=True) + make_image) con app.logic.stamp_renderer y
+muestra el tiempo medio por estampa.
+
+Antes de medir verifica que:
+- las estampas tienen el mismo tamaño (el QR tiene la misma versión);
+- con la misma máscara de QR, el renderizador original produce exactamente
+  los mismos píxeles. El nuevo reutiliza la máscara de la primera estampa de
+  cada clase de contenido (ver stamp_renderer._qr_shape), que puede no ser
+  la de menor penalización que elige make(fit=True): se informa de cuántas
+  estampas usan otra máscara (igual de válida).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_stamp_renderer [--iterations 50]
+"""
+
+import argparse
+import time
+
+import qrcode
+from PIL import Image, ImageDraw
+
+from app.logic import stamp_renderer
+from app.logic.stamp_renderer import FONT_PATH_BOLD, FONT_PATH_NORMAL, render_stamp
+
+SETTINGS = {
+    'qr_box_size': 12,
+    'text_font_size_normal': 60,
+    'text_font_size_bold': 120,
+    'scale_factor': 4,
+    'separacion_1_2': 2,
+    'separacion_2_3': 15,
+    'separacion_final': 80,
+    'desfase_vertical_texto': 120,
+    'text_padding_hr': 8,
+}
+
+SUBJECTS = [
+    "JUAN CARLOS PEREZ LOPEZ",
+    "MARIA GOMEZ",
+    "ADMINISTRADOR",
+]
+
+
+def legacy_render_qr(qr_text, box_size, mask_pattern=None):
+    """
+    QR original de PDFSigner.create_stamp_image, independiente de
+    stamp_renderer.render_qr. Con mask_pattern, make(fit=True) no busca la
+    máscara y usa esa.
+    """
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=box_size, border=0,
+                       mask_pattern=mask_pattern)
+    qr.add_data(qr_text)
+    qr.make(fit=True)
+    img_qr = qr.make_image(fill_color="black", back_color="white").convert("RGB")
+    bbox_qr_crop = img_qr.getbbox()
+    if bbox_qr_crop:
+        img_qr = img_qr.crop(bbox_qr_crop)
+    return img_qr
+
+
+def legacy_render_stamp(cert_subject, qr_text, settings, mask_pattern=None):
+    """Renderizador original de PDFSigner.create_stamp_image (sin caché)."""
+    from PIL import ImageFont
+
+    QR_BOX_SIZE = settings['qr_box_size']
+    TEXT_FONT_SIZE_NORMAL = settings['text_font_size_normal']
+    TEXT_FONT_SIZE_BOLD = settings['text_font_size_bold']
+    SCALE_FACTOR = settings['scale_factor']
+
+    img_qr = legacy_render_qr(qr_text, QR_BOX_SIZE, mask_pattern)
+    qr_px_width, qr_px_height = img_qr.size
+
+    font_path_normal, font_path_bold = FONT_PATH_NORMAL, FONT_PATH_BOLD
+    try: font_normal_hr = ImageFont.truetype(font_path_normal, size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR) if font_path_normal != "default" else ImageFont.load_default(size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR)
+    except IOError: font_normal_hr = ImageFont.load_default(size=TEXT_FONT_SIZE_NORMAL * SCALE_FACTOR)
+    try: font_bold_hr = ImageFont.truetype(font_path_bold, size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR) if font_path_bold != "default" else ImageFont.load_default(size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR)
+    except IOError: font_bold_hr = ImageFont.load_default(size=TEXT_FONT_SIZE_BOLD * SCALE_FACTOR)
+
+    SEPARACION_1_2 = settings['separacion_1_2']
+    SEPARACION_2_3 = settings['separacion_2_3']
+    SEPARACION_FINAL = settings['separacion_final']
+    DESFASE_VERTICAL_TEXTO = settings['desfase_vertical_texto']
+    line1_text = "Firmado electrónicamente por:"
+    tokens = cert_subject.upper().split()
+    name_line1_str = " ".join(tokens[:2]) if len(tokens) > 2 else " ".join(tokens) or "NO DISPONIBLE"
+    name_line2_str = " ".join(tokens[2:]) if len(tokens) > 2 else None
+    line3_text = "Validar únicamente con FirmaEC"
+
+    temp_draw = ImageDraw.Draw(Image.new("RGB", (1, 1)))
+    text_lines_data = [(line1_text, font_normal_hr), (name_line1_str, font_bold_hr)]
+    if name_line2_str:
+        text_lines_data.append((name_line2_str, font_bold_hr))
+    text_lines_data.append((line3_text, font_normal_hr))
+
+    text_heights_scaled = []
+    max_text_width_scaled = 0
+    for text, font in text_lines_data:
+        bbox = temp_draw.textbbox((0, 0), text, font=font)
+        text_heights_scaled.append(bbox[3] - bbox[1])
+        max_text_width_scaled = max(max_text_width_scaled, bbox[2] - bbox[0])
+
+    total_text_height_scaled = text_heights_scaled[0]
+    if len(text_heights_scaled) > 1: total_text_height_scaled += (SEPARACION_1_2 * SCALE_FACTOR) + text_heights_scaled[1]
+    if name_line2_str and len(text_heights_scaled) > 2: total_text_height_scaled += (SEPARACION_2_3 * SCALE_FACTOR) + text_heights_scaled[2]
+    idx_line3 = 2 if name_line2_str else 1
+    if len(text_heights_scaled) > idx_line3: total_text_height_scaled += (SEPARACION_FINAL * SCALE_FACTOR) + text_heights_scaled[idx_line3 + (1 if name_line2_str else 0)]
+
+    TEXT_PADDING_HR = settings['text_padding_hr'] * SCALE_FACTOR
+    text_area_width_scaled = max_text_width_scaled + (2 * TEXT_PADDING_HR)
+    final_img_width_scaled = (qr_px_width * SCALE_FACTOR) + TEXT_PADDING_HR + text_area_width_scaled
+    final_img_height_scaled = max(qr_px_height * SCALE_FACTOR, (DESFASE_VERTICAL_TEXTO * SCALE_FACTOR) + total_text_height_scaled)
+
+    high_res_canvas = Image.new("RGB", (final_img_width_scaled, final_img_height_scaled), color="#FFFFFF")
+    draw = ImageDraw.Draw(high_res_canvas)
+    high_res_canvas.paste(img_qr.resize((qr_px_width * SCALE_FACTOR, qr_px_height * SCALE_FACTOR), resample=Image.NEAREST), (0, 0))
+
+    text_x_pos_scaled = (qr_px_width * SCALE_FACTOR) + TEXT_PADDING_HR
+    current_y_scaled = DESFASE_VERTICAL_TEXTO * SCALE_FACTOR
+    bbox = draw.textbbox((0, 0), line1_text, font=font_normal_hr)
+    draw.text((text_x_pos_scaled, current_y_scaled), line1_text, fill="black", font=font_normal_hr)
+    current_y_scaled += (bbox[3] - bbox[1]) + (SEPARACION_1_2 * SCALE_FACTOR)
+    bbox = draw.textbbox((0, 0), name_line1_str, font=font_bold_hr)
+    draw.text((text_x_pos_scaled, current_y_scaled), name_line1_str, fill="black", font=font_bold_hr)
+    current_y_scaled += (bbox[3] - bbox[1])
+    if name_line2_str:
+        current_y_scaled += (SEPARACION_2_3 * SCALE_FACTOR)
+        bbox = draw.textbbox((0, 0), name_line2_str, font=font_bold_hr)
+        draw.text((text_x_pos_scaled, current_y_scaled), name_line2_str, fill="black", font=font_bold_hr)
+        current_y_scaled += (bbox[3] - bbox[1])
+    current_y_scaled += (SEPARACION_FINAL * SCALE_FACTOR)
+    draw.text((text_x_pos_scaled, current_y_scaled), line3_text, fill="black", font=font_normal_hr)
+
+    high_res_canvas.resize((final_img_width_scaled // SCALE_FACTOR, final_img_height_scaled // SCALE_FACTOR), resample=Image.LANCZOS)
+
+    qr_bbox = (0, 0, qr_px_width * SCALE_FACTOR, qr_px_height * SCALE_FACTOR)
+    text_min_x = text_min_y = float('inf')
+    text_max_x = text_max_y = float('-inf')
+    y = DESFASE_VERTICAL_TEXTO * SCALE_FACTOR
+    lines = [(line1_text, font_normal_hr, SEPARACION_1_2 * SCALE_FACTOR), (name_line1_str, font_bold_hr, 0)]
+    if name_line2_str:
+        lines[-1] = (name_line1_str, font_bold_hr, SEPARACION_2_3 * SCALE_FACTOR)
+        lines.append((name_line2_str, font_bold_hr, 0))
+    lines[-1] = (lines[-1][0], lines[-1][1], SEPARACION_FINAL * SCALE_FACTOR)
+    lines.append((line3_text, font_normal_hr, 0))
+    for text, font, gap in lines:
+        bbox = draw.textbbox((text_x_pos_scaled, y), text, font=font)
+        text_min_x = min(text_min_x, bbox[0])
+        text_min_y = min(text_min_y, bbox[1])
+        text_max_x = max(text_max_x, bbox[2])
+        text_max_y = max(text_max_y, bbox[3])
+        y += (bbox[3] - bbox[1]) + gap
+
+    final_combined_bbox = (
+        min(qr_bbox[0], text_min_x), min(qr_bbox[1], text_min_y),
+        max(qr_bbox[2], text_max_x), max(qr_bbox[3], text_max_y),
+    )
+    imagen_high_res = high_res_canvas.crop(final_combined_bbox)
+    imagen = imagen_high_res.resize(
+        (imagen_high_res.width // SCALE_FACTOR, imagen_high_res.height // SCALE_FACTOR),
+        resample=Image.LANCZOS
+    )
+    bbox_final = imagen.getbbox()
+    if bbox_final:
+        imagen = imagen.crop(bbox_final)
+    return imagen
+
+
+def _qr_text(subject, i):
+    return (
+        f"FIRMADO POR: {subject}\n"
+        f"RAZON: Documento revisado y aprobado\n"
+        f"LOCALIZACION: Ecuador\n"
+        f"FECHA:\n2025-01-01T10:00:{i % 60:02d}.000000123-05:00\n"
+        f"VALIDAR CON: https://www.firmadigital.gob.ec\n"
+        f"Firmado digitalmente con FirmaEC 4.0.1\n"
+        f"Linux 6.0 10.0"
+    )
+
+
+def cached_mask_pattern(qr_text):
+    """Máscara que usa stamp_renderer para este contenido."""
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, border=0)
+    qr.add_data(qr_text)
+    return stamp_renderer._qr_shape(qr).mask_pattern
+
+
+def _time_per_call(func, iterations):
+    start = time.perf_counter()
+    for i in range(iterations):
+        for subject in SUBJECTS:
+            func(subject, _qr_text(subject, i), SETTINGS)
+    return (time.perf_counter() - start) / (iterations * len(SUBJECTS))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    # 1. Verificación de equivalencia con el renderizador original
+    stamps = identical = 0
+    for subject in SUBJECTS:
+        for i in range(10):
+            qr_text = _qr_text(subject, i)
+            actual = render_stamp(subject, qr_text, SETTINGS)
+            original = legacy_render_stamp(subject, qr_text, SETTINGS)
+            if original.size != actual.size:
+                raise SystemExit(f"La estampa de '{subject}' no tiene el tamaño de la original "
+                                 f"({original.size} vs {actual.size}): cambió la versión del QR.")
+            same_mask = legacy_render_stamp(subject, qr_text, SETTINGS, cached_mask_pattern(qr_text))
+            if same_mask.tobytes() != actual.tobytes():
+                raise SystemExit(f"La estampa de '{subject}' difiere del renderizador original con la misma máscara.")
+            stamps += 1
+            identical += original.tobytes() == actual.tobytes()
+    print(f"Mismo tamaño que el renderizador original e idéntica píxel a píxel con la misma máscara "
+          f"en {stamps} estampas; {stamps - identical} usan otra máscara que la de menor penalización.")
+
+    # 2. Tiempos (el primer render del nuevo motor ya llenó las cachés)
+    legacy = _time_per_call(legacy_render_stamp, args.iterations)
+    stamp_renderer.get_font.cache_clear()
+    stamp_renderer.get_text_layout.cache_clear()
+    cached = _time_per_call(render_stamp, args.iterations)
+    print(f"Original: {legacy * 1000:8.2f} ms/estampa")
+    print(f"Nuevo:    {cached * 1000:8.2f} ms/estampa  (x{legacy / cached:.2f})")
+
+
+if __name__ == "__main__":
+    main()
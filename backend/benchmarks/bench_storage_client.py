@@ -0,0 +1,195 @@
+"""
+Benchmark del cliente de almacenamiento: configuración por defecto de boto3
+frente a la de minio_client.create_s3_client (STORAGE_*).
+
+Con cada perfil sube --objects PDFs de --size-mb MiB con
+minio_client.upload_stream desde --concurrency hilos (como hace el pool de
+E/S de la aplicación) y luego los lee completos con open_object_stream. Mide:
+
+- upload / download: throughput (MiB/s) y percentiles de latencia por objeto
+- pool_full:         avisos "Connection pool is full" de urllib3 (conexiones
+                     que se abrieron y se descartaron por falta de sitio)
+
+Perfiles:
+- default: boto3.client con Config() por defecto (10 conexiones, reintentos
+           "legacy") y partes subidas de una en una
+- tuned:   create_s3_client() y TRANSFER_CONCURRENCY partes en vuelo
+
+Sin --endpoint se arranca un servidor de moto en un puerto libre; para medir
+contra MinIO pase su URL (y MINIO_ACCESS_KEY / MINIO_SECRET_KEY).
+
+Uso (desde backend/):
+    python -m benchmarks.bench_storage_client --objects 64 --size-mb 20 \\
+        --concurrency 16 [--endpoint http://localhost:9000] [--output resultados.json]
+"""
+
+import argparse
+import io
+import json
+import logging
+import os
+import socket
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.client import Config
+
+from app import minio_client
+
+from .stats import peak_rss_mb, percentiles
+
+PROFILES = ("default", "tuned")
+
+
+class _PoolFullCounter(logging.Handler):
+    """Cuenta los avisos de urllib3 de conexiones descartadas por pool lleno."""
+
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.count = 0
+
+    def emit(self, record):
+        if "Connection pool is full" in record.getMessage():
+            self.count += 1
+
+
+def start_moto():
+    from moto.server import ThreadedMotoServer
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    return server, f"http://127.0.0.1:{port}"
+
+
+def build_client(profile, endpoint):
+    if profile == "tuned":
+        return minio_client.create_s3_client(endpoint)
+    return boto3.client(
+        "s3",
+        endpoint_url=endpoint,
+        aws_access_key_id=minio_client.MINIO_ACCESS_KEY,
+        aws_secret_access_key=minio_client.MINIO_SECRET_KEY,
+        config=Config(signature_version="s3v4")
+    )
+
+
+def timed_map(func, items, concurrency):
+    """Ejecutar func sobre items desde concurrency hilos; devuelve (latencias, segundos totales)."""
+
+    def timed(item):
+        start = time.perf_counter()
+        func(item)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        samples = list(pool.map(timed, items))
+    return samples, time.perf_counter() - start
+
+
+def summarize(stage, samples, elapsed, total_bytes, pool_full):
+    return {
+        "stage": stage,
+        "throughput_mib_s": round(total_bytes / (1024 * 1024) / elapsed, 1),
+        "elapsed_s": round(elapsed, 3),
+        "pool_full": pool_full,
+        **percentiles(samples),
+    }
+
+
+def run_profile(profile, endpoint, args, payload, counter):
+    client = build_client(profile, endpoint)
+    minio_client.s3_client = client
+    minio_client.TRANSFER_CONCURRENCY = args.transfer_concurrency if profile == "tuned" else 1
+    bucket = f"bench-{profile}-{uuid.uuid4().hex[:8]}"
+    client.create_bucket(Bucket=bucket)
+    keys = [f"objects/{index}.pdf" for index in range(args.objects)]
+    total_bytes = len(payload) * len(keys)
+
+    counter.count = 0
+    samples, elapsed = timed_map(
+        lambda key: minio_client.upload_stream(bucket, io.BytesIO(payload), key),
+        keys, args.concurrency
+    )
+    upload = summarize("upload", samples, elapsed, total_bytes, counter.count)
+
+    def read(key):
+        _, chunks = minio_client.open_object_stream(bucket, key)
+        for _ in chunks:
+            pass
+
+    counter.count = 0
+    samples, elapsed = timed_map(read, keys, args.concurrency)
+    download = summarize("download", samples, elapsed, total_bytes, counter.count)
+    return [dict(profile=profile, **upload), dict(profile=profile, **download)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--endpoint", help="URL de S3/MinIO (por defecto, un servidor de moto local)")
+    parser.add_argument("--objects", type=int, default=64)
+    parser.add_argument("--size-mb", type=float, default=20)
+    parser.add_argument("--concurrency", type=int, default=16, help="hilos que suben y descargan a la vez")
+    parser.add_argument("--transfer-concurrency", type=int, default=minio_client.TRANSFER_CONCURRENCY,
+                        help="partes en vuelo por subida con el perfil tuned")
+    parser.add_argument("--profiles", nargs="+", choices=PROFILES, default=list(PROFILES))
+    parser.add_argument("--output", help="archivo JSON de salida (por defecto, stdout)")
+    args = parser.parse_args(argv)
+
+    counter = _PoolFullCounter()
+    logging.getLogger("urllib3.connectionpool").addHandler(counter)
+
+    server = None
+    endpoint = args.endpoint
+    if endpoint is None:
+        os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-1")
+        server, endpoint = start_moto()
+
+    payload = os.urandom(int(args.size_mb * 1024 * 1024))
+    # upload_stream imprime una línea por objeto; se descartan durante la medición
+    stdout = sys.stdout
+    results = []
+    try:
+        for profile in args.profiles:
+            sys.stdout = open(os.devnull, "w")
+            try:
+                results.extend(run_profile(profile, endpoint, args, payload, counter))
+            finally:
+                sys.stdout.close()
+                sys.stdout = stdout
+    finally:
+        if server is not None:
+            server.stop()
+
+    report = {
+        "endpoint": args.endpoint or "moto",
+        "objects": args.objects,
+        "size_mb": args.size_mb,
+        "concurrency": args.concurrency,
+        "settings": {
+            "max_pool_connections": minio_client.MAX_POOL_CONNECTIONS,
+            "retry_mode": minio_client.RETRY_MODE,
+            "max_attempts": minio_client.MAX_ATTEMPTS,
+            "multipart_threshold": minio_client.MULTIPART_THRESHOLD,
+            "upload_part_size": minio_client.UPLOAD_PART_SIZE,
+            "transfer_concurrency": args.transfer_concurrency,
+        },
+        "results": results,
+        "peak_rss": peak_rss_mb(),
+    }
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
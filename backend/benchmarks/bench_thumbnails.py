@@ -0,0 +1,119 @@
+"""
+Benchmark de la generación de miniaturas de páginas (app.thumbnails).
+
+Genera un PDF sintético de --pages páginas, lo firma una vez en la primera
+página y compara, por revisión:
+
+- serial:      todas las páginas en una sola llamada a render_thumbnails
+- parallel:    las páginas en grupos de --pages-per-task repartidos entre
+               --workers procesos (como PageThumbnails con run_cpu)
+- signed_full: todas las páginas de la revisión firmada
+- signed_page: solo la página de la estampa (el resto se reutiliza de la
+               revisión anterior)
+
+Antes de medir comprueba que las miniaturas en paralelo son idénticas a las
+en serie y que las páginas sin estampa de la revisión firmada son idénticas
+a las de la anterior, es decir, que reutilizarlas no cambia el resultado.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_thumbnails [--pages 40] [--workers 4] [--pages-per-task 8] [--iterations 5]
+"""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from app.logic.pdf_signer import PDFSigner
+from app.logic.page_render import read_page_sizes, render_thumbnails
+
+from .fixtures import make_p12, make_pdf
+from .stats import percentiles
+
+PASSWORD = "benchmark"
+
+
+def render_parallel(executor, path, pages, pages_per_task, width, quality):
+    chunks = [pages[i:i + pages_per_task] for i in range(0, len(pages), pages_per_task)]
+    futures = [executor.submit(render_thumbnails, path, chunk, width, quality) for chunk in chunks]
+    return [thumbnail for future in futures for thumbnail in future.result()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=40)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--pages-per-task", type=int, default=8)
+    parser.add_argument("--width", type=int, default=640)
+    parser.add_argument("--quality", type=int, default=80)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    signer = PDFSigner.from_pkcs12_data(make_p12(password=PASSWORD), PASSWORD)
+    executor = ProcessPoolExecutor(max_workers=args.workers, mp_context=multiprocessing.get_context("spawn"))
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        base_path = os.path.join(work_dir, "base.pdf")
+        signed_path = os.path.join(work_dir, "signed.pdf")
+        with open(base_path, "wb") as f:
+            f.write(make_pdf(pages=args.pages))
+        success, message = asyncio.run(signer.async_sign_file(
+            base_path, signed_path, "Documento revisado y aprobado", "Quito", 0, 40, 40, 200
+        ))
+        if not success:
+            raise SystemExit(message)
+        pages = list(range(len(read_page_sizes(base_path))))
+
+        def render(path, indexes=pages):
+            return render_thumbnails(path, indexes, args.width, args.quality)
+
+        def parallel(path):
+            return render_parallel(executor, path, pages, args.pages_per_task, args.width, args.quality)
+
+        # Comprobaciones (y arranque de los procesos del pool)
+        serial_hashes = [thumbnail.sha256 for thumbnail in render(base_path)]
+        if [thumbnail.sha256 for thumbnail in parallel(base_path)] != serial_hashes:
+            raise SystemExit("Las miniaturas en paralelo no coinciden con las de la versión en serie.")
+        signed_hashes = [thumbnail.sha256 for thumbnail in render(signed_path)]
+        if signed_hashes[0] == serial_hashes[0]:
+            raise SystemExit("La estampa no aparece en la miniatura de la página firmada.")
+        if signed_hashes[1:] != serial_hashes[1:]:
+            raise SystemExit("Las páginas sin estampa cambiaron al firmar: no se pueden reutilizar.")
+        print("Miniaturas idénticas en serie y en paralelo; las páginas sin estampa se reutilizan.", flush=True)
+
+        def timed(func):
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                func()
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        serial = timed(lambda: render(base_path))
+        parallel_samples = timed(lambda: parallel(base_path))
+        signed_full = timed(lambda: parallel(signed_path))
+        signed_page = timed(lambda: render(signed_path, [0]))
+    executor.shutdown()
+
+    report = {
+        "pages": args.pages,
+        "workers": args.workers,
+        "pages_per_task": args.pages_per_task,
+        "width": args.width,
+        "iterations": args.iterations,
+        "serial": percentiles(serial),
+        "parallel": percentiles(parallel_samples),
+        "signed_full": percentiles(signed_full),
+        "signed_page": percentiles(signed_page),
+        "speedup_parallel_p50": round(percentiles(serial)["p50_ms"] / max(percentiles(parallel_samples)["p50_ms"], 0.001), 1),
+        "speedup_signed_page_p50": round(percentiles(signed_full)["p50_ms"] / max(percentiles(signed_page)["p50_ms"], 0.001), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
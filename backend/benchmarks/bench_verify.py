@@ -0,0 +1,125 @@
+"""
+Benchmark de la verificación de firmas de un documento (GET /verify).
+
+Firma un PDF sintético --signatures veces seguidas (firmas incrementales,
+como el flujo multinivel) y compara, por petición de verificación:
+
+- full:        validate_pdf_signature de pyhanko sobre todas las firmas del
+               PDF final, con el análisis de modificaciones de cada una
+               hasta el final del archivo (lo que costaría sin guardar nada)
+- incremental: signature_verifier.verify_signatures con todas las
+               revisiones pendientes (primera verificación del documento)
+- new:         verify_signatures con solo la última revisión pendiente (la
+               verificación tras una firma nueva; las anteriores ya están
+               en la base de datos)
+
+Antes de medir comprueba que el resultado incremental coincide con el de
+pyhanko: integridad, validez y nivel de modificación efectivo de cada firma.
+
+Uso (desde backend/):
+    python -m benchmarks.bench_verify [--signatures 5] [--pages 3] [--iterations 5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+
+from pyhanko.pdf_utils.reader import PdfFileReader
+from pyhanko.sign.validation import validate_pdf_signature
+from pyhanko_certvalidator import ValidationContext
+
+from app.logic.pdf_signer import PDFSigner
+from app.logic.signature_verifier import effective_modification_level, verify_signatures
+
+from .fixtures import make_p12, make_pdf
+from .stats import percentiles
+
+PASSWORD = "benchmark"
+
+
+def sign_chain(signer, pdf, signatures, work_dir):
+    """Firmar pdf `signatures` veces; devuelve la ruta final y el tamaño de cada revisión."""
+    previous = os.path.join(work_dir, "revision_0.pdf")
+    with open(previous, "wb") as f:
+        f.write(pdf)
+    sizes = [len(pdf)]
+    for index in range(signatures):
+        output = os.path.join(work_dir, f"revision_{index + 1}.pdf")
+        success, message = asyncio.run(signer.async_sign_file(
+            previous, output, "Documento revisado y aprobado", "Quito", 0,
+            40, 40 + (index % 6) * 110, 200, appearance="vector"
+        ))
+        if not success:
+            raise RuntimeError(message)
+        sizes.append(os.path.getsize(output))
+        previous = output
+    return previous, sizes
+
+
+def full_validation(path):
+    """Referencia: todas las firmas, con el diff completo de cada una."""
+    results = []
+    with open(path, "rb") as f:
+        reader = PdfFileReader(f, strict=False)
+        for signature in reader.embedded_signatures:
+            status = validate_pdf_signature(signature, ValidationContext(trust_roots=[], allow_fetching=False))
+            level = status.modification_level.name if status.modification_level is not None else None
+            results.append((signature.field_name, status.intact, status.valid, level))
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signatures", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    # Los avisos de validación (certificado autofirmado) no interesan aquí
+    logging.disable(logging.WARNING)
+    signer = PDFSigner.from_pkcs12_data(make_p12(password=PASSWORD), PASSWORD)
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        path, sizes = sign_chain(signer, make_pdf(pages=args.pages), args.signatures, work_dir)
+
+        expected = full_validation(path)
+        checks, counts = verify_signatures(path, sizes, sizes)
+        levels = effective_modification_level(checks)
+        got = [(check.field_name, check.intact, check.valid, level) for check, level in zip(checks, levels)]
+        if got != expected:
+            raise SystemExit(f"El resultado incremental no coincide con pyhanko:\n{got}\n{expected}")
+        latest, _ = verify_signatures(path, sizes, sizes[-1:])
+        if [check.field_name for check in latest] != [expected[-1][0]]:
+            raise SystemExit("La verificación de la última revisión no devolvió solo la última firma.")
+        print("Resultados idénticos a pyhanko.", flush=True)
+
+        def timed(func):
+            samples = []
+            for _ in range(args.iterations):
+                start = time.perf_counter()
+                func()
+                samples.append(time.perf_counter() - start)
+            return samples
+
+        full = timed(lambda: full_validation(path))
+        incremental = timed(lambda: verify_signatures(path, sizes, sizes))
+        new = timed(lambda: verify_signatures(path, sizes, sizes[-1:]))
+
+    report = {
+        "signatures": args.signatures,
+        "pdf_bytes": sizes[-1],
+        "iterations": args.iterations,
+        "full": percentiles(full),
+        "incremental": percentiles(incremental),
+        "new": percentiles(new),
+        "speedup_new_vs_full_p50": round(percentiles(full)["p50_ms"] / max(percentiles(new)["p50_ms"], 0.001), 1),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
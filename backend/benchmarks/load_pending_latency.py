@@ -0,0 +1,118 @@
+"""
+Prueba de carga: latencia de GET /api/documents/pending mientras se firma.
+
+Sube documentos sintéticos, mide la latencia de la bandeja de entrada con el
+servidor en reposo y después mientras varios clientes firman documentos sin
+parar. Con el modelo de ejecución por pools, el p99 de /pending debe
+mantenerse plano entre ambas fases.
+
+Uso (con el backend en marcha):
+    python -m benchmarks.load_pending_latency --base-url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import time
+
+import httpx
+
+from .fixtures import make_p12, make_pdf
+from .stats import percentiles
+
+
+async def sample_pending(client, duration, interval):
+    """Llamar a /pending repetidamente durante `duration` segundos."""
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        response = await client.get("/api/documents/pending")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return latencies
+
+
+async def sign_forever(client, documents, levels, p12, password, stop, counter):
+    """Firmar documentos en bucle hasta que se active `stop`."""
+    for doc_id in itertools.cycle(documents):
+        if stop.is_set():
+            return
+        response = await client.post(
+            f"/api/documents/{doc_id}/sign",
+            files={"cert_file": ("bench.p12", p12, "application/x-pkcs12")},
+            data={
+                "password": password,
+                "signer_level": str(levels[doc_id]),
+                "page_index": "0",
+                "x_coord": "50",
+                "y_coord": str(50 + (levels[doc_id] % 8) * 80),
+                "width": "150",
+            },
+        )
+        if response.status_code == 200:
+            levels[doc_id] += 1
+            counter["signed"] += 1
+        else:
+            counter["errors"] += 1
+
+
+async def run(args):
+    password = "benchmark"
+    p12 = make_p12(password=password)
+    pdf = make_pdf(pages=args.pages)
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=300) as client:
+        documents = []
+        for i in range(args.documents):
+            response = await client.post(
+                "/api/documents/",
+                files={"pdf_file": (f"carga_{i}.pdf", pdf, "application/pdf")},
+            )
+            response.raise_for_status()
+            documents.append(response.json()["id"])
+        levels = {doc_id: 1 for doc_id in documents}
+
+        idle = await sample_pending(client, args.duration, args.interval)
+
+        stop = asyncio.Event()
+        counter = {"signed": 0, "errors": 0}
+        # Cada firmante trabaja sobre su propio subconjunto de documentos
+        signers = [
+            asyncio.create_task(sign_forever(
+                client, documents[i::args.sign_concurrency], levels, p12, password, stop, counter
+            ))
+            for i in range(args.sign_concurrency)
+        ]
+        await asyncio.sleep(0.5)  # dejamos que las firmas arranquen
+        busy = await sample_pending(client, args.duration, args.interval)
+        stop.set()
+        await asyncio.gather(*signers)
+
+    return {
+        "base_url": args.base_url,
+        "documents": args.documents,
+        "pages": args.pages,
+        "sign_concurrency": args.sign_concurrency,
+        "pending_idle": percentiles(idle),
+        "pending_while_signing": percentiles(busy),
+        "signatures": counter,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--documents", type=int, default=8)
+    parser.add_argument("--pages", type=int, default=50)
+    parser.add_argument("--sign-concurrency", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=10.0, help="segundos de muestreo por fase")
+    parser.add_argument("--interval", type=float, default=0.05, help="pausa entre llamadas a /pending")
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Sustituto en memoria del cliente boto3 de S3 para los benchmarks.
+
+Implementa solo las operaciones que usa app.minio_client, de modo que los
+benchmarks del flujo completo no dependen de un MinIO en marcha y miden el
+coste del backend y no el de la red.
+
+Uso:
+    from app import minio_client
+    minio_client.s3_client = MemoryS3()
+"""
+
+import hashlib
+import itertools
+import threading
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+
+def _error(code, operation):
+    return ClientError({"Error": {"Code": code, "Message": code}}, operation)
+
+
+class _Body:
+    """Cuerpo de get_object con la interfaz de StreamingBody que se usa."""
+
+    def __init__(self, data):
+        self._data = data
+        self._offset = 0
+
+    def read(self, amt=None):
+        end = len(self._data) if amt is None or amt < 0 else self._offset + amt
+        chunk = self._data[self._offset:end]
+        self._offset += len(chunk)
+        return chunk
+
+    def iter_chunks(self, chunk_size=1024):
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        pass
+
+
+class _Object:
+    def __init__(self, data):
+        self.data = bytes(data)
+        self.etag = f'"{hashlib.md5(self.data).hexdigest()}"'
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class MemoryS3:
+    """Buckets y objetos en diccionarios, seguro entre hilos."""
+
+    def __init__(self):
+        self._buckets = {}
+        self._uploads = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _bucket(self, name, operation):
+        try:
+            return self._buckets[name]
+        except KeyError:
+            raise _error("NoSuchBucket", operation)
+
+    def _object(self, bucket, key, operation):
+        try:
+            return self._bucket(bucket, operation)[key]
+        except KeyError:
+            raise _error("404" if operation == "HeadObject" else "NoSuchKey", operation)
+
+    # --- Buckets ---
+    def head_bucket(self, Bucket):
+        with self._lock:
+            if Bucket not in self._buckets:
+                raise _error("404", "HeadBucket")
+        return {}
+
+    def create_bucket(self, Bucket, **kwargs):
+        with self._lock:
+            self._buckets.setdefault(Bucket, {})
+        return {}
+
+    # --- Objetos completos ---
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        obj = _Object(data)
+        with self._lock:
+            self._bucket(Bucket, "PutObject")[Key] = obj
+        return {"ETag": obj.etag}
+
+    def upload_file(self, Filename, Bucket, Key, **kwargs):
+        with open(Filename, "rb") as f:
+            self.put_object(Bucket=Bucket, Key=Key, Body=f.read())
+
+    def upload_fileobj(self, Fileobj, Bucket, Key, **kwargs):
+        self.put_object(Bucket=Bucket, Key=Key, Body=Fileobj.read())
+
+    def download_file(self, Bucket, Key, Filename, **kwargs):
+        with self._lock:
+            obj = self._object(Bucket, Key, "HeadObject")
+        with open(Filename, "wb") as f:
+            f.write(obj.data)
+
+    def download_fileobj(self, Bucket, Key, Fileobj, **kwargs):
+        with self._lock:
+            obj = self._object(Bucket, Key, "HeadObject")
+        Fileobj.write(obj.data)
+
+    def head_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            obj = self._object(Bucket, Key, "HeadObject")
+        return {"ContentLength": len(obj.data), "ETag": obj.etag, "LastModified": obj.last_modified}
+
+    def get_object(self, Bucket, Key, Range=None, **kwargs):
+        with self._lock:
+            obj = self._object(Bucket, Key, "GetObject")
+        data = obj.data
+        if Range:
+            start, _, end = Range[len("bytes="):].partition("-")
+            data = data[int(start):int(end) + 1]
+        return {
+            "Body": _Body(data),
+            "ContentLength": len(data),
+            "ETag": obj.etag,
+            "LastModified": obj.last_modified,
+        }
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        with self._lock:
+            self._bucket(Bucket, "DeleteObject").pop(Key, None)
+        return {}
+
+    # --- Subidas multiparte ---
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = str(next(self._ids))
+        with self._lock:
+            self._uploads[upload_id] = {}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        data = Body.read() if hasattr(Body, "read") else Body
+        with self._lock:
+            self._uploads[UploadId][PartNumber] = bytes(data)
+        return {"ETag": f'"{hashlib.md5(data).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        with self._lock:
+            parts = self._uploads.pop(UploadId)
+        data = b"".join(parts[p["PartNumber"]] for p in MultipartUpload["Parts"])
+        return self.put_object(Bucket=Bucket, Key=Key, Body=data)
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
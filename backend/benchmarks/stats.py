@@ -0,0 +1,40 @@
+"""Resúmenes estadísticos comunes a los benchmarks."""
+
+import resource
+import statistics
+import sys
+
+
+def percentiles(samples):
+    """Resumen de latencias en milisegundos."""
+    if not samples:
+        return {"n": 0}
+    ordered = sorted(samples)
+
+    def pick(q):
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 2)
+
+    return {
+        "n": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p95_ms": pick(0.95),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2),
+    }
+
+
+def peak_rss_mb():
+    """
+    Pico de memoria residente (MiB) de este proceso y de los procesos hijos
+    ya terminados (p. ej. el pool de firma), según getrusage.
+    """
+    # ru_maxrss está en KiB en Linux y en bytes en macOS
+    unit = 1 if sys.platform == "darwin" else 1024
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit
+    return {
+        "self_mb": round(own / (1024 * 1024), 1),
+        "children_mb": round(children / (1024 * 1024), 1),
+    }
@@ -1,14 +1,17 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware # ¡Importación nueva!
-from app import database, models
+from app import database, models, executors, events, jobs, metrics, storage, thumbnails
+from app.cache import inbox_cache
 from app.database import engine
-from app.routers import documents 
+from app.routers import certificates, documents, signer_sessions
+from app.routers import jobs as jobs_router
 from app.minio_client import create_bucket_if_not_exists # ¡Importación nueva!
 
 # Nombre del bucket que usaremos en MinIO
 DOCUMENTS_BUCKET = "documents"
 
-models.Base.metadata.create_all(bind=engine)
+# Crea las tablas y añade las columnas e índices nuevos a las existentes
+database.upgrade_schema(models.Base.metadata)
 
 app = FastAPI(
     title="Firma EC - API",
@@ -27,6 +30,43 @@ def on_startup():
     print("Verificando la existencia del bucket de MinIO...")
     create_bucket_if_not_exists(DOCUMENTS_BUCKET)
     print("Bucket de MinIO listo.")
+    # Las subidas y firmas de cualquier réplica invalidan la caché de la bandeja de esta
+    events.broker.add_listener(inbox_cache.apply_event)
+    events.broker.start()
+
+@app.on_event("startup")
+async def start_signing_workers():
+    """Arrancamos los workers de la firma asíncrona en el bucle de eventos."""
+    jobs.signing_jobs.start()
+
+@app.on_event("startup")
+async def start_storage_sweeper():
+    """Recolección periódica de los objetos de firmas que no llegaron a registrarse."""
+    storage.storage_sweeper.start()
+
+@app.on_event("shutdown")
+async def stop_signing_workers():
+    await jobs.signing_jobs.stop()
+
+@app.on_event("shutdown")
+async def stop_storage_sweeper():
+    await storage.storage_sweeper.stop()
+
+@app.on_event("shutdown")
+async def stop_thumbnails():
+    """Cancelamos las miniaturas que se generaban en segundo plano."""
+    await thumbnails.page_thumbnails.stop()
+
+@app.on_event("shutdown")
+async def close_database():
+    """Cerramos las conexiones del pool del motor asíncrono."""
+    await database.async_engine.dispose()
+
+@app.on_event("shutdown")
+def on_shutdown():
+    """Cerramos el broker de eventos y los pools de hilos y procesos del modelo de ejecución."""
+    events.broker.stop()
+    executors.shutdown()
 # --- FIN DE LA CORRECCIÓN ---
 
 # --- ¡AQUÍ ESTÁ LA CORRECCIÓN! ---
@@ -42,12 +82,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"], # Permitimos todos los métodos (GET, POST, etc.)
     allow_headers=["*"], # Permitimos todas las cabeceras
+    # pdf.js necesita leer estas cabeceras para pedir el PDF por rangos
+    expose_headers=["Accept-Ranges", "Content-Range", "Content-Length", "ETag", "Last-Modified"],
 )
 # --- FIN DE LA CORRECCIÓN ---
 
 
 # Incluimos las rutas de documentos en la aplicación principal
 app.include_router(documents.router)
+app.include_router(signer_sessions.router)
+app.include_router(jobs_router.router)
+app.include_router(certificates.router)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Métricas en el formato de exposición de Prometheus."""
+    if not metrics.METRICS_ENABLED:
+        return Response(status_code=404)
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE_LATEST)
 
 @app.get("/")
 def read_root():
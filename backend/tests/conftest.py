@@ -0,0 +1,11 @@
+import os
+import sys
+import tempfile
+
+# database.py crea sus motores al importarse: la base de datos de las pruebas
+# (SQLite en un archivo temporal) y la caché desactivada se eligen antes
+_DB_DIR = tempfile.mkdtemp(prefix="firma-ec-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_DB_DIR, 'tests.db')}")
+os.environ.setdefault("INBOX_CACHE_BACKEND", "none")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,40 @@
+import pytest
+
+from app.http_utils import RangeNotSatisfiable, parse_byte_range
+
+
+def test_parse_byte_range_closed():
+    assert parse_byte_range("bytes=0-9", 100) == (0, 9)
+    assert parse_byte_range("bytes=90-200", 100) == (90, 99)
+
+
+def test_parse_byte_range_open_ended():
+    assert parse_byte_range("bytes=10-", 100) == (10, 99)
+
+
+def test_parse_byte_range_suffix():
+    assert parse_byte_range("bytes=-10", 100) == (90, 99)
+    assert parse_byte_range("bytes=-500", 100) == (0, 99)
+
+
+def test_parse_byte_range_unusable_header_serves_everything():
+    assert parse_byte_range(None, 100) is None
+    assert parse_byte_range("items=0-9", 100) is None
+    assert parse_byte_range("bytes=0-9,20-29", 100) is None
+    assert parse_byte_range("bytes=20-10", 100) is None
+    assert parse_byte_range("bytes=a-b", 100) is None
+
+
+def test_parse_byte_range_open_ended_at_size():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range("bytes=100-", 100)
+
+
+def test_parse_byte_range_open_ended_past_size():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range("bytes=500-", 100)
+
+
+def test_parse_byte_range_closed_past_size():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_byte_range("bytes=500-600", 100)
@@ -0,0 +1,93 @@
+"""
+GET /api/documents/pending hace dos consultas por página (documentos y sus
+firmas) sin importar cuántos documentos tenga la página.
+"""
+
+import asyncio
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import httpx
+import pytest
+from fastapi import FastAPI
+from sqlalchemy import delete, event
+
+from app import database, models
+from app.routers import documents
+
+PAGE_SIZE = 5
+
+
+@pytest.fixture(scope="module")
+def app():
+    models.Base.metadata.create_all(bind=database.engine)
+    app = FastAPI()
+    app.include_router(documents.router)
+    yield app
+    asyncio.run(database.async_engine.dispose())
+
+
+def seed(count, signatures_per_document=2):
+    """Documentos en espera del nivel 2, cada uno con sus firmas."""
+    db = database.SessionLocal()
+    try:
+        db.execute(delete(models.Signature))
+        db.execute(delete(models.Document))
+        now = datetime.now(timezone.utc)
+        for i in range(count):
+            document = models.Document(
+                id=uuid.uuid4(), original_filename=f"doc-{i}.pdf", storage_path=f"sha256/{i}",
+                status="PENDIENTE_FIRMA_NIVEL_2", current_signer_level=2,
+                created_at=now - timedelta(seconds=i),
+            )
+            db.add(document)
+            for level in range(1, signatures_per_document + 1):
+                db.add(models.Signature(document_id=document.id, signed_by=f"firmante {level}", signer_level=level))
+        db.commit()
+    finally:
+        db.close()
+
+
+def fetch_pages(app, params):
+    """Recorrer todas las páginas; devuelve (documentos, consultas) de cada una."""
+    pages = []
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        pages[-1][1] += 1
+
+    async def run():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            cursor = None
+            while True:
+                pages.append([0, 0])
+                query = dict(params, limit=PAGE_SIZE, **({"cursor": cursor} if cursor else {}))
+                response = await client.get("/api/documents/pending", params=query)
+                assert response.status_code == 200, response.text
+                body = response.json()
+                pages[-1][0] = len(body["items"])
+                assert all(len(item["signatures"]) == 2 for item in body["items"])
+                cursor = body["next_cursor"]
+                if cursor is None:
+                    return
+
+    event.listen(database.async_engine.sync_engine, "before_cursor_execute", count)
+    try:
+        asyncio.run(run())
+    finally:
+        event.remove(database.async_engine.sync_engine, "before_cursor_execute", count)
+    return [tuple(page) for page in pages]
+
+
+@pytest.mark.parametrize("params", [
+    {},
+    {"signer_level": 2},
+    {"status": "PENDIENTE_FIRMA_NIVEL_2"},
+    {"signer_level": 2, "status": "PENDIENTE_FIRMA_NIVEL_2"},
+])
+@pytest.mark.parametrize("count", [1, 3 * PAGE_SIZE - 2])
+def test_pending_runs_two_queries_per_page(app, params, count):
+    seed(count)
+    pages = fetch_pages(app, params)
+    assert sum(documents for documents, _ in pages) == count
+    assert [queries for _, queries in pages] == [2] * len(pages)
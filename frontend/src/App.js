@@ -26,17 +26,11 @@ function App() {
   const [signaturePosition, setSignaturePosition] = useState(null);
   const [signatureSize, setSignatureSize] = useState({ width: 150, height: 75 });
 
-  const handleDocumentSelectForPreview = async (doc) => {
-    setPdfFileForViewer(null);
-    setStatus({ message: `Cargando previsualización de ${doc.original_filename}...`, type: 'info' });
-    try {
-      const response = await axios.get(`/api/documents/${doc.id}/download`, { responseType: 'blob' });
-      const file = new File([response.data], doc.original_filename, { type: 'application/pdf' });
-      setPdfFileForViewer(file);
-      setStatus({ message: `Documento listo. La posición de firma se aplicará a todos los seleccionados.`, type: 'info' });
-    } catch (err) {
-      setStatus({ message: 'Error al cargar la previsualización del PDF.', type: 'error' });
-    }
+  const handleDocumentSelectForPreview = (doc) => {
+    // Las páginas se muestran con las miniaturas del servidor; si no están
+    // disponibles, pdf.js pide el PDF por rangos de bytes (solo las páginas visibles)
+    setPdfFileForViewer({ url: `/api/documents/${doc.id}/download`, pagesUrl: `/api/documents/${doc.id}/pages` });
+    setStatus({ message: `Documento listo. La posición de firma se aplicará a todos los seleccionados.`, type: 'info' });
   };
 
   const handleToggleSelect = (docId) => {
@@ -63,48 +57,56 @@ function App() {
     setIsLoading(true);
     setStatus({ message: `Iniciando firma de ${selectedDocIds.length} documento(s)...`, type: 'info' });
     setDownloadLinks([]);
-    const newLinks = [];
     
     // Obtenemos la lista de objetos de documento a firmar
     const docsToSign = pendingDocs.filter(doc => selectedDocIds.includes(doc.id));
 
-    for (const doc of docsToSign) {
-      setStatus({ message: `Firmando ${doc.original_filename}...`, type: 'info' });
-      const formData = new FormData();
-      formData.append('cert_file', certFile);
-      formData.append('password', password);
-      formData.append('reason', reason);
-      formData.append('signer_level', doc.current_signer_level);
-      formData.append('location', 'Ecuador');
-      formData.append('page_index', signaturePosition.pageIndex);
-      formData.append('x_coord', signaturePosition.x);
-      formData.append('y_coord', signaturePosition.y);
-      formData.append('width', signatureSize.width);
+    // Un solo lote: el servidor carga el certificado una vez y firma en paralelo
+    const formData = new FormData();
+    formData.append('cert_file', certFile);
+    formData.append('password', password);
+    formData.append('reason', reason);
+    formData.append('location', 'Ecuador');
+    formData.append('items', JSON.stringify(docsToSign.map(doc => ({
+      document_id: doc.id,
+      signer_level: doc.current_signer_level,
+      page_index: signaturePosition.pageIndex,
+      x_coord: signaturePosition.x,
+      y_coord: signaturePosition.y,
+      width: signatureSize.width,
+    }))));
 
-      try {
-        const response = await axios.post(`/api/documents/${doc.id}/sign`, formData, {
-          headers: { 'Content-Type': 'multipart/form-data' }, responseType: 'blob',
-        });
-        const url = window.URL.createObjectURL(new Blob([response.data]));
+    let batchResult;
+    try {
+      const response = await axios.post('/api/documents/batch-sign', formData, {
+        headers: { 'Content-Type': 'multipart/form-data' },
+      });
+      batchResult = response.data;
+    } catch (error) {
+      const detail = error.response && error.response.data && error.response.data.detail;
+      setStatus({ message: `Error al firmar: ${detail || 'Ocurrió un error al firmar los archivos.'}`, type: 'error' });
+      setIsLoading(false);
+      return;
+    }
+
+    const newLinks = [];
+    const errors = [];
+    for (const doc of docsToSign) {
+      const result = batchResult.results.find(r => r.document_id === doc.id);
+      if (result && result.success) {
         const signedFileName = `firmado_nivel_${doc.current_signer_level}_${doc.original_filename}`;
-        newLinks.push({ url, name: signedFileName });
-      } catch (error) {
-        let errorMessage = 'Ocurrió un error al firmar el archivo.';
-        if (error.response && error.response.data) {
-          try {
-            const errorText = await error.response.data.text();
-            const errorJson = JSON.parse(errorText);
-            errorMessage = errorJson.detail || errorMessage;
-          } catch(e) {/* fallback */}
-        }
-        setStatus({ message: `Error al firmar ${doc.original_filename}: ${errorMessage}`, type: 'error' });
-        setIsLoading(false);
-        return;
+        newLinks.push({ url: `/api/documents/${doc.id}/download`, name: signedFileName });
+      } else {
+        errors.push(`${doc.original_filename}: ${result ? result.detail : 'sin respuesta'}`);
       }
     }
     
     setDownloadLinks(newLinks);
-    setStatus({ message: `¡Éxito! ${docsToSign.length} documento(s) firmado(s).`, type: 'success' });
+    if (errors.length > 0) {
+      setStatus({ message: `${batchResult.signed} documento(s) firmado(s). Errores: ${errors.join('; ')}`, type: 'warning' });
+    } else {
+      setStatus({ message: `¡Éxito! ${batchResult.signed} documento(s) firmado(s).`, type: 'success' });
+    }
     setIsLoading(false);
     setRefreshCounter(prev => prev + 1);
     setSelectedDocIds([]);
@@ -1,4 +1,5 @@
-import React, { useState } from 'react';
+import React, { useEffect, useMemo, useState } from 'react';
+import axios from 'axios';
 import { Box, Typography, Paper } from '@mui/material';
 import { Document, Page, pdfjs } from 'react-pdf';
 import 'react-pdf/dist/Page/AnnotationLayer.css';
@@ -11,14 +12,42 @@ function PdfViewer({ file, onPageClick, signatureSize }) {
   const [numPages, setNumPages] = useState(null);
   const [clickPosition, setClickPosition] = useState(null);
   const [pageDimensions, setPageDimensions] = useState({});
+  // Páginas de /api/documents/{id}/pages: tamaño en puntos y miniatura generada
+  // en el servidor. Si no se pueden obtener, se dibuja el PDF con pdf.js.
+  const [pages, setPages] = useState(null);
+  const [pagesFailed, setPagesFailed] = useState(false);
+
+  const pagesUrl = file && file.pagesUrl;
+  // pdf.js solo recibe la URL del PDF (un objeto nuevo lo volvería a cargar)
+  const pdfSource = useMemo(() => (file && file.url ? { url: file.url } : file), [file]);
+
+  useEffect(() => {
+    setPages(null);
+    setPagesFailed(false);
+    setClickPosition(null);
+    if (!pagesUrl) return;
+    let cancelled = false;
+    axios.get(pagesUrl)
+      .then(response => {
+        if (cancelled) return;
+        setPages(response.data.pages);
+        setPageDimensions(Object.fromEntries(response.data.pages.map(page => [page.index + 1, { width: page.width, height: page.height }])));
+      })
+      .catch(error => {
+        if (cancelled) return;
+        console.error('Error al cargar las miniaturas:', error.message);
+        setPagesFailed(true);
+      });
+    return () => { cancelled = true; };
+  }, [pagesUrl]);
 
   const handlePageClick = (event, pageNumber) => {
     const rect = event.currentTarget.getBoundingClientRect();
     const x = event.clientX - rect.left;
     const y = event.clientY - rect.top;
-    
+
     setClickPosition({ pageIndex: pageNumber - 1, x, y });
-    
+
     if (onPageClick) {
       const originalPage = pageDimensions[pageNumber];
       if (originalPage) {
@@ -29,7 +58,7 @@ function PdfViewer({ file, onPageClick, signatureSize }) {
       }
     }
   };
-  
+
   const handlePageLoad = (page) => {
     setPageDimensions(prev => ({ ...prev, [page.pageNumber]: { width: page.originalWidth, height: page.originalHeight } }));
   };
@@ -43,23 +72,49 @@ function PdfViewer({ file, onPageClick, signatureSize }) {
     );
   }
 
+  const renderMarker = (index) => clickPosition && clickPosition.pageIndex === index && (
+    <div
+      className="click-marker"
+      style={{
+        left: `${clickPosition.x}px`,
+        top: `${clickPosition.y}px`,
+        width: `${signatureSize.width}px`,
+        height: `${signatureSize.height}px`
+      }}
+    ></div>
+  );
+
+  if (pagesUrl && !pagesFailed) {
+    // Cada miniatura se muestra con el tamaño de la página en puntos, como
+    // pdf.js a escala 1: la posición de la firma se calcula igual
+    return (
+      <Paper elevation={4} sx={{ height: 'calc(100vh - 150px)', overflowY: 'auto' }}>
+        {pages === null && <Typography sx={{ p: 2 }}>Cargando páginas...</Typography>}
+        {pages && pages.map((page, index) => (
+          <div key={`page_wrapper_${index + 1}`} className="page-container" onClick={(e) => handlePageClick(e, index + 1)}>
+             <img
+                className="page-thumbnail"
+                src={page.thumbnail_url}
+                alt={`Página ${index + 1}`}
+                width={page.width}
+                height={page.height}
+                loading="lazy"
+                draggable={false}
+             />
+             {renderMarker(index)}
+          </div>
+        ))}
+      </Paper>
+    );
+  }
+
   return (
     <Paper elevation={4} sx={{ height: 'calc(100vh - 150px)', overflowY: 'auto' }}>
-      <Document file={file} onLoadSuccess={({ numPages }) => setNumPages(numPages)} onLoadError={(error) => console.error('Error al cargar el PDF:', error.message)}>
+      <Document file={pdfSource} onLoadSuccess={({ numPages }) => setNumPages(numPages)} onLoadError={(error) => console.error('Error al cargar el PDF:', error.message)}>
         {Array.from(new Array(numPages), (el, index) => (
           <div key={`page_wrapper_${index + 1}`} className="page-container" onClick={(e) => handlePageClick(e, index + 1)}>
              <Page pageNumber={index + 1} onLoadSuccess={handlePageLoad} />
-             {clickPosition && clickPosition.pageIndex === index && (
-                <div 
-                  className="click-marker" 
-                  style={{ 
-                    left: `${clickPosition.x}px`, 
-                    top: `${clickPosition.y}px`,
-                    width: `${signatureSize.width}px`,
-                    height: `${signatureSize.height}px`
-                  }}
-                ></div>
-             )}
+             {renderMarker(index)}
           </div>
         ))}
       </Document>
@@ -67,4 +122,4 @@ function PdfViewer({ file, onPageClick, signatureSize }) {
   );
 }
 
-export default PdfViewer;
\ No newline at end of file
+export default PdfViewer;
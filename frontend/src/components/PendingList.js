@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import axios from 'axios';
-import { Typography, Paper, List, ListItem, ListItemText, CircularProgress, Divider, IconButton, Box, Checkbox, ListItemButton, ListItemIcon } from '@mui/material';
+import { Typography, Paper, List, ListItem, ListItemText, CircularProgress, Divider, IconButton, Box, Checkbox, ListItemButton, ListItemIcon, Button } from '@mui/material';
 import RefreshIcon from '@mui/icons-material/Refresh';
 
 // Añadimos 'setPendingDocs' para comunicarnos con el componente padre
@@ -8,27 +8,64 @@ function PendingList({ onDocumentSelect, refreshKey, selectedIds, onToggleSelect
   const [documents, setDocuments] = useState([]);
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const fetchDocuments = async () => {
     try {
       setIsLoading(true);
       const response = await axios.get('/api/documents/pending');
-      setDocuments(response.data);
-      setPendingDocs(response.data); // Informamos al padre de la lista de documentos
+      setDocuments(response.data.items);
+      setNextCursor(response.data.next_cursor);
+      setPendingDocs(response.data.items); // Informamos al padre de la lista de documentos
       setError(null);
     } catch (err) {
       setError('No se pudo cargar la lista de documentos.');
       setDocuments([]);
+      setNextCursor(null);
       setPendingDocs([]); // Informamos al padre que la lista está vacía
     } finally {
       setIsLoading(false);
     }
   };
 
+  // La bandeja se pagina por cursor: pedimos la página siguiente y la añadimos
+  const fetchMoreDocuments = async () => {
+    try {
+      setIsLoadingMore(true);
+      const response = await axios.get('/api/documents/pending', { params: { cursor: nextCursor } });
+      const allDocuments = [...documents, ...response.data.items];
+      setDocuments(allDocuments);
+      setNextCursor(response.data.next_cursor);
+      setPendingDocs(allDocuments);
+    } catch (err) {
+      setError('No se pudo cargar la lista de documentos.');
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchDocuments();
   }, [refreshKey]);
 
+  // En lugar de consultar periódicamente, escuchamos los cambios de estado
+  // que publica el servidor y recargamos la bandeja cuando llegan.
+  useEffect(() => {
+    const source = new EventSource('/api/documents/events');
+    let reloadTimer = null;
+    const scheduleReload = () => {
+      // Agrupamos ráfagas de eventos (p. ej. una firma por lotes) en una sola recarga
+      clearTimeout(reloadTimer);
+      reloadTimer = setTimeout(fetchDocuments, 300);
+    };
+    ['document.uploaded', 'document.signed', 'resync'].forEach(type => source.addEventListener(type, scheduleReload));
+    return () => {
+      clearTimeout(reloadTimer);
+      source.close();
+    };
+  }, []);
+
   if (error) {
     return <Typography color="error">{error}</Typography>;
   }
@@ -80,6 +117,13 @@ function PendingList({ onDocumentSelect, refreshKey, selectedIds, onToggleSelect
           )}
         </List>
       )}
+      {!isLoading && nextCursor && (
+        <Box sx={{ display: 'flex', justifyContent: 'center' }}>
+          <Button onClick={fetchMoreDocuments} disabled={isLoadingMore}>
+            {isLoadingMore ? 'Cargando...' : 'Cargar más'}
+          </Button>
+        </Box>
+      )}
     </Paper>
   );
 }